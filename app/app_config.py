@@ -1,9 +1,17 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from version import __version__
 
+ModelBackend = Literal["torch", "onnx", "onnx_qint8"]
+"""Inference backend of a model.
+
+* torch - PyTorch (default)
+* onnx - ONNX Runtime with the exported model (`onnx/model.onnx`)
+* onnx_qint8 - ONNX Runtime with the dynamically int8 quantized model (`onnx/model_qint8_<config>.onnx`)
+"""
+
 
 class AppConfig(BaseSettings):
     model_config = SettingsConfigDict(env_nested_delimiter="__")
@@ -15,7 +23,47 @@ class AppConfig(BaseSettings):
     api_key: Optional[str] = None
 
     chunks_embedding_at_once: int = 4
-    
+    embedding_policy: Literal["count", "cost"] = "count"
+    embedding_inline_time_budget: float = 8.0
+    embedding_default_tokens_per_second: float = 2000.0
+    chunks_publish_max_in_flight: int = 100
+    chunk_group_max_size: int = 1
+    chunk_group_max_bytes: int = 256 * 1024
+    embedding_batch_size: int = 32
+    splitter_use_token_offsets: bool = False
+    token_count_cache_size: int = 10000
+    language_detection_sample_size: int = 1000
+    language_detection_samples: int = 3
+    language_detection_min_confidence: float = 0.9
+    embedding_queue_max_batch_size: int = 32
+    embedding_queue_max_wait_ms: float = 5.0
+    embedding_batch_max_items: int = 256
+    embedding_batch_max_tokens: int = 65536
+    embedding_batch_token_budget: int = 16384
+    inference_workers: int = 1
+    inference_queue_size: int = 16
+    chunk_embedding_batch_max_size: int = 32
+    chunk_embedding_batch_max_wait_ms: float = 50.0
+    embedding_cache_size: int = 0
+    embedding_cache_disk_path: Optional[str] = None
+    embedding_cache_disk_size: int = 1000000
+    quantization_calibration_corpus: Optional[str] = None
+    model_backends: Dict[str, ModelBackend] = {}
+    onnx_quantization_config: str = "avx2"
+    onnx_equivalence_tolerance: float = 0.01
+    model_memory_budget_mb: int = 0
+    pinned_models: Optional[List[str]] = None
+    model_warmup_sequence_lengths: List[int] = [16, 128, 512]
+    model_warmup_batch_size: int = 4
+    input_file_bucket: Optional[str] = None
+    input_file_segment_size: int = 1024 * 1024
+    input_file_pool_size: int = 10
+    input_file_read_ahead: int = 1
+    profiling_enabled: bool = False
+    profiling_dir: str = "./profiles"
+    profiling_torch: bool = True
+    profiling_max_profiles: int = 20
+
     chunking_requests_subscription: Optional[str] = None
     chunking_responses_topic: Optional[str] = None
     chunk_embedding_requests_topic: str = "chunker-embeddings-requests"
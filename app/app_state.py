@@ -5,7 +5,12 @@ from dataclasses import dataclass
 from ampf.base import BaseAsyncFactory
 from ampf.gcp import GcpAsyncFactory, GcpSubscriptionPull, SubscriptionProcessor
 from app_config import AppConfig
+from features.chunks.embedding_policy import CostModelPolicy, EmbeddingPolicy, FixedCountPolicy
+from features.chunks.input_file_reader import InputFileReader
+from features.embeddings.embedding_batcher import EmbeddingBatcher
 from features.embeddings.embedding_service import EmbeddingService
+from inference_executor import InferenceExecutor
+from profiling import Profiler
 
 _log = logging.getLogger(__name__)
 
@@ -56,11 +61,51 @@ class AppState(AppSubscriptions):
     config: AppConfig
     async_factory: BaseAsyncFactory
     embedding_service: EmbeddingService
+    embedding_batcher: EmbeddingBatcher
+    chunk_embedding_batcher: EmbeddingBatcher
+    inference_executor: InferenceExecutor
+    input_file_reader: InputFileReader
+    embedding_policy: EmbeddingPolicy
+    profiler: Profiler
 
     @classmethod
     def create(cls, config: AppConfig):
+        embedding_service = EmbeddingService(config)
+        inference_executor = InferenceExecutor(config.inference_workers, config.inference_queue_size)
+        if config.embedding_policy == "count":
+            embedding_policy: EmbeddingPolicy = FixedCountPolicy(config.chunks_embedding_at_once)
+        else:
+            embedding_policy = CostModelPolicy(
+                embedding_service.throughput, config.embedding_inline_time_budget, lambda: inference_executor.load
+            )
         return cls(
             config=config,
             async_factory=GcpAsyncFactory(),
-            embedding_service=EmbeddingService(config),
+            embedding_service=embedding_service,
+            embedding_batcher=EmbeddingBatcher(
+                embedding_service,
+                config.embedding_queue_max_batch_size,
+                config.embedding_queue_max_wait_ms,
+                inference_executor,
+            ),
+            chunk_embedding_batcher=EmbeddingBatcher(
+                embedding_service,
+                config.chunk_embedding_batch_max_size,
+                config.chunk_embedding_batch_max_wait_ms,
+                inference_executor,
+            ),
+            inference_executor=inference_executor,
+            input_file_reader=InputFileReader(
+                default_bucket=config.input_file_bucket,
+                segment_size=config.input_file_segment_size,
+                pool_size=config.input_file_pool_size,
+                read_ahead=config.input_file_read_ahead,
+            ),
+            embedding_policy=embedding_policy,
+            profiler=Profiler(
+                config.profiling_dir,
+                config.profiling_enabled,
+                config.profiling_torch,
+                config.profiling_max_profiles,
+            ),
         )
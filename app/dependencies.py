@@ -1,3 +1,5 @@
+import asyncio
+import gc
 import logging
 import os
 from typing import Annotated
@@ -8,9 +10,13 @@ from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.concurrency import asynccontextmanager
 from features.chunks.chunk_service import ChunkService
+from features.embeddings.embedding_batcher import EmbeddingBatcher
 from features.embeddings.embedding_service import EmbeddingService
-from message_routers.chunk_embedding_request_message_router import ChunkEmbeddingRequestMessageRouter
+from inference_executor import InferenceExecutor
+from memory_usage import log_memory_usage
+from message_routers.chunk_group_embedding_request_message_router import ChunkGroupEmbeddingRequestMessageRouter
 from message_routers.chunk_request_message_router import ChunkRequestMessageRouter
+from profiling import Profiler
 
 load_dotenv()
 
@@ -19,21 +25,37 @@ _log = logging.getLogger(__name__)
 
 def lifespan(config: AppConfig):
     _log.info("Version: %s", config.version)
+    # Called on import of `main`, so with `gunicorn --preload` models are loaded once in the master process
+    # and workers share their pages (the weights are memory-mapped from the model files).
     app_state = AppState.create(config)
+    log_memory_usage("models loaded")
+    # Move loaded objects to the permanent generation, so the garbage collector of the workers
+    # does not write to their pages (which would copy them into each worker).
+    gc.freeze()
 
     @asynccontextmanager
     async def _lifespan(app: FastAPI):
-        if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        # Exporters selected with standard variables (e.g. `OTEL_TRACES_EXPORTER=console`) work without an endpoint
+        if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") or any(
+            os.environ.get(f"OTEL_{signal}_EXPORTER") for signal in ("TRACES", "METRICS", "LOGS")
+        ):
             from otel import setup_otel
             setup_otel(app)
 
         app.state.app_state = app_state
+        log_memory_usage("worker started")
+        warm_up = asyncio.create_task(app_state.inference_executor.run(app_state.embedding_service.warm_up_models))
 
         app_state.add_subscription(config.chunking_requests_subscription, get_chunk_request_message_router(app_state))
         app_state.add_subscription(config.chunk_embedding_requests_subscription, get_chunk_embedding_request_message_router(app_state))
 
         with app_state:
             yield
+        warm_up.cancel()
+        await app_state.embedding_batcher.close()
+        await app_state.chunk_embedding_batcher.close()
+        app_state.inference_executor.shutdown()
+        app_state.input_file_reader.close()
 
     return _lifespan
 
@@ -75,8 +97,36 @@ def get_embedding_service(app_state: AppStateDep) -> EmbeddingService:
 EmbeddingServiceDep = Annotated[EmbeddingService, Depends(get_embedding_service)]
 
 
+def get_embedding_batcher(app_state: AppStateDep) -> EmbeddingBatcher:
+    return app_state.embedding_batcher
+
+
+EmbeddingBatcherDep = Annotated[EmbeddingBatcher, Depends(get_embedding_batcher)]
+
+
+def get_inference_executor(app_state: AppStateDep) -> InferenceExecutor:
+    return app_state.inference_executor
+
+
+InferenceExecutorDep = Annotated[InferenceExecutor, Depends(get_inference_executor)]
+
+
+def get_profiler(app_state: AppStateDep) -> Profiler:
+    return app_state.profiler
+
+
+ProfilerDep = Annotated[Profiler, Depends(get_profiler)]
+
+
 def get_chunk_service(app_state: AppStateDep) -> ChunkService:
-    return ChunkService(app_state.embedding_service, app_state.config.chunks_embedding_at_once)
+    return ChunkService(
+        app_state.embedding_service,
+        app_state.config.chunks_embedding_at_once,
+        embedding_batch_size=app_state.config.embedding_batch_size,
+        use_token_offsets=app_state.config.splitter_use_token_offsets,
+        input_file_reader=app_state.input_file_reader,
+        embedding_policy=app_state.embedding_policy,
+    )
 
 
 ChunkServiceDep = Annotated[ChunkService, Depends(get_chunk_service)]
@@ -87,19 +137,23 @@ def get_chunk_request_message_router(app_state: AppStateDep) -> ChunkRequestMess
         app_state.config,
         app_state.async_factory,
         get_chunk_service(app_state),
+        app_state.inference_executor,
+        app_state.profiler,
     )
 
 
 ChunkRequestMessageRouterDep = Annotated[ChunkRequestMessageRouter, Depends(get_chunk_request_message_router)]
 
 
-def get_chunk_embedding_request_message_router(app_state: AppStateDep) -> ChunkEmbeddingRequestMessageRouter:
-    return ChunkEmbeddingRequestMessageRouter(
+def get_chunk_embedding_request_message_router(app_state: AppStateDep) -> ChunkGroupEmbeddingRequestMessageRouter:
+    return ChunkGroupEmbeddingRequestMessageRouter(
         app_state.async_factory,
-        get_embedding_service(app_state),
+        app_state.chunk_embedding_batcher,
+        app_state.config.chunks_publish_max_in_flight,
+        app_state.config.chunk_embedding_requests_topic,
     )
 
 
 ChunkEmbeddingRequestMessageRouterDep = Annotated[
-    ChunkEmbeddingRequestMessageRouter, Depends(get_chunk_embedding_request_message_router)
+    ChunkGroupEmbeddingRequestMessageRouter, Depends(get_chunk_embedding_request_message_router)
 ]
@@ -0,0 +1,32 @@
+import itertools
+from typing import Iterable, List
+
+from .chunk_model import ChunkGroup, ChunkWithEmbeddings
+
+
+def group_chunks(chunks: Iterable[ChunkWithEmbeddings], max_size: int, max_bytes: int) -> List[ChunkGroup]:
+    """Group consecutive chunks of the same job, task and model into embedding request messages.
+
+    Args:
+        chunks (Iterable[ChunkWithEmbeddings]): The chunks.
+        max_size (int): The maximum number of chunks in a group.
+        max_bytes (int): The maximum size of the chunks in a group serialized to JSON
+            (a larger chunk gets a group of its own).
+    Returns:
+        List[ChunkGroup]: The groups.
+    """
+    ret = []
+    for _, same in itertools.groupby(chunks, lambda c: (c.job_id, c.task_id, c.embedding_model_name)):
+        group: List[ChunkWithEmbeddings] = []
+        size = 0
+        for chunk in same:
+            chunk_size = len(chunk.model_dump_json())
+            if group and (len(group) >= max_size or size + chunk_size > max_bytes):
+                ret.append(ChunkGroup(chunks=group))
+                group = []
+                size = 0
+            group.append(chunk)
+            size += chunk_size
+        if group:
+            ret.append(ChunkGroup(chunks=group))
+    return ret
@@ -1,7 +1,9 @@
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
+from features.embeddings.embedding_encoding import EmbeddingEncoding
+from features.embeddings.embedding_quantization import EmbeddingPrecision
 from pydantic import BaseModel, model_validator
 
 
@@ -18,6 +20,8 @@ class ChunksRequest(BaseModel):
     text: Optional[str] = None
     input_file: Optional[GcpFile] = None
     metadata: Optional[Dict[str, str]] = None
+    embedding_encoding: EmbeddingEncoding = "float"
+    embedding_precision: EmbeddingPrecision = "float32"
 
     @model_validator(mode="after")
     def check_text_or_input_file(self) -> "ChunksRequest":
@@ -40,6 +44,24 @@ class ChunkWithEmbeddings(BaseModel):
     embedding_model_name: str
     text: str
     token_count: Optional[int] = None
-    embedding: List[float]
+    embedding: List[float] | List[int] | str
+    embedding_encoding: EmbeddingEncoding = "float"
+    embedding_precision: EmbeddingPrecision = "float32"
     metadata: Optional[Dict[str, str]] = None
     created_at: datetime = datetime.now(timezone.utc)
+
+
+class ChunkGroup(BaseModel):
+    """Chunks of one document sent together in one embedding request message.
+
+    A message with a single `ChunkWithEmbeddings` is accepted as a group of one chunk.
+    """
+
+    chunks: List[ChunkWithEmbeddings]
+
+    @model_validator(mode="before")
+    @classmethod
+    def wrap_single_chunk(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "chunks" not in data:
+            return {"chunks": [data]}
+        return data
@@ -1,9 +1,14 @@
+import itertools
 import logging
-from typing import List
+from typing import Iterator, List
 
 from features.chunks.chunk_model import ChunksRequest, ChunkWithEmbeddings
+from features.chunks.embedding_policy import EmbeddingPolicy, FixedCountPolicy
+from features.chunks.input_file_reader import InputFileReader, slice_segments
 from features.embeddings.embedding_model import EmbeddingPassageRequest
 from features.embeddings.embedding_service import EmbeddingService
+from langchain_core.documents import Document
+from telemetry import chars_counter, chunks_counter, stage, tokens_counter
 
 from .recursive_splitter import RecursiveSplitter
 
@@ -13,18 +18,34 @@ class ChunkService:
     _log = logging.getLogger(__name__)
 
     def __init__(
-        self, embedding_service: EmbeddingService, chunks_embedding_at_once: int = 4, chunk_overlap: int = 128
+        self,
+        embedding_service: EmbeddingService,
+        chunks_embedding_at_once: int = 4,
+        chunk_overlap: int = 128,
+        embedding_batch_size: int = 32,
+        use_token_offsets: bool = False,
+        input_file_reader: InputFileReader | None = None,
+        embedding_policy: EmbeddingPolicy | None = None,
     ):
         """
         Initializes the ChunkService.
 
         Args:
             embedding_service (EmbeddingService): The embedding service to use for chunking.
+            chunks_embedding_at_once (int): The maximum number of chunks embedded inline (without `embedding_policy`).
             chunk_overlap (int): The number of tokens to overlap between chunks.
+            embedding_batch_size (int): The number of chunks embedded in one forward pass.
+            use_token_offsets (bool): If True, the text is split using a single tokenization (see RecursiveSplitter).
+            input_file_reader (InputFileReader | None): The reader of input files (None - input files are rejected).
+            embedding_policy (EmbeddingPolicy | None): Decides which chunks are embedded inline
+                (None - `FixedCountPolicy` with `chunks_embedding_at_once`).
         """
         self.embedding_service = embedding_service
-        self.chunks_embedding_at_once = chunks_embedding_at_once
         self.chunk_overlap = chunk_overlap
+        self.embedding_batch_size = embedding_batch_size
+        self.use_token_offsets = use_token_offsets
+        self.input_file_reader = input_file_reader
+        self.embedding_policy = embedding_policy or FixedCountPolicy(chunks_embedding_at_once)
 
     def create_chunks(self, req: ChunksRequest, generate_embeddings: bool | None = None) -> List[ChunkWithEmbeddings]:
         """
@@ -32,6 +53,8 @@ class ChunkService:
 
         Args:
             req (ChunksRequest): The request object containing the text to chunk.
+            generate_embeddings (bool | None): Whether to embed chunks (None - the first chunks
+                chosen by `embedding_policy`; the other ones are returned without embeddings).
 
         Returns:
             List[ChunkWithEmebeddings]: A list of chunks with embeddings.
@@ -39,47 +62,119 @@ class ChunkService:
         Raises:
             ValueError: If the specified model_name is not available.
         """
-        if req.input_file:
-            from ampf.gcp import GcpFactory
+        with stage("create_chunks") as span:
+            ret = list(self.iter_chunks(req, generate_embeddings))
+            span.set_attribute("chunks", len(ret))
+        self._log.info("End chunking.")
+        return ret
+
+    def iter_chunks(self, req: ChunksRequest, generate_embeddings: bool | None = None) -> Iterator[ChunkWithEmbeddings]:
+        """
+        Create chunks for the given text and yield them as soon as they are ready.
+
+        Chunks are embedded in batches of `embedding_batch_size`, so the first chunks
+        are available before the whole text is embedded.
 
-            factory = GcpFactory(bucket_name=req.input_file.bucket)
-            bs = factory.create_blob_storage("", content_type="text/markdown")
-            file_content = bs.download_blob(req.input_file.name)
-            text = file_content.decode("utf-8")
+        Args:
+            req (ChunksRequest): The request object containing the text to chunk.
+            generate_embeddings (bool | None): Whether to embed chunks (see `create_chunks`).
+
+        Yields:
+            ChunkWithEmbeddings: The chunks in order.
+        """
+        if req.input_file:
+            reader = self.input_file_reader
+            if reader is None:
+                raise ValueError("Input files are not supported, the chunk service has no input file reader.")
+            with stage("download", input_file=req.input_file.name) as span:
+                blob = reader.get_blob(req.input_file)
+                span.set_attribute("bytes", blob.size or 0)
+            # The first pass of splitting reads the file from its first segment, which is also used
+            # to detect the language, so the start of the file is downloaded once for both
+            segments = reader.read_segments(blob)
+            if not req.language:
+                first_segment = next(segments, "")
+                segments = itertools.chain([first_segment], segments)
+                with stage("detect_language", chars=len(first_segment)) as span:
+                    req.language = self.embedding_service.detect_language(first_segment)
+                    span.set_attribute("language", req.language)
         elif req.text:
-            text = req.text
+            if not req.language:
+                with stage("detect_language", chars=len(req.text)) as span:
+                    req.language = self.embedding_service.detect_language(req.text)
+                    span.set_attribute("language", req.language)
         else:
             raise ValueError("Either 'text' or 'input_file' must be provided.")
 
-        if not req.language:
-            req.language = self.embedding_service.detect_language(text)
         if not req.embedding_model_name:
             req.embedding_model_name = self.embedding_service.find_model_name(req.language)
         model = self.embedding_service.get_model(req.embedding_model_name)
+        token_counter = self.embedding_service.get_token_counter(req.embedding_model_name)
         self._log.info("Start splitting.")
-        splitter = RecursiveSplitter(model=model, chunk_size=model.max_seq_length, chunk_overlap=self.chunk_overlap)
-        chunks = splitter.split(text)
+        splitter = RecursiveSplitter(
+            model=model,
+            chunk_size=model.max_seq_length,
+            chunk_overlap=self.chunk_overlap,
+            use_token_offsets=self.use_token_offsets,
+            token_counter=token_counter,
+        )
+        documents: Iterator[Document]
+        with stage(
+            "split", req.embedding_model_name, token_offsets=self.use_token_offsets, input_file=bool(req.input_file)
+        ) as span:
+            if req.input_file:
+                # The first pass keeps only the positions of chunks, so memory use does not depend
+                # on the file size. Chunk texts are read again from the file in the second pass.
+                spans = []
+                token_counts = []
+                for doc in splitter.split_stream(segments, reader.segment_size):
+                    start = doc.metadata["start_index"]
+                    spans.append((start, start + len(doc.page_content)))
+                    token_count = doc.metadata.get("token_count")
+                    token_counts.append(
+                        token_count if token_count is not None else token_counter.count(doc.page_content)
+                    )
+                chars = spans[-1][1] if spans else 0
+                documents = (Document(page_content=text) for text in slice_segments(reader.read_segments(blob), spans))
+            else:
+                chunks = splitter.split(req.text or "")
+                token_counts = [doc.metadata.get("token_count") for doc in chunks]
+                if None in token_counts:
+                    with stage("count_tokens", req.embedding_model_name, chunks=len(chunks)):
+                        token_counts = token_counter.count_many([doc.page_content for doc in chunks])
+                chars = len(req.text or "")
+                documents = iter(chunks)
+            span.set_attribute("chars", chars)
+            span.set_attribute("chunks", len(token_counts))
+            span.set_attribute("tokens", sum(token_counts))
+        metric_attributes = {"model": req.embedding_model_name}
+        chars_counter.add(chars, metric_attributes)
+        chunks_counter.add(len(token_counts), metric_attributes)
+        tokens_counter.add(sum(token_counts), {**metric_attributes, "stage": "split"})
         self._log.info("End splitting.")
-        total_chunks = len(chunks)
-        self._log.info("Total chunks: %s", total_chunks)
+        self._log.debug(
+            "Token counter cache: hits=%s, misses=%s, hit_rate=%.2f",
+            token_counter.stats.hits,
+            token_counter.stats.misses,
+            token_counter.stats.hit_rate,
+        )
+        total_chunks = len(token_counts)
         if generate_embeddings is None:
-            generate_embeddings = total_chunks <= self.chunks_embedding_at_once
-        if generate_embeddings:
-            self._log.info("Start generating embeddings.")
-        ret = []
-        for i, doc in enumerate(chunks):
-            if generate_embeddings:
-                e_req = EmbeddingPassageRequest(
-                    language=req.language,
-                    embedding_model_name=req.embedding_model_name,
-                    text=doc.page_content,
-                    title=doc.metadata.get("title"),
-                )
-                embedding = self.embedding_service.generate_passage_embeddings(e_req).embedding
-            else:
-                embedding = []
-            ret.append(
-                ChunkWithEmbeddings(
+            inline_chunks = self.embedding_policy.inline_chunks(req.embedding_model_name, token_counts)  # type: ignore
+        else:
+            inline_chunks = total_chunks if generate_embeddings else 0
+        self._log.info("Total chunks: %s, embedded inline: %s", total_chunks, inline_chunks)
+        start = 0
+        for batch in itertools.batched(documents, self.embedding_batch_size):
+            embedded = max(0, min(len(batch), inline_chunks - start))
+            embeddings: List[List[float] | List[int] | str] = []
+            if embedded:
+                tokens = sum(token_counts[start : start + embedded])
+                with stage("embed", req.embedding_model_name, chunks=embedded, tokens=tokens):
+                    embeddings = self.generate_embeddings(req, list(batch[:embedded]))
+            embeddings += [[] for _ in batch[embedded:]]
+            for i, doc, embedding in zip(range(start, start + len(batch)), batch, embeddings):
+                yield ChunkWithEmbeddings(
                     job_id=req.job_id,
                     task_id=req.task_id,
                     chunk_index=i,
@@ -87,11 +182,30 @@ class ChunkService:
                     language=req.language,
                     embedding_model_name=req.embedding_model_name,
                     text=doc.page_content,
-                    token_count=splitter.count_tokens(doc.page_content),
+                    token_count=token_counts[i],
                     embedding=embedding,
+                    embedding_encoding=req.embedding_encoding,
+                    embedding_precision=req.embedding_precision,
                     metadata=req.metadata,
                 )
+                self._log.info("Chunk %s/%s generated.", i + 1, total_chunks)
+            start += len(batch)
+
+    def generate_embeddings(self, req: ChunksRequest, chunks: List[Document]) -> List[List[float] | List[int] | str]:
+        """Generate passage embeddings of the chunks with batched forward passes."""
+        self._log.info("Start generating embeddings.")
+        e_reqs = [
+            EmbeddingPassageRequest(
+                language=req.language,
+                embedding_model_name=req.embedding_model_name,
+                text=doc.page_content,
+                title=doc.metadata.get("title"),
+                encoding=req.embedding_encoding,
+                precision=req.embedding_precision,
             )
-            self._log.info("Chunk %s/%s generated.", i + 1, total_chunks)
-        self._log.info("End chunking.")
-        return ret
+            for doc in chunks
+        ]
+        responses = self.embedding_service.generate_passage_embeddings_batch(e_reqs, self.embedding_batch_size)
+        embeddings = [r.embedding for r in responses]
+        self._log.info("End generating embeddings.")
+        return embeddings
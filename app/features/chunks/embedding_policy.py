@@ -0,0 +1,59 @@
+import itertools
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import Callable, List
+
+from features.embeddings.throughput_profile import ThroughputProfile
+
+
+class EmbeddingPolicy(ABC):
+    """Decides which chunks of a document are embedded inline.
+
+    The first `inline_chunks` chunks are embedded while the request is processed,
+    the remaining ones are fanned out (published without embeddings to `chunk_embedding_requests_topic`).
+    """
+
+    @abstractmethod
+    def inline_chunks(self, model_name: str, token_counts: List[int]) -> int:
+        """Return the number of chunks embedded inline.
+
+        Args:
+            model_name (str): The name of the embedding model.
+            token_counts (List[int]): The number of tokens of each chunk.
+        Returns:
+            int: The number of chunks (from the start of the document) embedded inline.
+        """
+
+
+class FixedCountPolicy(EmbeddingPolicy):
+    """Embeds all chunks inline if there are at most `max_chunks` of them, otherwise fans out all of them."""
+
+    def __init__(self, max_chunks: int = 4):
+        self.max_chunks = max_chunks
+
+    def inline_chunks(self, model_name: str, token_counts: List[int]) -> int:
+        return len(token_counts) if len(token_counts) <= self.max_chunks else 0
+
+
+class CostModelPolicy(EmbeddingPolicy):
+    """Embeds inline as many chunks as can be embedded within the time budget.
+
+    The time is estimated from the token counts of the chunks and the measured speed of the model,
+    slowed down by the current load of the inference executor. Embedding inline saves a message
+    per chunk, so a document is fanned out only in the part which would not meet the budget.
+    """
+
+    def __init__(self, throughput: ThroughputProfile, time_budget: float, load: Callable[[], float] = lambda: 1.0):
+        """
+        Args:
+            throughput (ThroughputProfile): The measured speed of the models.
+            time_budget (float): The time (in seconds) available for inline embedding.
+            load (Callable[[], float]): Returns the number of tasks sharing a worker of the inference executor.
+        """
+        self.throughput = throughput
+        self.time_budget = time_budget
+        self.load = load
+
+    def inline_chunks(self, model_name: str, token_counts: List[int]) -> int:
+        budget = self.time_budget * self.throughput.tokens_per_second(model_name) / max(1.0, self.load())
+        return bisect_right(list(itertools.accumulate(token_counts)), budget)
@@ -0,0 +1,157 @@
+import codecs
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from features.chunks.chunk_model import GcpFile
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+
+MB = 1024 * 1024
+
+
+class InputFileReader:
+    """Reads UTF-8 text files from Cloud Storage in segments.
+
+    Each segment is downloaded with a ranged request and decoded incrementally,
+    so a multi-byte character split between segments is decoded correctly
+    and only a few segments of the file are held in memory at a time.
+
+    One reader is shared by all requests. Its client keeps a pool of connections and is created
+    on first use, so with `gunicorn --preload` every worker has its own connections.
+    Segments are downloaded `read_ahead` segments ahead of the consumer in the reader's own threads,
+    so downloads overlap with consuming the previous segments. A consumer faster than the network
+    still waits for the next segment in its own thread: the splitter runs in the inference executor,
+    so such a wait holds one of its slots (but never blocks the event loop).
+    Set `STORAGE_EMULATOR_HOST` to use a local emulator instead of Cloud Storage.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        client: storage.Client | None = None,
+        default_bucket: str | None = None,
+        segment_size: int = MB,
+        pool_size: int = 10,
+        read_ahead: int = 1,
+    ):
+        """
+        Args:
+            client (storage.Client | None): The Cloud Storage client (None - created on first use).
+            default_bucket (str | None): The bucket of files which do not specify it.
+            segment_size (int): The number of bytes downloaded in one request.
+            pool_size (int): The maximum number of connections and concurrent downloads.
+            read_ahead (int): The number of segments downloaded ahead of the consumer.
+        """
+        self._client = client
+        self._owns_client = client is None
+        self.default_bucket = default_bucket
+        self.segment_size = segment_size
+        self.pool_size = pool_size
+        self.read_ahead = read_ahead
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def client(self) -> storage.Client:
+        with self._lock:
+            if self._client is None:
+                client = storage.Client()
+                # The connection pool is configured on the client's HTTP session, `_http` (a private API of
+                # google-cloud-core, stable across versions). Passing an own session with the `_http`
+                # argument would require resolving the credentials here, including for the emulator.
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                client._http.mount("https://", adapter)
+                client._http.mount("http://", adapter)
+                self._client = client
+            return self._client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix="storage")
+            return self._executor
+
+    def close(self) -> None:
+        """Stop the download threads and close the connections."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._client is not None and self._owns_client:
+                self._client.close()
+                self._client = None
+
+    def get_blob(self, input_file: GcpFile) -> storage.Blob:
+        """Get the blob of the file, pinned to its current generation.
+
+        Reading the blob more than once returns the same content even if the file is overwritten meanwhile.
+
+        Raises:
+            ValueError: If the bucket is not given.
+            FileNotFoundError: If the file does not exist.
+        """
+        bucket_name = input_file.bucket or self.default_bucket
+        if not bucket_name:
+            raise ValueError(f"Bucket of the input file '{input_file.name}' is not given.")
+        blob = self.client.bucket(bucket_name).get_blob(input_file.name)
+        if blob is None:
+            raise FileNotFoundError(f"gs://{bucket_name}/{input_file.name}")
+        self._log.info("Input file gs://%s/%s, size: %s bytes", bucket_name, input_file.name, blob.size)
+        return blob
+
+    def read_segments(self, blob: storage.Blob) -> Iterator[str]:
+        """Download the blob in segments and yield them decoded."""
+        return decode_utf8(self._download_segments(blob))
+
+    def _download_segments(self, blob: storage.Blob) -> Iterator[bytes]:
+        size = blob.size or 0
+        pending: deque[Future[bytes]] = deque()
+        try:
+            for start in range(0, size, self.segment_size):
+                end = min(start + self.segment_size, size) - 1
+                pending.append(self.executor.submit(blob.download_as_bytes, start=start, end=end))
+                if len(pending) > self.read_ahead:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # The consumer stopped early
+            for future in pending:
+                future.cancel()
+
+
+def decode_utf8(segments: Iterable[bytes]) -> Iterator[str]:
+    """Decode UTF-8 text split into byte segments at arbitrary positions."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for segment in segments:
+        text = decoder.decode(segment)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def slice_segments(segments: Iterable[str], spans: Iterable[tuple[int, int]]) -> Iterator[str]:
+    """Yield the text spans [start, end) of text read in segments.
+
+    Spans must be ordered by start (they may overlap). Only the text from the start
+    of the current span to the end of the last read segment is kept in memory.
+    """
+    it = iter(segments)
+    buffer = ""
+    offset = 0  # position of the buffer in the whole text
+    for start, end in spans:
+        while offset + len(buffer) < end:
+            segment = next(it, None)
+            if segment is None:
+                break
+            buffer += segment
+        buffer = buffer[start - offset :]
+        offset = start
+        yield buffer[: end - start]
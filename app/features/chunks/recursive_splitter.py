@@ -1,24 +1,110 @@
-from typing import List
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Iterable, Iterator, List
 
+from features.embeddings.token_counter import TokenCounter
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
 
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class TokenOffsets:
+    """
+    Token positions of a whole document, used to count tokens of any text span without re-tokenizing it.
+
+    Counts are estimates: tokenizing the span alone may differ from the whole text near the span's boundaries
+    (e.g. a word at the start of a text is tokenized without its preceding space).
+    """
+
+    def __init__(self, starts: List[int], ends: List[int], spaced: List[bool] | None = None):
+        self.starts = starts
+        self.ends = ends
+        self.spaced = spaced if spaced is not None else [False] * len(starts)
+
+    @classmethod
+    def from_offset_mapping(cls, text: str, offset_mapping: List[tuple[int, int]]) -> "TokenOffsets":
+        """
+        Creates token offsets from a tokenizer's offset mapping.
+
+        Leading whitespace is left out of tokens (byte-level BPE tokenizers include the preceding space
+        in a word's token), so a chunk stripped of whitespace starts at the start of its first token.
+        """
+        starts = []
+        ends = []
+        spaced = []
+        for start, end in offset_mapping:
+            stripped = start
+            while stripped < end and text[stripped].isspace():
+                stripped += 1
+            if stripped == end:  # a whitespace token
+                stripped = start
+            starts.append(stripped)
+            ends.append(end)
+            spaced.append(stripped > start)
+        return cls(starts, ends, spaced)
+
+    def count(self, start: int, end: int) -> int:
+        """
+        Returns the number of tokens overlapping the text span [start, end).
+
+        A token cut by a span boundary is counted in both spans, so the count never falls short.
+        """
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def is_inside_token(self, pos: int) -> bool:
+        """
+        Returns True if the position is within a token (not at its start), so a span boundary there cuts the token.
+        """
+        i = bisect_right(self.starts, pos) - 1
+        return i >= 0 and self.starts[i] < pos < self.ends[i]
+
+    def is_spaced_token(self, pos: int) -> bool:
+        """
+        Returns True if a token starting at the position included preceding whitespace, so it may be
+        tokenized differently at the start of a text.
+        """
+        i = bisect_left(self.starts, pos)
+        return i < len(self.starts) and self.starts[i] == pos and self.spaced[i]
+
 
 class RecursiveSplitter:
     """
     Splits text into chunks recursively based on character count and embedding model tokens.
     """
 
-    def __init__(self, model: SentenceTransformer, chunk_size: int, chunk_overlap: int = 128):
+    def __init__(
+        self,
+        model: SentenceTransformer,
+        chunk_size: int,
+        chunk_overlap: int = 128,
+        use_token_offsets: bool = False,
+        token_counter: TokenCounter | None = None,
+    ):
+        """
+        Args:
+            model (SentenceTransformer): The model whose tokenizer measures chunk length.
+            chunk_size (int): The maximum number of tokens in a chunk.
+            chunk_overlap (int): The number of tokens to overlap between chunks.
+            use_token_offsets (bool): If True, the text is tokenized once and chunk boundaries are chosen
+                from token offsets instead of tokenizing every candidate piece.
+            token_counter (TokenCounter | None): If given, it is used to count tokens instead of `model.tokenize`.
+        """
         self.model = model
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.use_token_offsets = use_token_offsets
+        self.token_counter = token_counter
 
     def split(self, text: str) -> List[Document]:
         """
         Split the given text into chunks recursively.
+
+        In token offsets mode each chunk has its token count in `metadata["token_count"]`.
         """
+        if self.use_token_offsets:
+            return self.split_by_token_offsets(text) or [Document(page_content="")]
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
@@ -28,9 +114,164 @@ class RecursiveSplitter:
         chunks = text_splitter.create_documents([text])
         return chunks or [Document(page_content="")]
 
+    def split_stream(self, segments: Iterable[str], min_buffer_size: int) -> Iterator[Document]:
+        """
+        Split text read in segments, yielding chunks as soon as they are final.
+
+        Segments are appended to a buffer of at least `min_buffer_size` characters, which is split.
+        The last two chunks of the buffer are held back, because the text after the buffer may change
+        them; the buffer restarts at the first held back chunk, so chunk overlap is preserved.
+        Each chunk has its position in the whole text in `metadata["start_index"]`.
+        """
+        buffer = ""
+        offset = 0  # position of the buffer in the whole text
+        emitted = False
+        for segment in segments:
+            buffer += segment
+            if len(buffer) < min_buffer_size:
+                continue
+            chunks = self._locate(buffer, self.split(buffer))
+            if len(chunks) <= 2:
+                continue
+            for doc in chunks[:-2]:
+                doc.metadata["start_index"] += offset
+                yield doc
+            emitted = True
+            restart = chunks[-2].metadata["start_index"]
+            buffer = buffer[restart:]
+            offset += restart
+        for doc in self._locate(buffer, self.split(buffer)):
+            if doc.page_content or not emitted:
+                doc.metadata["start_index"] += offset
+                yield doc
+
+    def _locate(self, text: str, chunks: List[Document]) -> List[Document]:
+        """Set the position of each chunk in the text (chunks are stripped substrings of the text in order).
+
+        Raises:
+            ValueError: If a chunk is not found in the text, so positions (and chunk texts read again
+                from them) would be wrong.
+        """
+        pos = 0
+        for i, doc in enumerate(chunks):
+            start = text.find(doc.page_content, pos)
+            if start == -1:
+                raise ValueError(f"Chunk {i} is not a substring of the split text after position {pos}.")
+            doc.metadata["start_index"] = start
+            pos = start + 1
+        return chunks
+
     def count_tokens(self, text: str) -> int:
         """
         Returns the number of tokens in the given text according to the SentenceTransformer model.
         """
+        if self.token_counter:
+            return self.token_counter.count(text)
         # Tokenize the input text and count the number of token IDs
         return len(self.model.tokenize([text])["input_ids"].tolist()[0])
+
+    def split_by_token_offsets(self, text: str) -> List[Document]:
+        """
+        Split the given text using a single tokenization of the whole text.
+
+        Chunk boundaries are chosen on the same separators as `RecursiveCharacterTextSplitter`,
+        but the length of every piece is estimated from the token offsets of the whole text (see `TokenOffsets`).
+        Token counts of chunks are exact for tokenizers which tokenize whitespace separated words independently:
+        only the first word of a chunk is tokenized again if its token included the preceding space
+        (byte-level BPE). Chunks cut inside a token (when a piece is split between characters) are tokenized again.
+        A chunk over `chunk_size` after counting again is split again.
+        """
+        tokenizer = self.model.tokenizer
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        offsets = TokenOffsets.from_offset_mapping(text, encoding["offset_mapping"])
+        special_tokens = tokenizer.num_special_tokens_to_add()
+        budget = self.chunk_size - special_tokens
+        ret = []
+        for start, end in self._split_span(text, 0, len(text), SEPARATORS, offsets, budget):
+            # Strip whitespace like RecursiveCharacterTextSplitter does
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start >= end:
+                continue
+            if offsets.is_inside_token(start) or offsets.is_inside_token(end):
+                token_count = self.count_tokens(text[start:end])
+            elif offsets.is_spaced_token(start):
+                word_end = start
+                while word_end < end and not text[word_end].isspace():
+                    word_end += 1
+                token_count = self.count_tokens(text[start:word_end]) + offsets.count(word_end, end)
+            else:
+                token_count = offsets.count(start, end) + special_tokens
+            if token_count > self.chunk_size and end - start < len(text.strip()):
+                ret.extend(self.split_by_token_offsets(text[start:end]))
+                continue
+            ret.append(Document(page_content=text[start:end], metadata={"token_count": token_count}))
+        return ret
+
+    def _split_span(
+        self, text: str, start: int, end: int, separators: List[str], offsets: TokenOffsets, budget: int
+    ) -> List[tuple[int, int]]:
+        """Recursively split the span [start, end) of text into spans of at most `budget` tokens."""
+        separator = separators[-1]
+        new_separators = []
+        for i, s in enumerate(separators):
+            if s == "":
+                separator = s
+                break
+            if text.find(s, start, end) != -1:
+                separator = s
+                new_separators = separators[i + 1 :]
+                break
+
+        ret = []
+        good_spans: List[tuple[int, int, int]] = []
+        for s_start, s_end in self._split_on_separator(text, start, end, separator):
+            length = offsets.count(s_start, s_end)
+            if length <= budget:
+                good_spans.append((s_start, s_end, length))
+            else:
+                if good_spans:
+                    ret.extend(self._merge_spans(good_spans, budget))
+                    good_spans = []
+                if not new_separators:
+                    ret.append((s_start, s_end))
+                else:
+                    ret.extend(self._split_span(text, s_start, s_end, new_separators, offsets, budget))
+        if good_spans:
+            ret.extend(self._merge_spans(good_spans, budget))
+        return ret
+
+    def _split_on_separator(self, text: str, start: int, end: int, separator: str) -> List[tuple[int, int]]:
+        """Split the span [start, end) on separator, keeping the separator at the start of each piece."""
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        ret = []
+        prev = start
+        pos = text.find(separator, start, end)
+        while pos != -1:
+            if pos > prev:
+                ret.append((prev, pos))
+            prev = pos
+            pos = text.find(separator, pos + len(separator), end)
+        if end > prev:
+            ret.append((prev, end))
+        return ret
+
+    def _merge_spans(self, spans: List[tuple[int, int, int]], budget: int) -> List[tuple[int, int]]:
+        """Merge adjacent spans (start, end, length) into chunks of at most `budget` tokens with overlap."""
+        ret = []
+        current: deque[tuple[int, int, int]] = deque()
+        total = 0
+        for span in spans:
+            length = span[2]
+            if current and total + length > budget:
+                ret.append((current[0][0], current[-1][1]))
+                while current and (total > self.chunk_overlap or total + length > budget):
+                    total -= current.popleft()[2]
+            current.append(span)
+            total += length
+        if current:
+            ret.append((current[0][0], current[-1][1]))
+        return ret
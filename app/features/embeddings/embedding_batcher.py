@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from typing import List
+
+import numpy as np
+from inference_executor import InferenceExecutor, InferenceExecutorSaturated
+from pydantic import BaseModel, computed_field
+
+from .embedding_encoding import EmbeddingEncoding
+from .embedding_model import EmbeddingPassageRequest, EmbeddingQueryRequest, EmbeddingResponse
+from .embedding_quantization import EmbeddingPrecision
+from .embedding_service import EmbeddingService
+from .model_manager import ModelNotFound
+
+
+class EmbeddingBatcherStats(BaseModel):
+    batches: int = 0
+    items: int = 0
+    max_batch_size: int = 0
+    total_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+
+    @computed_field
+    @property
+    def avg_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    @computed_field
+    @property
+    def avg_queue_wait(self) -> float:
+        return self.total_queue_wait / self.items if self.items else 0.0
+
+    def add_batch(self, queue_waits: List[float]) -> None:
+        self.batches += 1
+        self.items += len(queue_waits)
+        self.max_batch_size = max(self.max_batch_size, len(queue_waits))
+        self.total_queue_wait += sum(queue_waits)
+        self.max_queue_wait = max(self.max_queue_wait, *queue_waits)
+
+
+class EmbeddingBatcher:
+    """Collects concurrent embedding requests into batches.
+
+    Each (model, prompt) pair has its own queue. A worker takes the first waiting
+    request, collects more for up to `max_wait_ms` or until `max_batch_size` is reached,
+    and encodes them with one call of the model in the inference executor.
+    If a batch fails, its texts are encoded one by one, so only the failing requests get an error.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        inference_executor: InferenceExecutor | None = None,
+    ):
+        """
+        Args:
+            embedding_service (EmbeddingService): The embedding service.
+            max_batch_size (int): The maximum number of texts encoded together.
+            max_wait_ms (float): The maximum time the first request of a batch waits for others.
+            inference_executor (InferenceExecutor | None): The executor running the model.
+        """
+        self.embedding_service = embedding_service
+        self.inference_executor = inference_executor or InferenceExecutor()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats: dict[str, EmbeddingBatcherStats] = {}
+        self._queues: dict[tuple[str, str | None], asyncio.Queue] = {}
+        self._workers: dict[tuple[str, str | None], asyncio.Task] = {}
+
+    async def generate_embeddings(
+        self,
+        model_name: str,
+        text: str,
+        encoding: EmbeddingEncoding = "float",
+        precision: EmbeddingPrecision = "float32",
+    ) -> list[float] | list[int] | str:
+        """Batched version of `EmbeddingService.generate_embeddings`."""
+        embedding = await self.encode(model_name, text)
+        return await self.export_embedding(model_name, embedding, precision, encoding)
+
+    async def generate_query_embeddings(self, req: EmbeddingQueryRequest) -> EmbeddingResponse:
+        """Batched version of `EmbeddingService.generate_query_embeddings`."""
+        model_name = await self.resolve_model_name(req)
+        text, prompt_name = self.embedding_service.format_query(req)
+        embedding = await self.export_embedding(
+            model_name, await self.encode(model_name, text, prompt_name), req.precision, req.encoding
+        )
+        return EmbeddingResponse(embedding=embedding, language=req.language, embedding_model_name=model_name)  # type: ignore
+
+    async def generate_passage_embeddings(self, req: EmbeddingPassageRequest) -> EmbeddingResponse:
+        """Batched version of `EmbeddingService.generate_passage_embeddings`."""
+        model_name = await self.resolve_model_name(req)
+        embedding = await self.export_embedding(
+            model_name,
+            await self.encode(model_name, self.embedding_service.format_passage(req)),
+            req.precision,
+            req.encoding,
+        )
+        return EmbeddingResponse(embedding=embedding, language=req.language, embedding_model_name=model_name)  # type: ignore
+
+    async def resolve_model_name(self, req: EmbeddingQueryRequest | EmbeddingPassageRequest) -> str:
+        """`EmbeddingService.resolve_model_name` which detects the language in the inference executor if needed."""
+        if not req.language:
+            return await self.inference_executor.run(self.embedding_service.resolve_model_name, req)
+        return self.embedding_service.resolve_model_name(req)
+
+    async def export_embedding(
+        self, model_name: str, embedding: np.ndarray, precision: EmbeddingPrecision, encoding: EmbeddingEncoding
+    ) -> list[float] | list[int] | str:
+        """`EmbeddingService.export_embedding` which calibrates the model in the inference executor if needed."""
+        if self.embedding_service.needs_calibration(model_name, precision):
+            await self.inference_executor.run(self.embedding_service.get_quantization_ranges, model_name)
+        return self.embedding_service.export_embedding(model_name, embedding, precision, encoding)
+
+    async def encode(self, model_name: str, text: str, prompt_name: str | None = None) -> np.ndarray:
+        """Queue an already formatted text and wait for its embedding.
+
+        Args:
+            model_name (str): The name of the model.
+            text (str): The text.
+            prompt_name (str | None): The name of the model's prompt.
+        Returns:
+            np.ndarray: The embedding.
+        Raises:
+            ModelNotFound: If the model is not available.
+        """
+        key = (model_name, prompt_name)
+        if key not in self._queues:
+            # Unknown names would leave a queue and an idle worker behind
+            if model_name not in self.embedding_service.get_model_names():
+                raise ModelNotFound(f"Model '{model_name}' not found.")
+            self._queues[key] = asyncio.Queue()
+            self._workers[key] = asyncio.create_task(self._run_worker(key))
+        future = asyncio.get_running_loop().create_future()
+        await self._queues[key].put((text, future, time.perf_counter()))
+        return await future
+
+    async def close(self) -> None:
+        """Stop all workers. Requests still queued are cancelled."""
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        for queue in self._queues.values():
+            while not queue.empty():
+                queue.get_nowait()[1].cancel()
+        self._workers.clear()
+        self._queues.clear()
+
+    async def _run_worker(self, key: tuple[str, str | None]) -> None:
+        model_name, prompt_name = key
+        queue = self._queues[key]
+        loop = asyncio.get_running_loop()
+        stats = self.stats.setdefault(model_name, EmbeddingBatcherStats())
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except TimeoutError:
+                    break
+            now = time.perf_counter()
+            stats.add_batch([now - queued_at for _, _, queued_at in batch])
+            try:
+                await self._encode_batch(model_name, prompt_name, batch)
+            except InferenceExecutorSaturated as e:
+                self._set_exception(batch, e)
+            except Exception as e:
+                self._log.warning("Batch of %s texts failed for model %s: %s", len(batch), model_name, e)
+                if len(batch) == 1:
+                    self._set_exception(batch, e)
+                    continue
+                for item in batch:
+                    try:
+                        await self._encode_batch(model_name, prompt_name, [item])
+                    except Exception as e:
+                        self._set_exception([item], e)
+
+    async def _encode_batch(self, model_name: str, prompt_name: str | None, batch: list) -> None:
+        texts = [text for text, _, _ in batch]
+        embeddings = await self.inference_executor.run(
+            self.embedding_service.encode, model_name, texts, prompt_name, len(texts)
+        )
+        for (_, future, _), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def _set_exception(self, batch: list, e: Exception) -> None:
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(e)
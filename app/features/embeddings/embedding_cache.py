@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+from pydantic import BaseModel, computed_field
+
+
+class EmbeddingCacheStats(BaseModel):
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+
+    @computed_field
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EmbeddingCache:
+    """Content-addressed cache of embeddings.
+
+    Embeddings are keyed by the hash of the model name, the prompt name and the text
+    exactly as it is encoded (so with the title or query prefix added by the model's format).
+    Recently used embeddings are kept in memory; optionally all of them are also stored
+    in a local SQLite file which survives restarts. Both tiers evict least recently used entries.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(self, max_size: int = 10000, disk_path: Optional[str] = None, max_disk_size: int = 1000000):
+        """
+        Args:
+            max_size (int): The maximum number of embeddings kept in memory.
+            disk_path (Optional[str]): The SQLite file of the disk tier (None - no disk tier).
+            max_disk_size (int): The maximum number of embeddings kept on disk.
+        """
+        self.max_size = max_size
+        self.max_disk_size = max_disk_size
+        self.stats = EmbeddingCacheStats()
+        self._memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk_path = disk_path
+        self._db: sqlite3.Connection | None = None
+        self._db_pid = 0
+        if disk_path:
+            db = sqlite3.connect(disk_path)
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, embedding BLOB, accessed REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+            db.commit()
+            (disk_size,) = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            db.close()
+            self._log.info("Embedding cache on disk: %s, embeddings: %s", disk_path, disk_size)
+
+    @staticmethod
+    def key(model_name: str, prompt_name: str | None, text: str) -> bytes:
+        """Return the cache key of the text encoded by the model with the prompt."""
+        return hashlib.sha256(f"{model_name}\0{prompt_name or ''}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> List[np.ndarray | None]:
+        """Return cached embeddings (or None) for the keys."""
+        ret: List[np.ndarray | None] = [None] * len(keys)
+        with self._lock:
+            self._connect()
+            missing = []
+            for i, key in enumerate(keys):
+                embedding = self._memory.get(key)
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    ret[i] = embedding
+                else:
+                    missing.append(i)
+            if missing and self._db:
+                found = self._get_from_disk({keys[i] for i in missing})
+                for i in missing:
+                    embedding = found.get(keys[i])
+                    if embedding is not None:
+                        ret[i] = embedding
+                        self.stats.disk_hits += 1
+                        self._put_in_memory(keys[i], embedding)
+            misses = sum(1 for e in ret if e is None)
+            self.stats.misses += misses
+            self.stats.hits += len(keys) - misses
+        return ret
+
+    def put_many(self, keys: List[bytes], embeddings: List[np.ndarray] | np.ndarray) -> None:
+        """Store embeddings for the keys."""
+        rows = []
+        with self._lock:
+            self._connect()
+            now = time.time()
+            for key, embedding in zip(keys, embeddings):
+                embedding = np.array(embedding, dtype=np.float32)
+                embedding.flags.writeable = False
+                self._put_in_memory(key, embedding)
+                if self._db:
+                    rows.append((key, embedding.tobytes(), now))
+            if self._db:
+                # An embedding of a stored key is the same, so only new keys are inserted
+                cursor = self._db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, embedding, accessed) VALUES (?, ?, ?)", rows
+                )
+                if cursor.rowcount < len(rows):
+                    # Keys stored earlier (e.g. by another worker) are marked as recently used
+                    self._db.executemany(
+                        "UPDATE embeddings SET accessed = ? WHERE key = ?", [(now, key) for key, _, _ in rows]
+                    )
+                if cursor.rowcount > 0:
+                    self._evict_from_disk()
+                self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.disk_path = None
+            if self._db:
+                self._db.close()
+                self._db = None
+
+    def _connect(self) -> None:
+        """Open the disk tier in the current process.
+
+        The cache may be created before gunicorn forks workers and an SQLite connection
+        must not be used across fork, so each process opens its own one.
+        """
+        if self.disk_path and (self._db is None or self._db_pid != os.getpid()):
+            self._db = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+
+    def _put_in_memory(self, key: bytes, embedding: np.ndarray) -> None:
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _get_from_disk(self, keys: set[bytes]) -> dict[bytes, np.ndarray]:
+        assert self._db
+        keys_list = list(keys)
+        ret = {}
+        # SQLite limits the number of parameters in a query
+        for start in range(0, len(keys_list), 500):
+            part = keys_list[start : start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._db.execute(
+                f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", part
+            ).fetchall()
+            for key, blob in rows:
+                ret[key] = np.frombuffer(blob, dtype=np.float32)
+            if rows:
+                self._db.execute(
+                    f"UPDATE embeddings SET accessed = ? WHERE key IN ({placeholders})", [time.time(), *part]
+                )
+        self._db.commit()
+        return ret
+
+    def _evict_from_disk(self) -> None:
+        """Delete the least recently used embeddings over `max_disk_size`.
+
+        The file may be shared by several worker processes, so the embeddings are counted in the file
+        (within the write transaction of the insert, so other processes cannot change it meanwhile).
+        """
+        assert self._db
+        (disk_size,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if disk_size > self.max_disk_size:
+            cursor = self._db.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+                (disk_size - self.max_disk_size,),
+            )
+            self.stats.disk_evictions += cursor.rowcount
@@ -0,0 +1,59 @@
+import base64
+from typing import List, Literal
+
+import numpy as np
+
+from .embedding_quantization import EmbeddingPrecision
+
+EmbeddingEncoding = Literal["float", "base64", "float32", "float16"]
+"""How an embedding is represented in JSON.
+
+* float - list of floats (default)
+* base64 - base64 encoded little-endian float32 values
+* float32 - the same as base64
+* float16 - base64 encoded little-endian float16 values
+
+Quantized embeddings (see `EmbeddingPrecision`) are a list of integers
+or, in any binary encoding, base64 encoded raw bytes.
+"""
+
+_DTYPES = {"base64": "<f4", "float32": "<f4", "float16": "<f2"}
+_QUANTIZED_DTYPES = {"int8": np.int8, "uint8": np.uint8, "binary": np.int8, "ubinary": np.uint8}
+
+
+def encode_embedding(embedding: np.ndarray, encoding: EmbeddingEncoding = "float") -> List[float] | List[int] | str:
+    """Convert the embedding to the requested representation.
+
+    Args:
+        embedding (np.ndarray): The embedding (float or quantized).
+        encoding (EmbeddingEncoding): The representation.
+    Returns:
+        List[float] | List[int] | str: List of numbers or base64 encoded bytes.
+    """
+    if encoding == "float":
+        return embedding.tolist()
+    if embedding.dtype.kind in "iu":
+        return base64.b64encode(embedding.tobytes()).decode("ascii")
+    return base64.b64encode(np.asarray(embedding, dtype=_DTYPES[encoding]).tobytes()).decode("ascii")
+
+
+def decode_embedding(
+    embedding: List[float] | List[int] | str,
+    encoding: EmbeddingEncoding = "float",
+    precision: EmbeddingPrecision = "float32",
+) -> np.ndarray:
+    """Convert the embedding from its representation back to an array.
+
+    Args:
+        embedding (List[float] | List[int] | str): List of numbers or base64 encoded bytes.
+        encoding (EmbeddingEncoding): The representation.
+        precision (EmbeddingPrecision): The precision of the embedding.
+    Returns:
+        np.ndarray: The embedding (float32 or the quantized type).
+    """
+    dtype = _QUANTIZED_DTYPES.get(precision)
+    if encoding == "float" or isinstance(embedding, list):
+        return np.array(embedding, dtype=dtype or np.float32)
+    if dtype:
+        return np.frombuffer(base64.b64decode(embedding), dtype=dtype)
+    return np.frombuffer(base64.b64decode(embedding), dtype=_DTYPES[encoding]).astype(np.float32)
@@ -1,20 +1,42 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
+from .embedding_encoding import EmbeddingEncoding
+from .embedding_quantization import EmbeddingPrecision
+
 
 class EmbeddingQueryRequest(BaseModel):
     language: Optional[str] = None
     embedding_model_name: Optional[str] = None
     text: str
+    encoding: EmbeddingEncoding = "float"
+    precision: EmbeddingPrecision = "float32"
 
 class EmbeddingPassageRequest(BaseModel):
     language: Optional[str] = None
     embedding_model_name: Optional[str] = None
     title: Optional[str] = None
     text: str
+    encoding: EmbeddingEncoding = "float"
+    precision: EmbeddingPrecision = "float32"
+
+class EmbeddingQueryBatchRequest(BaseModel):
+    items: List[EmbeddingQueryRequest]
+
+class EmbeddingPassageBatchRequest(BaseModel):
+    items: List[EmbeddingPassageRequest]
 
 class EmbeddingResponse(BaseModel):
     language: str
     embedding_model_name: str
-    embedding: List[float]
+    embedding: List[float] | List[int] | str
+
+class ModelStartup(BaseModel):
+    load_time: Optional[float] = None
+    warmup_time: Optional[float] = None
+
+class Readiness(BaseModel):
+    ready: bool
+    models: Dict[str, ModelStartup]
+    failed_models: List[str] = []
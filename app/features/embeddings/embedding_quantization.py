@@ -0,0 +1,68 @@
+import os
+from typing import List, Literal
+
+import numpy as np
+from sentence_transformers import SentenceTransformer, quantize_embeddings
+
+EmbeddingPrecision = Literal["float32", "int8", "uint8", "binary", "ubinary"]
+"""Precision of the embedding values.
+
+* float32 - full precision (default)
+* int8, uint8 - one byte per dimension, scaled with the calibration ranges of the model
+* binary, ubinary - one bit per dimension (the sign), packed into int8 or uint8 values
+"""
+
+CALIBRATION_FILE = "quantization_ranges.npy"
+"""File with the calibration ranges, stored in the model's directory."""
+
+
+class ModelNotCalibrated(ValueError):
+    """Raised when int8 or uint8 precision is requested for a model without calibration ranges."""
+
+
+def calibration_path(data_dir: str, model_name: str) -> str:
+    """Return the path of the calibration ranges of the model."""
+    return os.path.join(data_dir, model_name, CALIBRATION_FILE)
+
+
+def read_calibration_corpus(path: str) -> List[str]:
+    """Read sample passages used for calibration, one per line."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def calibrate(model: SentenceTransformer, texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """Compute the calibration ranges of the model from sample texts.
+
+    Args:
+        model (SentenceTransformer): The model.
+        texts (List[str]): The sample texts.
+        batch_size (int): The number of texts encoded in one forward pass.
+    Returns:
+        np.ndarray: The minimum and maximum values of each dimension, shape (2, dim).
+    """
+    if not texts:
+        raise ValueError("Calibration corpus is empty.")
+    embeddings = model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return np.stack([embeddings.min(axis=0), embeddings.max(axis=0)]).astype(np.float32)
+
+
+def quantize(embeddings: np.ndarray, precision: EmbeddingPrecision, ranges: np.ndarray | None = None) -> np.ndarray:
+    """Quantize embeddings to the given precision.
+
+    Args:
+        embeddings (np.ndarray): The float embeddings (one or more rows).
+        precision (EmbeddingPrecision): The precision.
+        ranges (np.ndarray | None): The calibration ranges, required for int8 and uint8.
+    Returns:
+        np.ndarray: The quantized embeddings.
+    """
+    if precision == "float32":
+        return embeddings
+    if precision in ("int8", "uint8"):
+        if ranges is None:
+            raise ValueError(f"Calibration ranges are required for {precision} precision.")
+        # Values outside of the calibration ranges would overflow
+        embeddings = np.clip(embeddings, ranges[0], ranges[1])
+    quantized = quantize_embeddings(np.atleast_2d(embeddings), precision, ranges=ranges)
+    return quantized[0] if embeddings.ndim == 1 else quantized  # type: ignore
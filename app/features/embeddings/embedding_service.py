@@ -1,11 +1,41 @@
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Sequence
 
+import numpy as np
 from app_config import AppConfig
-from lingua import IsoCode639_1, Language, LanguageDetectorBuilder
+from lingua import IsoCode639_1, Language, LanguageDetector, LanguageDetectorBuilder
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+from profiling import profile_torch
 from sentence_transformers import SentenceTransformer
+from telemetry import batch_size_histogram, stage, tokens_counter
 
-from .embedding_model import EmbeddingPassageRequest, EmbeddingQueryRequest, EmbeddingResponse
+from .embedding_cache import EmbeddingCache
+from .embedding_encoding import EmbeddingEncoding, encode_embedding
+from .embedding_model import (
+    EmbeddingPassageRequest,
+    EmbeddingQueryRequest,
+    EmbeddingResponse,
+    ModelStartup,
+    Readiness,
+)
+from .embedding_quantization import (
+    EmbeddingPrecision,
+    ModelNotCalibrated,
+    calibrate,
+    calibration_path,
+    quantize,
+    read_calibration_corpus,
+)
+from .length_buckets import padding_ratio, plan_batches
+from .model_backend import load_model, onnx_file_size
+from .model_manager import ModelManager
+from .throughput_profile import ThroughputProfile
+from .token_counter import TokenCounter
 
 
 class EmbeddingService:
@@ -14,25 +44,150 @@ class EmbeddingService:
     def __init__(self, config: AppConfig):
         self.data_dir = config.data_dir
         self.default_model_for_language = config.default_model_for_language
-        self.models: dict[str, SentenceTransformer | None] = {}
+        self.token_count_cache_size = config.token_count_cache_size
+        self.language_detection_sample_size = config.language_detection_sample_size
+        self.language_detection_samples = config.language_detection_samples
+        self.language_detection_min_confidence = config.language_detection_min_confidence
+        # The detector is immutable after build, so it is safely shared between threads
+        self.language_detector = self.build_language_detector()
+        self.token_counters: dict[str, TokenCounter] = {}
+        self.embedding_cache = (
+            EmbeddingCache(
+                config.embedding_cache_size, config.embedding_cache_disk_path, config.embedding_cache_disk_size
+            )
+            if config.embedding_cache_size
+            else None
+        )
+        self.quantization_calibration_corpus = config.quantization_calibration_corpus
+        self.model_backends = config.model_backends
+        self.onnx_quantization_config = config.onnx_quantization_config
+        self.quantization_ranges: dict[str, np.ndarray] = {}
+        self._calibration_lock = threading.Lock()
+        self._calibration_locks: dict[str, threading.Lock] = {}
+        self.pinned_models = (
+            config.pinned_models
+            if config.pinned_models is not None
+            else list(dict.fromkeys(config.default_model_for_language.values()))
+        )
+        self.model_manager = ModelManager(
+            self.data_dir, self.load_model, config.model_memory_budget_mb, self.pinned_models, self.model_file_size
+        )
+        self.warmup_sequence_lengths = config.model_warmup_sequence_lengths
+        self.warmup_batch_size = config.model_warmup_batch_size
+        self.warmup_times: dict[str, float] = {}
+        self.failed_models: List[str] = []
+        self.batch_token_budget = config.embedding_batch_token_budget
+        self.throughput = ThroughputProfile(config.embedding_default_tokens_per_second)
+        self.ready = False
+        self.register_metrics()
         self.load_models()
 
+    @property
+    def models(self) -> dict[str, SentenceTransformer]:
+        """The loaded models."""
+        return self.model_manager.models
+
     def load_models(self):
-        """Load all available models."""
-        for model_name in self.get_model_names():
-            self.get_model(model_name)
+        """Load the pinned models which are available in parallel. Other models are loaded on first use."""
+        available = self.get_model_names()
+        model_names = [model_name for model_name in self.pinned_models if model_name in available]
+        if not model_names:
+            return
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(model_names), thread_name_prefix="load-model") as executor:
+            list(executor.map(self.get_model, model_names))
+        self._log.info(f"Loaded {len(model_names)} models in {time.perf_counter() - start:.2f} s")
+
+    def warm_up_models(self) -> None:
+        """Warm up the loaded models and mark the service as ready if all of them are warmed up.
+
+        It should be run in each worker process, because PyTorch thread pools
+        started before gunicorn forks workers are not usable in the workers.
+        Models which fail to warm up are recorded in `failed_models` and the service stays not ready.
+        """
+        for model_name in list(self.models):
+            try:
+                self.warm_up(model_name)
+            except Exception:
+                self._log.exception(f"Warm-up of model {model_name} failed")
+                self.failed_models.append(model_name)
+        self.ready = not self.failed_models
+
+    def warm_up(self, model_name: str) -> float:
+        """Encode a synthetic batch of texts at typical sequence lengths with the model.
+
+        Args:
+            model_name (str): The name of the model.
+        Returns:
+            float: The warm-up duration in seconds.
+        """
+        start = time.perf_counter()
+        with self.model_manager.use(model_name) as model:
+            for i, length in enumerate(self.warmup_sequence_lengths):
+                # Each "a" is about one token, so the texts have about `length` tokens
+                texts = [" ".join(["a"] * length)] * self.warmup_batch_size
+                pass_start = time.perf_counter()
+                model.encode(texts, batch_size=self.warmup_batch_size, show_progress_bar=False)
+                if i > 0:
+                    # The first pass includes one-time initialization, so it does not show the speed
+                    self.throughput.record(model_name, length * len(texts), time.perf_counter() - pass_start)
+        duration = time.perf_counter() - start
+        self.warmup_times[model_name] = duration
+        self._log.info(f"Warmed up model {model_name} in {duration:.2f} s")
+        return duration
+
+    def get_readiness(self) -> Readiness:
+        """Return whether the models are warmed up, their load and warm-up durations and the failed models."""
+        return Readiness(
+            ready=self.ready,
+            failed_models=self.failed_models,
+            models={
+                model_name: ModelStartup(
+                    load_time=self.model_manager.load_times.get(model_name),
+                    warmup_time=self.warmup_times.get(model_name),
+                )
+                for model_name in self.models
+            },
+        )
+
+    def register_metrics(self) -> None:
+        """Export load and warm-up durations of models as OpenTelemetry gauges."""
+        meter = metrics.get_meter(__name__)
+        meter.create_observable_gauge(
+            "chunker.model.load.duration",
+            callbacks=[lambda options: self._observe_durations(self.model_manager.load_times, options)],
+            unit="s",
+            description="Duration of loading the model",
+        )
+        meter.create_observable_gauge(
+            "chunker.model.warmup.duration",
+            callbacks=[lambda options: self._observe_durations(self.warmup_times, options)],
+            unit="s",
+            description="Duration of warming up the model",
+        )
+        self.padding_ratio_histogram = meter.create_histogram(
+            "chunker.embedding.padding_ratio",
+            unit="1",
+            description="Fraction of padding tokens in a forward pass of the model",
+        )
+
+    def _observe_durations(self, durations: dict[str, float], options: CallbackOptions) -> Iterable[Observation]:
+        return [Observation(duration, {"model": model_name}) for model_name, duration in list(durations.items())]
 
     def get_model_names(self) -> list[str]:
         """Return a list of available models."""
-        if not self.models:
-            for name1 in os.listdir(self.data_dir):
-                path = os.path.join(self.data_dir, name1)
-                if os.path.isdir(path):
-                    for name2 in os.listdir(path):
-                        if os.path.isdir(os.path.join(path, name2)):
-                            name = f"{name1}/{name2}"
-                            self.models[name] = None
-        return list(self.models.keys())  # Converted dict_keys to a list
+        return self.model_manager.get_model_names()
+
+    def load_model(self, model_name: str) -> SentenceTransformer:
+        """Load a model from the data directory with its configured backend."""
+        backend = self.model_backends.get(model_name, "torch")
+        self._log.info(f"Loading model {model_name}, backend: {backend}")
+        return load_model(f"{self.data_dir}/{model_name}", backend, self.onnx_quantization_config)
+
+    def model_file_size(self, model_name: str) -> int:
+        """Return the size of the ONNX file of the model (0 with the PyTorch backend)."""
+        backend = self.model_backends.get(model_name, "torch")
+        return onnx_file_size(f"{self.data_dir}/{model_name}", backend, self.onnx_quantization_config)
 
     def get_model(self, model_name: str) -> SentenceTransformer:
         """Get a SentenceTransformer model by name.
@@ -43,26 +198,41 @@ class EmbeddingService:
         Returns:
             SentenceTransformer: The SentenceTransformer model.
         """
-        if self.models.get(model_name) is None:
-            self.models[model_name] = SentenceTransformer(f"{self.data_dir}/{model_name}")
-            self._log.info(f"Loaded model {model_name}")
-        model = self.models[model_name]
-        if not model:
-            raise ValueError(f"Model '{model_name}' not found.")
-        return model
+        return self.model_manager.get(model_name)
+
+    def get_token_counter(self, model_name: str) -> TokenCounter:
+        """Get a (cached) token counter for the model.
+
+        Args:
+            model_name (str): The name of the model.
+
+        Returns:
+            TokenCounter: The token counter using the model's tokenizer.
+        """
+        if model_name not in self.token_counters:
+            model = self.get_model(model_name)
+            self.token_counters[model_name] = TokenCounter(model.tokenizer, self.token_count_cache_size)
+        return self.token_counters[model_name]
 
     # @deprecated(reason="Use generate_query_embeddings or generate_passage_embedding instead")
-    def generate_embeddings(self, model_name: str, text: str) -> list[float]:
+    def generate_embeddings(
+        self,
+        model_name: str,
+        text: str,
+        encoding: EmbeddingEncoding = "float",
+        precision: EmbeddingPrecision = "float32",
+    ) -> list[float] | list[int] | str:
         """Generate embeddings for the given text using the specified model.
 
         Args:
             model_name (str): The name of the model.
             text (str): The text to generate embeddings for
+            encoding (EmbeddingEncoding): The representation of the embeddings.
+            precision (EmbeddingPrecision): The precision of the embeddings.
         Returns:
-            List[float]: The generated embeddings.
+            List[float] | List[int] | str: The generated embeddings.
         """
-        model = self.get_model(model_name)
-        return model.encode(text, show_progress_bar=False).tolist()
+        return self.export_embedding(model_name, self.encode(model_name, [text])[0], precision, encoding)
 
     def generate_query_embeddings(self, req: EmbeddingQueryRequest) -> EmbeddingResponse:
         """Generate embeddings for the given *question* using the specified model.
@@ -72,31 +242,14 @@ class EmbeddingService:
         Returns:
             EmbeddingResponse: The response object containing the generated embeddings.
         """
-        if not req.language:
-            req.language = self.detect_language(req.text)
-            self._log.debug(f"Detected language: {req.language}")
-        if not req.embedding_model_name:
-            req.embedding_model_name = self.find_model_name(req.language)
-            self._log.debug(f"Detected model: {req.embedding_model_name}")
-        model = self.get_model(req.embedding_model_name)
-        match req.embedding_model_name:
-            case "ipipan/silver-retriever-base-v1.1":
-                # Polish Silver Retriever model expects the input question to be prefixed with "Pytanie:"
-                embedding = model.encode(f"Pytanie: {req.text}", show_progress_bar=False).tolist()
-                return EmbeddingResponse(
-                    embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name
-                )
-            case "Qwen/Qwen3-Embedding-0.6B":
-                # Qwen model expects the input question with prompt_name
-                embedding = model.encode(req.text, show_progress_bar=False, prompt_name="query").tolist()
-                return EmbeddingResponse(
-                    embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name
-                )
-            case _:
-                embedding = model.encode(req.text, show_progress_bar=False).tolist()
-                return EmbeddingResponse(
-                    embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name
-                )
+        model_name = self.resolve_model_name(req)
+        text, prompt_name = self.format_query(req)
+        embedding = self.export_embedding(
+            model_name, self.encode(model_name, [text], prompt_name)[0], req.precision, req.encoding
+        )
+        return EmbeddingResponse(
+            embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name  # type: ignore
+        )
 
     def generate_passage_embeddings(self, req: EmbeddingPassageRequest) -> EmbeddingResponse:
         """Generate embeddings for the given *passage* (fragment of text)using the specified model.
@@ -106,28 +259,274 @@ class EmbeddingService:
         Returns:
             EmbeddingResponse: The response object containing the generated embeddings.
         """
+        model_name = self.resolve_model_name(req)
+        embedding = self.export_embedding(
+            model_name, self.encode(model_name, [self.format_passage(req)])[0], req.precision, req.encoding
+        )
+        self._log.debug(f"Embedding calculated: {req.embedding_model_name}")
+        return EmbeddingResponse(
+            embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name  # type: ignore
+        )
+
+    def generate_query_embeddings_batch(
+        self, reqs: List[EmbeddingQueryRequest], batch_size: int = 32
+    ) -> List[EmbeddingResponse]:
+        """Generate embeddings for many *questions* with batched forward passes.
+
+        Requests are grouped by model, so each model encodes all its questions
+        in batches of `batch_size`. Results are returned in input order.
+
+        Args:
+            reqs (List[EmbeddingQueryRequest]): The request objects.
+            batch_size (int): The number of questions encoded in one forward pass.
+        Returns:
+            List[EmbeddingResponse]: The response objects in the same order as `reqs`.
+        """
+        return self._generate_batch(reqs, self.format_inputs(reqs), batch_size)
+
+    def generate_passage_embeddings_batch(
+        self, reqs: List[EmbeddingPassageRequest], batch_size: int = 32
+    ) -> List[EmbeddingResponse]:
+        """Generate embeddings for many *passages* with batched forward passes.
+
+        Requests are grouped by model, so each model encodes all its passages
+        in batches of `batch_size`. Results are returned in input order.
+
+        Args:
+            reqs (List[EmbeddingPassageRequest]): The request objects.
+            batch_size (int): The number of passages encoded in one forward pass.
+        Returns:
+            List[EmbeddingResponse]: The response objects in the same order as `reqs`.
+        """
+        return self._generate_batch(reqs, self.format_inputs(reqs), batch_size)
+
+    def _generate_batch(
+        self,
+        reqs: Sequence[EmbeddingQueryRequest | EmbeddingPassageRequest],
+        inputs: List[tuple[str, str | None]],
+        batch_size: int,
+    ) -> List[EmbeddingResponse]:
+        groups: dict[tuple[str, str | None], list[int]] = {}
+        for i, (req, (_, prompt_name)) in enumerate(zip(reqs, inputs)):
+            groups.setdefault((req.embedding_model_name, prompt_name), []).append(i)  # type: ignore
+
+        ret: List[EmbeddingResponse | None] = [None] * len(reqs)
+        for (model_name, prompt_name), indexes in groups.items():
+            texts = [inputs[i][0] for i in indexes]
+            embeddings = self.encode(model_name, texts, prompt_name, batch_size)
+            self._log.debug(f"Embeddings calculated: {model_name}, texts: {len(texts)}")
+            for i, embedding in zip(indexes, embeddings):
+                req = reqs[i]
+                ret[i] = EmbeddingResponse(
+                    embedding=self.export_embedding(model_name, embedding, req.precision, req.encoding),
+                    language=req.language,  # type: ignore
+                    embedding_model_name=model_name,
+                )
+        return ret  # type: ignore
+
+    def count_tokens(self, reqs: Sequence[EmbeddingQueryRequest | EmbeddingPassageRequest]) -> int:
+        """Count the total number of tokens of the requests as they are encoded by their models.
+
+        Args:
+            reqs (Sequence[EmbeddingQueryRequest | EmbeddingPassageRequest]): The request objects.
+        Returns:
+            int: The total number of tokens.
+        """
+        groups: dict[str, list[str]] = {}
+        for req, (text, _) in zip(reqs, self.format_inputs(reqs)):
+            groups.setdefault(req.embedding_model_name, []).append(text)  # type: ignore
+        return sum(sum(self.get_token_counter(name).count_many(texts)) for name, texts in groups.items())
+
+    def format_inputs(
+        self, reqs: Sequence[EmbeddingQueryRequest | EmbeddingPassageRequest]
+    ) -> List[tuple[str, str | None]]:
+        """Resolve the model of each request and return its text and prompt name as expected by the model."""
+        ret = []
+        for req in reqs:
+            self.resolve_model_name(req)
+            if isinstance(req, EmbeddingPassageRequest):
+                ret.append((self.format_passage(req), None))
+            else:
+                ret.append(self.format_query(req))
+        return ret
+
+    def encode(
+        self, model_name: str, texts: List[str], prompt_name: str | None = None, batch_size: int = 32
+    ) -> np.ndarray:
+        """Encode already formatted texts in batches of texts of similar length.
+
+        Embeddings found in the embedding cache are not encoded again.
+        A batch has at most `batch_size` texts and, padded to its longest text,
+        at most `embedding_batch_token_budget` tokens (see `plan_batches`).
+
+        Args:
+            model_name (str): The name of the model.
+            texts (List[str]): The texts (see `format_query` and `format_passage`).
+            prompt_name (str | None): The name of the model's prompt.
+            batch_size (int): The number of texts encoded in one forward pass.
+        Returns:
+            np.ndarray: The embeddings, one row per text.
+        """
+        if not self.embedding_cache or not texts:
+            with self.model_manager.use(model_name) as model:
+                return self._encode_batches(model_name, model, texts, prompt_name, batch_size)
+        keys = [self.embedding_cache.key(model_name, prompt_name, text) for text in texts]
+        embeddings = self.embedding_cache.get_many(keys)
+        missing: dict[bytes, list[int]] = {}
+        for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            indexes = list(missing.values())
+            with self.model_manager.use(model_name) as model:
+                encoded = self._encode_batches(
+                    model_name, model, [texts[ii[0]] for ii in indexes], prompt_name, batch_size
+                )
+            self.embedding_cache.put_many(list(missing), encoded)
+            for ii, embedding in zip(indexes, encoded):
+                for i in ii:
+                    embeddings[i] = embedding
+        return np.stack(embeddings)  # type: ignore
+
+    def _encode_batches(
+        self, model_name: str, model: SentenceTransformer, texts: List[str], prompt_name: str | None, batch_size: int
+    ) -> np.ndarray:
+        """Encode texts with one forward pass per planned batch and return embeddings in input order.
+
+        A single text is encoded directly: there is nothing to plan, so its tokens are not counted
+        before the model tokenizes it (and its speed is not recorded in `throughput`).
+        """
+        if len(texts) <= 1:
+            with stage("encode", model_name, batch_size=len(texts)), profile_torch(model_name):
+                embeddings = model.encode(texts, prompt_name=prompt_name, show_progress_bar=False)
+            if texts:
+                batch_size_histogram.record(1, {"model": model_name})
+            return embeddings
+        token_counter = self.get_token_counter(model_name)
+        prompt = model.prompts.get(prompt_name, "") if prompt_name else ""
+        prompt_tokens = token_counter.count(prompt) - token_counter.special_tokens if prompt else 0
+        max_length = model.max_seq_length or 0
+        with stage("count_tokens", model_name, texts=len(texts)):
+            lengths = [n + prompt_tokens for n in token_counter.count_many(texts)]
+        if max_length:
+            lengths = [min(n, max_length) for n in lengths]
+        ret: np.ndarray | None = None
+        metric_attributes = {"model": model_name}
+        for batch in plan_batches(lengths, batch_size, self.batch_token_budget):
+            batch_lengths = [lengths[i] for i in batch]
+            tokens = sum(batch_lengths)
+            ratio = padding_ratio(batch_lengths)
+            start = time.perf_counter()
+            with (
+                stage("encode", model_name, batch_size=len(batch), tokens=tokens, padding_ratio=ratio),
+                profile_torch(model_name),
+            ):
+                embeddings = model.encode(
+                    [texts[i] for i in batch], batch_size=len(batch), prompt_name=prompt_name, show_progress_bar=False
+                )
+            self.throughput.record(model_name, tokens, time.perf_counter() - start)
+            if ret is None:
+                ret = np.empty((len(texts), *embeddings.shape[1:]), dtype=embeddings.dtype)
+            ret[batch] = embeddings
+            self.padding_ratio_histogram.record(ratio, metric_attributes)
+            batch_size_histogram.record(len(batch), metric_attributes)
+            tokens_counter.add(tokens, {**metric_attributes, "stage": "encode"})
+        return ret  # type: ignore
+
+    def export_embedding(
+        self, model_name: str, embedding: np.ndarray, precision: EmbeddingPrecision, encoding: EmbeddingEncoding
+    ) -> list[float] | list[int] | str:
+        """Quantize the embedding to the precision and convert it to the representation.
+
+        Args:
+            model_name (str): The name of the model which generated the embedding.
+            embedding (np.ndarray): The float embedding.
+            precision (EmbeddingPrecision): The precision.
+            encoding (EmbeddingEncoding): The representation.
+        Returns:
+            List[float] | List[int] | str: The embedding in the requested form.
+        """
+        ranges = self.get_quantization_ranges(model_name) if precision in ("int8", "uint8") else None
+        return encode_embedding(quantize(embedding, precision, ranges), encoding)
+
+    def needs_calibration(self, model_name: str, precision: EmbeddingPrecision) -> bool:
+        """Return True if exporting to the precision has to read or compute the model's calibration ranges first."""
+        return precision in ("int8", "uint8") and model_name not in self.quantization_ranges
+
+    def get_quantization_ranges(self, model_name: str) -> np.ndarray:
+        """Get the calibration ranges of the model used for int8 and uint8 precision.
+
+        The ranges are read from the model's directory. If they are missing, they are computed
+        from the calibration corpus and saved there. Calibration encodes the whole corpus,
+        so it should be run in the inference executor (see `needs_calibration`); concurrent calls
+        for the same model wait for a single calibration.
+
+        Args:
+            model_name (str): The name of the model.
+        Returns:
+            np.ndarray: The minimum and maximum values of each dimension.
+        Raises:
+            ModelNotCalibrated: If the model is not calibrated and there is no calibration corpus.
+        """
+        ranges = self.quantization_ranges.get(model_name)
+        if ranges is not None:
+            return ranges
+        with self._calibration_lock:
+            lock = self._calibration_locks.setdefault(model_name, threading.Lock())
+        with lock:
+            # Another thread may have calibrated the model while this one was waiting
+            ranges = self.quantization_ranges.get(model_name)
+            if ranges is not None:
+                return ranges
+            path = calibration_path(self.data_dir, model_name)
+            if os.path.exists(path):
+                ranges = np.load(path)
+            elif self.quantization_calibration_corpus:
+                texts = read_calibration_corpus(self.quantization_calibration_corpus)
+                ranges = calibrate(self.get_model(model_name), texts)
+                np.save(path, ranges)
+                self._log.info(f"Calibrated quantization of model {model_name} on {len(texts)} texts")
+            else:
+                raise ModelNotCalibrated(f"Model '{model_name}' is not calibrated for quantization.")
+            self.quantization_ranges[model_name] = ranges
+            return ranges
+
+    def resolve_model_name(self, req: EmbeddingQueryRequest | EmbeddingPassageRequest) -> str:
+        """Fill in the language and the model name of the request if they are missing.
+
+        Args:
+            req (EmbeddingQueryRequest | EmbeddingPassageRequest): The request object.
+        Returns:
+            str: The name of the model.
+        """
         if not req.language:
             req.language = self.detect_language(req.text)
             self._log.debug(f"Detected language: {req.language}")
         if not req.embedding_model_name:
             req.embedding_model_name = self.find_model_name(req.language)
             self._log.debug(f"Detected model: {req.embedding_model_name}")
-        model = self.get_model(req.embedding_model_name)
-        self._log.debug(f"Model loaded: {req.embedding_model_name}")
+        return req.embedding_model_name
+
+    def format_query(self, req: EmbeddingQueryRequest) -> tuple[str, str | None]:
+        """Return the query text and the prompt name in the form expected by the request's model."""
+        match req.embedding_model_name:
+            case "ipipan/silver-retriever-base-v1.1":
+                # Polish Silver Retriever model expects the input question to be prefixed with "Pytanie:"
+                return f"Pytanie: {req.text}", None
+            case "Qwen/Qwen3-Embedding-0.6B":
+                # Qwen model expects the input question with prompt_name
+                return req.text, "query"
+            case _:
+                return req.text, None
+
+    def format_passage(self, req: EmbeddingPassageRequest) -> str:
+        """Return the passage text in the form expected by the request's model."""
         match req.embedding_model_name:
             case "ipipan/silver-retriever-base-v1.1":
                 # Polish Silver Retriever model expects the title and text with the special token "</s>"
-                embedding = model.encode(f"{req.title or ""}</s>{req.text}", show_progress_bar=False).tolist()
-                self._log.debug(f"Embedding calculated: {req.embedding_model_name}")
-                return EmbeddingResponse(
-                    embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name
-                )
+                return f"{req.title or ""}</s>{req.text}"
             case _:
-                embedding = model.encode(req.text, show_progress_bar=False).tolist()
-                self._log.debug(f"Embedding calculated: {req.embedding_model_name}")
-                return EmbeddingResponse(
-                    embedding=embedding, language=req.language, embedding_model_name=req.embedding_model_name
-                )
+                return req.text
 
     def compare_embeddings(self, model_name: str, embedding1, embedding2) -> float:
         """Compare two embeddings and return a similarity score.
@@ -152,18 +551,53 @@ class EmbeddingService:
         """
         return self.default_model_for_language.get(language, "ipipan/silver-retriever-base-v1.1")
 
-    def detect_language(self, text: str) -> str:
-        # Create a language detector for a set of languages
+    def build_language_detector(self) -> LanguageDetector:
+        """Build a language detector for the languages with default models."""
         languages = [
             Language.from_iso_code_639_1(IsoCode639_1.from_str(code)) for code in self.default_model_for_language
         ]
-        detector = LanguageDetectorBuilder.from_languages(*languages).with_minimum_relative_distance(0.5).build()
-        # Detect the language of the text
-        detected_language = detector.detect_language_of(text)
+        return LanguageDetectorBuilder.from_languages(*languages).with_minimum_relative_distance(0.5).build()
+
+    def detect_language(self, text: str) -> str:
+        """Detect the language of the given text.
+
+        Long texts are sampled: detection runs on a few windows spread over the text
+        and stops at the first window detected with high confidence.
+
+        Args:
+            text (str): The text.
+        Returns:
+            str: The ISO 639-1 code of the detected (or default) language.
+        """
+        sample_size = self.language_detection_sample_size
+        if sample_size and len(text) > sample_size * self.language_detection_samples:
+            detected_language = self._detect_language_sampled(text)
+        else:
+            detected_language = self.language_detector.detect_language_of(text)
         if detected_language:
             return detected_language.iso_code_639_1.name.lower()
         else:
             ret = next(iter(self.default_model_for_language))
-            self._log.warning("No language detected for text: %s", text)
+            self._log.warning("No language detected for text: %s", text[:200])
             self._log.warning("Using default language: %s", ret)
             return ret
+
+    def _detect_language_sampled(self, text: str) -> Language | None:
+        """Detect the language from evenly spread windows of the text."""
+        sample_size = self.language_detection_sample_size
+        samples = self.language_detection_samples
+        step = (len(text) - sample_size) // max(samples - 1, 1)
+        scores: dict[Language, float] = {}
+        for i in range(samples):
+            start = i * step
+            confidence_values = self.language_detector.compute_language_confidence_values(
+                text[start : start + sample_size]
+            )
+            if not confidence_values or confidence_values[0].value == 0:
+                continue
+            if confidence_values[0].value >= self.language_detection_min_confidence:
+                self._log.debug("Language detected in sample %s/%s", i + 1, samples)
+                return confidence_values[0].language
+            for confidence_value in confidence_values:
+                scores[confidence_value.language] = scores.get(confidence_value.language, 0.0) + confidence_value.value
+        return max(scores, key=scores.__getitem__) if scores else None
@@ -0,0 +1,38 @@
+from typing import List
+
+import numpy as np
+
+
+def plan_batches(lengths: List[int], max_batch_size: int, max_batch_tokens: int = 0) -> List[List[int]]:
+    """Group texts of similar length into batches, so that little padding is needed.
+
+    Texts are sorted by length (longest first) and taken in order into a batch while
+    the batch, padded to its longest text, has at most `max_batch_tokens` tokens
+    and at most `max_batch_size` texts. A text longer than the budget gets a batch of its own.
+
+    Args:
+        lengths (List[int]): The number of tokens of each text.
+        max_batch_size (int): The maximum number of texts in a batch.
+        max_batch_tokens (int): The maximum number of tokens in a padded batch (0 - no limit).
+    Returns:
+        List[List[int]]: The indexes of texts in each batch.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable").tolist()
+    ret: List[List[int]] = []
+    batch: List[int] = []
+    for i in order:
+        # The first text of a batch is the longest one
+        over_budget = max_batch_tokens and (len(batch) + 1) * lengths[batch[0]] > max_batch_tokens if batch else False
+        if batch and (len(batch) >= max_batch_size or over_budget):
+            ret.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        ret.append(batch)
+    return ret
+
+
+def padding_ratio(lengths: List[int]) -> float:
+    """Return the fraction of padding tokens in a batch of texts padded to the longest one."""
+    padded = len(lengths) * max(lengths, default=0)
+    return 1 - sum(lengths) / padded if padded else 0.0
@@ -0,0 +1,91 @@
+import logging
+import os
+from typing import List, get_args
+
+import numpy as np
+from app_config import ModelBackend
+from sentence_transformers import SentenceTransformer
+
+BACKENDS = get_args(ModelBackend)
+
+_log = logging.getLogger(__name__)
+
+
+def onnx_file_name(backend: str, quantization_config: str) -> str:
+    """Return the name of the ONNX file (in the `onnx` folder of the model) used by the backend."""
+    return f"model_qint8_{quantization_config}.onnx" if backend == "onnx_qint8" else "model.onnx"
+
+
+def onnx_file_size(path: str, backend: str, quantization_config: str = "avx2") -> int:
+    """Return the size of the ONNX file loaded by the backend (0 for PyTorch or if the file has not been exported)."""
+    if backend == "torch":
+        return 0
+    file_path = os.path.join(path, "onnx", onnx_file_name(backend, quantization_config))
+    return os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+
+def load_model(path: str, backend: str = "torch", quantization_config: str = "avx2") -> SentenceTransformer:
+    """Load a model saved in the directory with the given backend.
+
+    If the ONNX file of the backend has not been exported (see `export_onnx`), the model is loaded with PyTorch.
+
+    Args:
+        path (str): The directory of the model.
+        backend (str): The backend (see `ModelBackend`).
+        quantization_config (str): The ONNX quantization config (arm64, avx2, avx512, avx512_vnni).
+    Returns:
+        SentenceTransformer: The model.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{backend}', expected one of {BACKENDS}.")
+    if backend == "torch":
+        return SentenceTransformer(path)
+    file_name = onnx_file_name(backend, quantization_config)
+    if not os.path.exists(os.path.join(path, "onnx", file_name)):
+        _log.warning("ONNX file %s not found for model %s, using PyTorch", file_name, path)
+        return SentenceTransformer(path)
+    return SentenceTransformer(path, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def export_onnx(path: str, backend: str, quantization_config: str = "avx2") -> SentenceTransformer:
+    """Export the model saved in the directory to ONNX (and quantize it for the `onnx_qint8` backend).
+
+    The ONNX files are saved in the `onnx` folder of the model.
+
+    Args:
+        path (str): The directory of the model.
+        backend (str): The backend, `onnx` or `onnx_qint8`.
+        quantization_config (str): The ONNX quantization config (arm64, avx2, avx512, avx512_vnni).
+    Returns:
+        SentenceTransformer: The model loaded with the exported file.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(path, backend="onnx", model_kwargs={"export": True})
+    model.save_pretrained(path)
+    if backend == "onnx_qint8":
+        export_dynamic_quantized_onnx_model(model, quantization_config, path)  # type: ignore
+    return load_model(path, backend, quantization_config)
+
+
+def check_equivalence(
+    reference: SentenceTransformer, candidate: SentenceTransformer, texts: List[str], tolerance: float
+) -> float:
+    """Check that the candidate model generates the same embeddings as the reference model.
+
+    Args:
+        reference (SentenceTransformer): The reference (PyTorch) model.
+        candidate (SentenceTransformer): The candidate (ONNX) model.
+        texts (List[str]): The sample texts.
+        tolerance (float): The maximum allowed cosine distance between embeddings of the same text.
+    Returns:
+        float: The maximum cosine distance.
+    Raises:
+        ValueError: If any distance exceeds the tolerance.
+    """
+    expected = reference.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    actual = candidate.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    distance = float(np.max(1 - np.sum(expected * actual, axis=1)))
+    if distance > tolerance:
+        raise ValueError(f"Embeddings differ from the reference: cosine distance {distance:.5f} > {tolerance}.")
+    return distance
@@ -0,0 +1,203 @@
+import gc
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from pydantic import BaseModel
+from sentence_transformers import SentenceTransformer
+
+MB = 1024 * 1024
+
+
+class ModelNotFound(ValueError):
+    """Raised when a model is not available in the data directory."""
+
+
+class LoadedModel(BaseModel):
+    name: str
+    size_mb: float
+    pinned: bool
+    in_use: int
+    load_time: float
+
+
+def model_size(model: SentenceTransformer) -> int:
+    """Return the size of the model's PyTorch weights in bytes (0 if they are not PyTorch tensors, e.g. ONNX)."""
+    return sum(t.nbytes for t in itertools.chain(model.parameters(), model.buffers()))
+
+
+class ModelManager:
+    """Loads models on first use and keeps them within a memory budget.
+
+    Loaded models are kept in the least recently used order. When their total size exceeds
+    the budget, the least recently used models which are neither pinned nor in use are unloaded.
+    The size of a model is the size of its PyTorch weights or, if they are not PyTorch tensors
+    (ONNX Runtime), the size of its weights file. Concurrent requests for a model which is not
+    loaded yet wait for a single load.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(
+        self,
+        data_dir: str,
+        loader: Callable[[str], SentenceTransformer],
+        memory_budget_mb: float = 0,
+        pinned_models: Optional[List[str]] = None,
+        file_size: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Args:
+            data_dir (str): The directory with models (`<data_dir>/<organization>/<model>`).
+            loader (Callable[[str], SentenceTransformer]): Loads a model by its name.
+            memory_budget_mb (float): The maximum total size of loaded models (0 - no limit).
+            pinned_models (Optional[List[str]]): Models which are never unloaded.
+            file_size (Optional[Callable[[str], int]]): Returns the size of the weights file of a model
+                by its name, used for models without PyTorch weights.
+        """
+        self.data_dir = data_dir
+        self.loader = loader
+        self.file_size = file_size
+        self.memory_budget = int(memory_budget_mb * MB)
+        self.pinned_models = set(pinned_models or [])
+        self.models: OrderedDict[str, SentenceTransformer] = OrderedDict()
+        self.sizes: dict[str, int] = {}
+        self.load_times: dict[str, float] = {}
+        self._in_use: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._model_names: list[str] | None = None
+
+    def get_model_names(self) -> list[str]:
+        """Return a list of available (loaded or not) models."""
+        if self._model_names is None:
+            names = []
+            for name1 in os.listdir(self.data_dir):
+                path = os.path.join(self.data_dir, name1)
+                if os.path.isdir(path):
+                    for name2 in os.listdir(path):
+                        if os.path.isdir(os.path.join(path, name2)):
+                            names.append(f"{name1}/{name2}")
+            self._model_names = names
+        return list(self._model_names)
+
+    def get(self, model_name: str) -> SentenceTransformer:
+        """Get the model, loading it if necessary.
+
+        Args:
+            model_name (str): The name of the model.
+        Returns:
+            SentenceTransformer: The model.
+        Raises:
+            ModelNotFound: If the model is not available.
+        """
+        with self._lock:
+            model = self._get_loaded(model_name)
+            if model is not None:
+                return model
+            self._check_available(model_name)
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                # Another thread may have loaded the model while this one was waiting
+                model = self._get_loaded(model_name)
+                if model is not None:
+                    return model
+            try:
+                start = time.perf_counter()
+                model = self.loader(model_name)
+                load_time = time.perf_counter() - start
+                size = model_size(model) or (self.file_size(model_name) if self.file_size else 0)
+                with self._lock:
+                    self.models[model_name] = model
+                    self.sizes[model_name] = size
+                    self.load_times[model_name] = load_time
+                    evicted = self._evict(model_name)
+            finally:
+                with self._lock:
+                    # Threads arriving later find the model loaded (or create a new lock to retry a failed load)
+                    self._load_locks.pop(model_name, None)
+            self._log.info(
+                "Loaded model %s in %.2f s, size: %.1f MB, loaded models: %s",
+                model_name,
+                load_time,
+                size / MB,
+                len(self.models),
+            )
+        if evicted:
+            # Free models with reference cycles at once
+            gc.collect()
+        return model
+
+    @contextmanager
+    def use(self, model_name: str) -> Iterator[SentenceTransformer]:
+        """Get the model and protect it from unloading while it is used.
+
+        Models kept over the budget because they were in use are unloaded when they are released.
+
+        Raises:
+            ModelNotFound: If the model is not available.
+        """
+        with self._lock:
+            if model_name not in self.models:
+                self._check_available(model_name)
+            self._in_use[model_name] += 1
+        try:
+            yield self.get(model_name)
+        finally:
+            with self._lock:
+                self._in_use[model_name] -= 1
+                evicted = self._evict(None)
+            if evicted:
+                gc.collect()
+
+    def loaded_models(self) -> List[LoadedModel]:
+        """Return the loaded models from the least to the most recently used."""
+        with self._lock:
+            return [
+                LoadedModel(
+                    name=name,
+                    size_mb=self.sizes[name] / MB,
+                    pinned=name in self.pinned_models,
+                    in_use=self._in_use[name],
+                    load_time=self.load_times[name],
+                )
+                for name in self.models
+            ]
+
+    def _check_available(self, model_name: str) -> None:
+        if model_name not in self.get_model_names():
+            raise ModelNotFound(f"Model '{model_name}' not found.")
+
+    def _get_loaded(self, model_name: str) -> SentenceTransformer | None:
+        model = self.models.get(model_name)
+        if model is not None:
+            self.models.move_to_end(model_name)
+        return model
+
+    def _evict(self, keep: str | None) -> List[str]:
+        """Unload the least recently used idle models until the loaded ones fit in the budget."""
+        if not self.memory_budget:
+            return []
+        total = sum(self.sizes.values())
+        evicted = []
+        for name in list(self.models):
+            if total <= self.memory_budget:
+                break
+            if name == keep or name in self.pinned_models or self._in_use[name]:
+                continue
+            del self.models[name]
+            total -= self.sizes.pop(name)
+            evicted.append(name)
+        if evicted:
+            self._log.info("Unloaded models: %s", ", ".join(evicted))
+        if keep and total > self.memory_budget:
+            self._log.warning(
+                "Loaded models use %.1f MB, over the budget of %.1f MB", total / MB, self.memory_budget / MB
+            )
+        return evicted
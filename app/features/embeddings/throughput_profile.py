@@ -0,0 +1,40 @@
+import threading
+
+
+class ThroughputProfile:
+    """Encoding speed of each model (tokens per second) measured at runtime.
+
+    Every forward pass updates an exponential moving average, so the profile follows
+    changes of the speed (e.g. other work sharing the CPU) but is not thrown off by a single slow pass.
+    """
+
+    def __init__(self, default_tokens_per_second: float = 2000.0, smoothing: float = 0.2):
+        """
+        Args:
+            default_tokens_per_second (float): The speed assumed for a model which has not been measured yet.
+            smoothing (float): The weight of a new measurement in the moving average.
+        """
+        self.default_tokens_per_second = default_tokens_per_second
+        self.smoothing = smoothing
+        self._tokens_per_second: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name: str, tokens: int, seconds: float) -> None:
+        """Record a forward pass of the model."""
+        if tokens <= 0 or seconds <= 0:
+            return
+        rate = tokens / seconds
+        with self._lock:
+            previous = self._tokens_per_second.get(model_name)
+            self._tokens_per_second[model_name] = (
+                rate if previous is None else previous + self.smoothing * (rate - previous)
+            )
+
+    def tokens_per_second(self, model_name: str) -> float:
+        """Return the measured (or default) speed of the model."""
+        return self._tokens_per_second.get(model_name, self.default_tokens_per_second)
+
+    def snapshot(self) -> dict[str, float]:
+        """Return the measured speed of each model."""
+        with self._lock:
+            return dict(self._tokens_per_second)
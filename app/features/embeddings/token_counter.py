@@ -0,0 +1,88 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+
+from transformers import PreTrainedTokenizerBase
+
+
+@dataclass
+class TokenCounterStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TokenCounter:
+    """
+    Counts tokens using the model's fast tokenizer directly.
+
+    Counts include special tokens, the same as `SentenceTransformer.tokenize`, but no padding,
+    truncation or tensors are involved. Results are memoized in a bounded LRU cache keyed
+    by the SHA-256 digest of the text (so long texts are not kept and different texts never share a count).
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase, max_size: int = 10000):
+        """
+        Args:
+            tokenizer (PreTrainedTokenizerBase): The tokenizer of the model.
+            max_size (int): The maximum number of cached counts.
+        """
+        self.tokenizer = tokenizer
+        self.max_size = max_size
+        self.special_tokens = tokenizer.num_special_tokens_to_add()
+        self.stats = TokenCounterStats()
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """
+        Returns the number of tokens in the given text.
+        """
+        return self.count_many([text])[0]
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """
+        Returns the number of tokens in each of the given texts.
+
+        Texts which are not cached are tokenized in one batched call.
+        """
+        ret: List[int | None] = [None] * len(texts)
+        missing: dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = hashlib.sha256(text.encode("utf-8")).digest()
+                count = self._cache.get(key)
+                if count is not None:
+                    self._cache.move_to_end(key)
+                    self.stats.hits += 1
+                    ret[i] = count
+                else:
+                    missing.setdefault(key, []).append(i)
+        if missing:
+            indexes = list(missing.values())
+            input_ids = self.tokenizer(
+                [texts[ii[0]] for ii in indexes],
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False,
+            )["input_ids"]
+            with self._lock:
+                for key, ii, ids in zip(missing, indexes, input_ids):
+                    count = len(ids) + self.special_tokens
+                    self.stats.misses += 1
+                    self.stats.hits += len(ii) - 1
+                    for i in ii:
+                        ret[i] = count
+                    self._cache[key] = count
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+                    self.stats.evictions += 1
+        return ret  # type: ignore
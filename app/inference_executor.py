@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, ParamSpec, TypeVar
+
+from profiling import profile_session_context
+
+_log = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_END = object()
+
+
+class InferenceExecutorSaturated(Exception):
+    """Raised when the inference executor has no free worker nor queue slot."""
+
+
+class InferenceExecutor:
+    """Runs CPU-bound work (splitting, model inference) outside the asyncio event loop.
+
+    Work is run in a pool of threads (PyTorch and tokenizers release the GIL while computing).
+    At most `max_workers` tasks run at once and at most `max_queue_size` wait for a worker;
+    any further task is rejected at once with `InferenceExecutorSaturated`, so HTTP requests
+    can be answered with 503 and Pub/Sub messages nacked instead of piling up.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue_size: int = 16):
+        """
+        Args:
+            max_workers (int): The number of worker threads.
+            max_queue_size (int): The maximum number of tasks waiting for a worker.
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_workers + self.max_queue_size
+
+    @property
+    def load(self) -> float:
+        """The number of pending (running or queued) tasks per worker."""
+        return self.pending / self.max_workers
+
+    async def run(self, func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """Run the function in the executor and wait for its result.
+
+        Context variables (logging context, current span) are passed to the worker thread.
+        If the current request is profiled (see `Profiler`), the task is counted in its session.
+
+        Raises:
+            InferenceExecutorSaturated: If all workers are busy and the queue is full.
+        """
+        with self._lock:
+            if self.saturated:
+                _log.warning("Inference executor saturated, pending tasks: %s", self.pending)
+                raise InferenceExecutorSaturated("Inference executor saturated, try again later.")
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="inference")
+            executor = self._executor
+        ctx = contextvars.copy_context()
+        session = profile_session_context.get()
+        if session is not None:
+            session.tasks += 1
+        try:
+            future = executor.submit(ctx.run, func, *args, **kwargs)
+        except BaseException:
+            self._task_done(None)
+            raise
+        # A cancelled caller does not stop a running task, so it is pending until it is done
+        future.add_done_callback(self._task_done)
+        return await asyncio.wrap_future(future)
+
+    def _task_done(self, future: Future | None) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def iterate(self, iterator: Iterator[T], retry_delay: float = 0.05) -> AsyncIterator[T]:
+        """Get the items of a blocking iterator one by one in the executor.
+
+        Other tasks may run in the executor between items. Only getting the first item
+        can fail with `InferenceExecutorSaturated`; later items wait for a free slot,
+        so an iteration which has started (e.g. a streamed response) is not broken.
+
+        Args:
+            iterator (Iterator[T]): The iterator.
+            retry_delay (float): The time (in seconds) to wait before retrying a saturated executor.
+        """
+        item = await self.run(next, iterator, _END)
+        while item is not _END:
+            yield item  # type: ignore
+            while True:
+                try:
+                    item = await self.run(next, iterator, _END)
+                    break
+                except InferenceExecutorSaturated:
+                    await asyncio.sleep(retry_delay)
+
+    def shutdown(self) -> None:
+        """Stop the worker threads. The executor is started again on the next `run`."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
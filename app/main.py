@@ -1,12 +1,19 @@
 from app_config import AppConfig
-from dependencies import lifespan, verify_api_key
+from dependencies import EmbeddingServiceDep, lifespan, verify_api_key
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from features.embeddings.embedding_model import Readiness
+from features.embeddings.embedding_quantization import ModelNotCalibrated
+from features.embeddings.model_manager import ModelNotFound
+from inference_executor import InferenceExecutorSaturated
 from log_config import setup_logging
+from profiling import ProfilingMiddleware
 from routers import (
     chunks,
     config,
     embeddings,
+    profiles,
     pub_sub,
 )
 from version import __version__
@@ -20,13 +27,36 @@ app = FastAPI(
     version=__version__,
     dependencies=[Depends(verify_api_key)],
 )
+app.add_middleware(ProfilingMiddleware)
+
+
+@app.exception_handler(InferenceExecutorSaturated)
+async def inference_executor_saturated_handler(request: Request, exc: InferenceExecutorSaturated) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(ModelNotCalibrated)
+@app.exception_handler(ModelNotFound)
+async def invalid_model_handler(request: Request, exc: ValueError) -> JSONResponse:
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 
 app.include_router(config.router, prefix="/api/config")
 app.include_router(embeddings.router, prefix="/api/embeddings")
 app.include_router(chunks.router, prefix="/api/chunks")
 app.include_router(pub_sub.router, prefix="/pub-sub")
+app.include_router(profiles.router, prefix="/api/profiles")
 
 
 @app.get("/api/ping")
 async def ping() -> None:
     """Just keep container alive."""
+
+
+@app.get("/api/ready")
+async def ready(embedding_service: EmbeddingServiceDep, response: Response) -> Readiness:
+    """Succeed once models are loaded and warmed up."""
+    readiness = embedding_service.get_readiness()
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness
@@ -0,0 +1,75 @@
+import logging
+import os
+
+from pydantic import BaseModel
+
+_log = logging.getLogger(__name__)
+
+MODEL_FILE_EXTENSIONS = (".safetensors", ".onnx", ".bin")
+
+MB = 1024 * 1024
+
+
+class MemoryUsage(BaseModel):
+    """Memory usage of a process in bytes.
+
+    `shared` pages are also mapped by other processes (e.g. other gunicorn workers),
+    `unique` pages are private to the process, so they are freed when it exits.
+    `model_files` is the resident part of memory-mapped model weights.
+    """
+
+    rss: int
+    pss: int
+    shared: int
+    unique: int
+    model_files: int
+
+
+def read_memory_usage(pid: int | str = "self") -> MemoryUsage | None:
+    """Read memory usage of the process from /proc (Linux only).
+
+    Args:
+        pid (int | str): The process id.
+    Returns:
+        MemoryUsage | None: The memory usage or None if /proc is not available.
+    """
+    path = f"/proc/{pid}/smaps"
+    if not os.path.exists(path):
+        return None
+    totals = {"Rss": 0, "Pss": 0, "Shared_Clean": 0, "Shared_Dirty": 0, "Private_Clean": 0, "Private_Dirty": 0}
+    model_files = 0
+    is_model_file = False
+    with open(path) as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in totals:
+                kb = int(value.split()[0])
+                totals[name] += kb
+                if name == "Rss" and is_model_file:
+                    model_files += kb
+            elif " " in name or "-" in name:
+                # Header of the next mapping: "start-end perms offset dev inode path"
+                is_model_file = line.rstrip().endswith(MODEL_FILE_EXTENSIONS)
+    return MemoryUsage(
+        rss=totals["Rss"] * 1024,
+        pss=totals["Pss"] * 1024,
+        shared=(totals["Shared_Clean"] + totals["Shared_Dirty"]) * 1024,
+        unique=(totals["Private_Clean"] + totals["Private_Dirty"]) * 1024,
+        model_files=model_files * 1024,
+    )
+
+
+def log_memory_usage(stage: str) -> None:
+    """Log memory usage of the current process."""
+    usage = read_memory_usage()
+    if usage:
+        _log.info(
+            "Memory usage (%s), pid: %s, rss: %.1f MB, unique: %.1f MB, shared: %.1f MB, pss: %.1f MB, model files: %.1f MB",
+            stage,
+            os.getpid(),
+            usage.rss / MB,
+            usage.unique / MB,
+            usage.shared / MB,
+            usage.pss / MB,
+            usage.model_files / MB,
+        )
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from typing import override
+
+from ampf.base import BaseAsyncFactory
+from ampf.gcp import GcpPubsubRequest, SubscriptionProcessor
+from features.chunks.chunk_model import ChunkGroup
+from features.embeddings.embedding_batcher import EmbeddingBatcher
+from inference_executor import InferenceExecutorSaturated
+from log_context import job_id_context, task_id_context
+from message_routers.publishing import publish_all
+from opentelemetry import trace
+from telemetry import stage
+
+_log = logging.getLogger(__name__)
+_tracer = trace.get_tracer(__name__)
+
+
+class ChunkGroupEmbeddingRequestMessageRouter(SubscriptionProcessor[ChunkGroup]):
+    """Router for processing grouped chunk embedding requests from a Pub/Sub subscription.
+
+    All chunks of a group are queued in `EmbeddingBatcher` at once, so they are embedded
+    in one batch (together with other messages processed at the same time), and each chunk
+    is published as a separate response. Messages with a single chunk (published when
+    `chunk_group_max_size` is 1 or by older versions) are accepted as groups of one chunk.
+
+    Chunks are embedded independently: if some of them fail, the other ones are published and
+    the failed ones are published again to `chunk_embedding_requests_topic` as a new group to be retried,
+    so only they are redelivered. If all chunks of a group fail, the message is not acked.
+    """
+
+    def __init__(
+        self,
+        async_factory: BaseAsyncFactory,
+        embedding_batcher: EmbeddingBatcher,
+        publish_max_in_flight: int = 100,
+        chunk_embedding_requests_topic: str | None = None,
+    ):
+        """
+        Args:
+            async_factory (BaseAsyncFactory): The factory used to publish responses.
+            embedding_batcher (EmbeddingBatcher): The batcher embedding the chunks.
+            publish_max_in_flight (int): The maximum number of chunks published at once.
+            chunk_embedding_requests_topic (str | None): The topic failed chunks of a group are published to
+                (None - a failed chunk fails the whole message).
+        """
+        super().__init__(async_factory, ChunkGroup)
+        self.embedding_batcher = embedding_batcher
+        self.publish_max_in_flight = publish_max_in_flight
+        self.chunk_embedding_requests_topic = chunk_embedding_requests_topic
+
+    @override
+    async def process_request(self, request: GcpPubsubRequest) -> None:
+        group = request.decoded_data(self.clazz)
+        try:
+            with _tracer.start_as_current_span("requests") as span:
+                if group.chunks:
+                    # Set context variables for logging.
+                    job_id_context.set(group.chunks[0].job_id)
+                    task_id_context.set(group.chunks[0].task_id)
+                    span.set_attribute("job_id", str(group.chunks[0].job_id))
+                    span.set_attribute("task_id", str(group.chunks[0].task_id))
+                span.set_attribute("chunks", len(group.chunks))
+                model_name = group.chunks[0].embedding_model_name if group.chunks else None
+                tokens = sum(chunk.token_count or 0 for chunk in group.chunks)
+                with stage("embed", model_name, chunks=len(group.chunks), tokens=tokens):
+                    results = await asyncio.gather(
+                        *(
+                            self.embedding_batcher.generate_embeddings(
+                                chunk.embedding_model_name,
+                                chunk.text,
+                                chunk.embedding_encoding,
+                                chunk.embedding_precision,
+                            )
+                            for chunk in group.chunks
+                        ),
+                        return_exceptions=True,
+                    )
+                embedded = []
+                failed = []
+                for chunk, result in zip(group.chunks, results):
+                    if isinstance(result, Exception):
+                        _log.warning(
+                            "Failed to embed chunk %s of message ID:%s: %r",
+                            chunk.chunk_index,
+                            request.message.messageId,
+                            result,
+                        )
+                        failed.append((chunk, result))
+                    elif isinstance(result, BaseException):
+                        raise result
+                    else:
+                        chunk.embedding = result
+                        embedded.append(chunk)
+                span.set_attribute("failed_chunks", len(failed))
+                if failed and (not embedded or not self.chunk_embedding_requests_topic):
+                    # The whole message is retried (with nothing embedded or nowhere to retry the failed chunks)
+                    raise failed[0][1]
+                _log.debug("Embeddings generated for %s chunks", len(embedded))
+                await publish_all(
+                    lambda chunk: self.process_response(request, chunk), embedded, self.publish_max_in_flight
+                )
+                if failed:
+                    retry = [chunk for chunk, _ in failed]
+                    request.forward_response_to_topic(self.chunk_embedding_requests_topic)
+                    await self.process_response(request, retry[0] if len(retry) == 1 else ChunkGroup(chunks=retry))
+        except InferenceExecutorSaturated as e:
+            _log.warning("Message ID:%s rejected: %s", request.message.messageId, e)
+            raise e
+        except Exception as e:
+            _log.warning("Failed to process message ID:%s", request.message.messageId)
+            _log.exception(e)
+            raise e
@@ -1,13 +1,17 @@
 import logging
-from typing import override
+from typing import Iterable, override
 
 from ampf.base import BaseAsyncFactory
 from ampf.gcp import GcpPubsubRequest, SubscriptionProcessor
 from app_config import AppConfig
-from features.chunks.chunk_model import ChunksRequest
+from features.chunks.chunk_groups import group_chunks
+from features.chunks.chunk_model import ChunkGroup, ChunksRequest, ChunkWithEmbeddings
 from features.chunks.chunk_service import ChunkService
+from inference_executor import InferenceExecutor, InferenceExecutorSaturated
 from log_context import job_id_context, task_id_context
+from message_routers.publishing import publish_all
 from opentelemetry import trace
+from profiling import PROFILE_ATTRIBUTE, Profiler
 
 _log = logging.getLogger(__name__)
 _tracer = trace.get_tracer(__name__)
@@ -18,7 +22,11 @@ class ChunkRequestMessageRouter(SubscriptionProcessor[ChunksRequest]):
 
     This class extends `SubscriptionProcessor` to handle `ChunksRequest` messages.
     It processes incoming chunking requests, creates chunks using `ChunkService`,
-    and publishes the results to a Pub/Sub topic.
+    and publishes the results to a Pub/Sub topic. Chunks which the embedding policy of `ChunkService`
+    left without embeddings are forwarded to `chunk_embedding_requests_topic` to be embedded there,
+    in groups of up to `chunk_group_max_size` chunks per message.
+    Chunks are published concurrently and the request is acked only when every publish is confirmed.
+    A message with the `profile` attribute set to `true` is profiled if profiling is enabled (see `Profiler`).
     """
 
     def __init__(
@@ -26,15 +34,30 @@ class ChunkRequestMessageRouter(SubscriptionProcessor[ChunksRequest]):
         config: AppConfig,
         async_factory: BaseAsyncFactory,
         chunk_service: ChunkService,
+        inference_executor: InferenceExecutor,
+        profiler: Profiler | None = None,
     ):
         super().__init__(async_factory, ChunksRequest)
         self.chunks_response_topic = config.chunking_responses_topic
         self.chunk_embedding_requests_topic = config.chunk_embedding_requests_topic
-        self.chunks_embedding_at_once = config.chunks_embedding_at_once
+        self.publish_max_in_flight = config.chunks_publish_max_in_flight
+        self.group_max_size = config.chunk_group_max_size
+        self.group_max_bytes = config.chunk_group_max_bytes
         self.chunk_service = chunk_service
+        self.inference_executor = inference_executor
+        self.profiler = profiler
 
     @override
     async def process_request(self, request: GcpPubsubRequest) -> None:
+        # Attributes are optional in push requests
+        attributes = getattr(request.message, "attributes", None) or {}
+        if self.profiler and self.profiler.is_requested(attributes.get(PROFILE_ATTRIBUTE)):
+            async with self.profiler.session(f"message {request.message.messageId}"):
+                await self._process_request(request)
+        else:
+            await self._process_request(request)
+
+    async def _process_request(self, request: GcpPubsubRequest) -> None:
         payload = request.decoded_data(self.clazz)
         try:
             with _tracer.start_as_current_span("requests") as span:
@@ -52,21 +75,58 @@ class ChunkRequestMessageRouter(SubscriptionProcessor[ChunksRequest]):
                     payload.task_id,
                     extra={"metadata": payload.metadata},
                 )
-                chunks = self.chunk_service.create_chunks(payload)
-                total_chunks = len(chunks)
-                span.set_attribute("total_chunks", total_chunks)
-                _log.debug("Total chunks: %s, job=%s, task=%s", total_chunks, payload.job_id, payload.task_id)
-                if total_chunks > self.chunks_embedding_at_once:
+                chunks = await self.inference_executor.run(self.chunk_service.create_chunks, payload)
+                # Chunks without embeddings were left by the embedding policy for fan-out
+                inline = [chunk for chunk in chunks if chunk.embedding]
+                fan_out = [chunk for chunk in chunks if not chunk.embedding]
+                span.set_attribute("total_chunks", len(chunks))
+                span.set_attribute("inline_chunks", len(inline))
+                _log.debug(
+                    "Total chunks: %s, embedded inline: %s, job=%s, task=%s",
+                    len(chunks),
+                    len(inline),
+                    payload.job_id,
+                    payload.task_id,
+                )
+                # The request may override the response topic, so it is not known here
+                await self.publish_responses(request, inline)
+                if fan_out:
                     request.forward_response_to_topic(self.chunk_embedding_requests_topic)
-                for chunk in chunks:
-                    await self.process_response(request, chunk)
+                    if self.group_max_size > 1:
+                        groups = group_chunks(fan_out, self.group_max_size, self.group_max_bytes)
+                        span.set_attribute("fan_out_messages", len(groups))
+                        await self.publish_responses(request, groups, self.chunk_embedding_requests_topic)
+                    else:
+                        await self.publish_responses(request, fan_out, self.chunk_embedding_requests_topic)
                 _log.debug(
                     "End processing chunks, job=%s, task=%s",
                     payload.job_id,
                     payload.task_id,
                     extra={"metadata": payload.metadata},
                 )
+        except InferenceExecutorSaturated as e:
+            _log.warning("Message ID:%s rejected: %s", request.message.messageId, e)
+            raise e
         except Exception as e:
             _log.warning("Failed to process message ID:%s", request.message.messageId)
             _log.exception(e)
             raise e
+
+    async def publish_responses(
+        self,
+        request: GcpPubsubRequest,
+        messages: Iterable[ChunkWithEmbeddings | ChunkGroup],
+        topic: str | None = None,
+    ) -> None:
+        """Publish the messages concurrently, with at most `publish_max_in_flight` waiting for confirmation.
+
+        Args:
+            request (GcpPubsubRequest): The processed request.
+            messages (Iterable[ChunkWithEmbeddings | ChunkGroup]): The messages.
+            topic (str | None): The topic the messages are published to, if known (an attribute of metrics).
+        Raises:
+            Exception: The first publishing error, after all other publishes have finished.
+        """
+        await publish_all(
+            lambda message: self.process_response(request, message), messages, self.publish_max_in_flight, topic
+        )
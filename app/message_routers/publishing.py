@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
+
+import telemetry
+from pydantic import BaseModel
+from telemetry import published_bytes_counter, published_messages_counter, stage
+
+_log = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+async def publish_all(
+    publish: Callable[[T], Awaitable[Any]], items: Iterable[T], max_in_flight: int, topic: str | None = None
+) -> None:
+    """Publish the items concurrently and wait until all of them are published.
+
+    Publishing is traced as the `publish` stage and the number of published messages is counted.
+    If metrics are exported, their size (JSON) is counted too; measuring it serializes each message again.
+
+    Args:
+        publish (Callable[[T], Awaitable[Any]]): Publishes one item.
+        items (Iterable[T]): The items.
+        max_in_flight (int): The maximum number of publishes waiting for confirmation at a time.
+        topic (str | None): The topic the items are published to, if known (an attribute of metrics).
+    Raises:
+        Exception: The first publishing error, after all other publishes have finished.
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    metric_attributes = {"topic": topic} if topic else {}
+    measure_bytes = telemetry.metrics_enabled
+    published_bytes = 0
+
+    async def bounded_publish(item: T) -> None:
+        nonlocal published_bytes
+        async with semaphore:
+            await publish(item)
+        published_messages_counter.add(1, metric_attributes)
+        if measure_bytes:
+            size = len(item.model_dump_json().encode())
+            published_bytes += size
+            published_bytes_counter.add(size, metric_attributes)
+
+    items = list(items)
+    with stage("publish", topic=topic, messages=len(items)) as span:
+        results = await asyncio.gather(*(bounded_publish(item) for item in items), return_exceptions=True)
+        if measure_bytes:
+            span.set_attribute("bytes", published_bytes)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        _log.warning("Failed to publish %s of %s messages", len(errors), len(results))
+        raise errors[0]
@@ -1,5 +1,6 @@
 import os
 
+import telemetry
 from fastapi import FastAPI
 from opentelemetry import _events as events
 from opentelemetry import _logs as logs
@@ -12,15 +13,27 @@ from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
 from opentelemetry.sdk._events import EventLoggerProvider
 from opentelemetry.sdk._logs import LoggerProvider
-from opentelemetry.sdk._logs.export import BatchLogRecordProcessor
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, ConsoleLogExporter
 from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
 from opentelemetry.sdk.resources import SERVICE_INSTANCE_ID, SERVICE_NAME, SERVICE_VERSION, Resource
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+
+def get_exporter(variable: str) -> str:
+    """Return the exporter of a signal selected by the variable (if not set, `otlp` if there is an endpoint)."""
+    default = "otlp" if os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") else "none"
+    return os.environ.get(variable, "").strip().lower() or default
 
 
 def setup_otel(app: FastAPI) -> None:
+    """Set up the OpenTelemetry SDK and instrument the app.
+
+    Each signal is exported with OTLP (if `OTEL_EXPORTER_OTLP_ENDPOINT` is set), unless `OTEL_TRACES_EXPORTER`,
+    `OTEL_METRICS_EXPORTER` or `OTEL_LOGS_EXPORTER` selects `console` (printed to stdout, to collect them locally
+    without an OTLP endpoint), `otlp` or `none`.
+    """
     resource = Resource.create(
         attributes={
             # Use the PID as the service.instance.id to avoid duplicate timeseries
@@ -33,20 +46,31 @@ def setup_otel(app: FastAPI) -> None:
 
     # Set up OpenTelemetry Python SDK
     tracer_provider = TracerProvider(resource=resource)
-    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    traces_exporter = get_exporter("OTEL_TRACES_EXPORTER")
+    if traces_exporter != "none":
+        span_exporter = ConsoleSpanExporter() if traces_exporter == "console" else OTLPSpanExporter()
+        tracer_provider.add_span_processor(BatchSpanProcessor(span_exporter))
     trace.set_tracer_provider(tracer_provider)
 
     logger_provider = LoggerProvider(resource=resource)
-    logger_provider.add_log_record_processor(BatchLogRecordProcessor(OTLPLogExporter()))
+    logs_exporter = get_exporter("OTEL_LOGS_EXPORTER")
+    if logs_exporter != "none":
+        log_exporter = ConsoleLogExporter() if logs_exporter == "console" else OTLPLogExporter()
+        logger_provider.add_log_record_processor(BatchLogRecordProcessor(log_exporter))
     logs.set_logger_provider(logger_provider)
 
     event_logger_provider = EventLoggerProvider(logger_provider)
     events.set_event_logger_provider(event_logger_provider)
 
-    reader = PeriodicExportingMetricReader(OTLPMetricExporter())
-    meter_provider = MeterProvider(metric_readers=[reader], resource=resource)
+    metrics_exporter = get_exporter("OTEL_METRICS_EXPORTER")
+    readers = []
+    if metrics_exporter != "none":
+        metric_exporter = ConsoleMetricExporter() if metrics_exporter == "console" else OTLPMetricExporter()
+        readers.append(PeriodicExportingMetricReader(metric_exporter))
+    meter_provider = MeterProvider(metric_readers=readers, resource=resource)
+    telemetry.metrics_enabled = bool(readers)
     metrics.set_meter_provider(meter_provider)
 
-    FastAPIInstrumentor.instrument_app(app, excluded_urls="/api/ping")
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="/api/ping,/api/ready")
     RequestsInstrumentor().instrument()
     HTTPXClientInstrumentor().instrument()
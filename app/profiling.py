@@ -0,0 +1,324 @@
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import shutil
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, List, Optional
+from uuid import UUID
+
+from log_context import job_id_context, task_id_context
+from pydantic import BaseModel
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ATTRIBUTE = "profile"
+METADATA_FILE = "profile.json"
+
+
+class ProfileInfo(BaseModel):
+    name: str
+    source: str
+    job_id: Optional[str] = None
+    task_id: Optional[str] = None
+    created: datetime
+    duration: float
+    torch_skipped: int = 0
+    files: List[str]
+
+
+# cProfile (through `sys.monitoring`) and the PyTorch profiler are process-wide, so one session runs at a time
+_session_lock = threading.Lock()
+_torch_lock = threading.Lock()
+
+
+class ProfileSession:
+    """Profiles the whole process while one request or message is processed.
+
+    cProfile records every thread of the process (the event loop, the inference executor, the embedding
+    batchers), so the profile includes other requests processed meanwhile and all of them are slowed down.
+    Forward passes run for the request are also profiled with the PyTorch profiler, one trace per pass.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(self, path: str, torch_profiler: bool = True):
+        """
+        Args:
+            path (str): The directory the profiles are written to.
+            torch_profiler (bool): Whether to profile forward passes with the PyTorch profiler.
+        """
+        self.path = path
+        self.torch_profiler = torch_profiler
+        self.profiler = cProfile.Profile()
+        # The number of tasks run for the request in the inference executor (see `InferenceExecutor.run`)
+        self.tasks = 0
+        self.torch_traces = 0
+        self.torch_skipped = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def profile_torch(self, name: str) -> Iterator[None]:
+        """Profile PyTorch operators run in the block and write a Chrome trace and a summary table.
+
+        Forward passes run while another one is profiled are not profiled (they are counted in `torch_skipped`).
+        """
+        if not self.torch_profiler:
+            yield
+            return
+        if not _torch_lock.acquire(blocking=False):
+            with self._lock:
+                self.torch_skipped += 1
+            yield
+            return
+        try:
+            from torch.profiler import ProfilerActivity, profile
+
+            with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+                yield
+        finally:
+            _torch_lock.release()
+        with self._lock:
+            i = self.torch_traces
+            self.torch_traces += 1
+        file_name = f"torch-{i:03d}-{name.replace('/', '_')}"
+        prof.export_chrome_trace(os.path.join(self.path, f"{file_name}.json"))
+        with open(os.path.join(self.path, f"{file_name}.txt"), "w", encoding="utf-8") as f:
+            f.write(prof.key_averages(group_by_input_shape=True).table(sort_by="cpu_time_total", row_limit=30))
+
+    @property
+    def empty(self) -> bool:
+        """True if no work was run for the request (e.g. it was rejected), so the profile is not worth saving."""
+        return not self.tasks and not self.torch_traces
+
+    def save(self, top: int = 50) -> None:
+        """Write the cProfile stats (`profile.pstats`) and the `top` functions by cumulative time."""
+        path = os.path.join(self.path, "profile.pstats")
+        self.profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+        with open(os.path.join(self.path, "profile.txt"), "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+
+# The profile session of the request or message being processed, passed to the inference executor
+profile_session_context: ContextVar[ProfileSession | None] = ContextVar("profile_session", default=None)
+
+
+@contextmanager
+def profile_torch(name: str) -> Iterator[None]:
+    """Profile the block with the PyTorch profiler if the current request is profiled."""
+    session = profile_session_context.get()
+    if session is None:
+        yield
+    else:
+        with session.profile_torch(name):
+            yield
+
+
+class Profiler:
+    """Profiles requests and Pub/Sub messages which ask for it (opt-in, for pathological documents).
+
+    Profiles cover the whole process (see `ProfileSession`), so only one request is profiled at a time;
+    a request asking for profiling while another one is profiled is processed without a profile.
+    Each profiled request or message which ran any work gets a directory `<directory>/<time>-<job_id>-<task_id>-<id>`
+    with `profile.json` (metadata), `profile.pstats` and `profile.txt` (cProfile of the process)
+    and `torch-*.json` / `torch-*.txt` (PyTorch profiles of forward passes).
+    Only the `max_profiles` most recent profiles are kept.
+    """
+
+    _log = logging.getLogger(__name__)
+
+    def __init__(self, directory: str, enabled: bool = False, torch_profiler: bool = True, max_profiles: int = 20):
+        """
+        Args:
+            directory (str): The directory of profiles.
+            enabled (bool): Whether requests may ask for profiling.
+            torch_profiler (bool): Whether to profile forward passes with the PyTorch profiler.
+            max_profiles (int): The maximum number of kept profiles.
+        """
+        self.directory = directory
+        self.enabled = enabled
+        self.torch_profiler = torch_profiler
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def is_requested(self, value: str | None) -> bool:
+        """Return True if profiling is enabled and the header or attribute value asks for it."""
+        return self.enabled and (value or "").strip().lower() in ("1", "true", "yes")
+
+    @asynccontextmanager
+    async def session(self, source: str) -> AsyncIterator[ProfileSession | None]:
+        """Profile the process while the block processes a request or message.
+
+        The profile is named after `job_id` and `task_id` from `log_context` as they are at the end of the block
+        and it is saved outside the event loop.
+
+        Args:
+            source (str): Describes the request or message (e.g. `POST /api/chunks/`).
+        Yields:
+            ProfileSession | None: The session, which is the current one in the block
+                (None - skipped, because another request is being profiled).
+        """
+        if not _session_lock.acquire(blocking=False):
+            self._log.warning("Profile of %s skipped, another request is being profiled", source)
+            yield None
+            return
+        try:
+            created = datetime.now(timezone.utc)
+            path = os.path.join(self.directory, f".{uuid.uuid4().hex}")
+            session = ProfileSession(path, self.torch_profiler)
+            try:
+                session.profiler.enable()
+            except ValueError as e:
+                # Another profiling tool (e.g. a debugger) is active
+                self._log.warning("Profile of %s skipped: %s", source, e)
+                yield None
+                return
+            os.makedirs(path)
+            token = profile_session_context.set(session)
+            start = time.perf_counter()
+            try:
+                yield session
+            finally:
+                session.profiler.disable()
+                profile_session_context.reset(token)
+                await asyncio.get_running_loop().run_in_executor(
+                    None,
+                    self._finish,
+                    session,
+                    source,
+                    created,
+                    time.perf_counter() - start,
+                    job_id_context.get(),
+                    task_id_context.get(),
+                )
+        finally:
+            _session_lock.release()
+
+    def _finish(
+        self,
+        session: ProfileSession,
+        source: str,
+        created: datetime,
+        duration: float,
+        job_id: UUID | None,
+        task_id: UUID | None,
+    ) -> None:
+        if session.empty:
+            self._log.info("Profile of %s not saved, no work was run for it", source)
+            shutil.rmtree(session.path, ignore_errors=True)
+            return
+        try:
+            session.save()
+            name = f"{created:%Y%m%dT%H%M%S%f}-{job_id}-{task_id}-{os.path.basename(session.path)[1:9]}"
+            with open(os.path.join(session.path, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "source": source,
+                        "job_id": str(job_id) if job_id else None,
+                        "task_id": str(task_id) if task_id else None,
+                        "created": created.isoformat(),
+                        "duration": duration,
+                        "torch_skipped": session.torch_skipped,
+                    },
+                    f,
+                )
+            os.rename(session.path, os.path.join(self.directory, name))
+            self._log.info("Profile %s saved, source: %s, duration: %.2f s", name, source, duration)
+            self._remove_old_profiles()
+        except Exception:
+            self._log.exception("Saving profile failed")
+            shutil.rmtree(session.path, ignore_errors=True)
+
+    def _remove_old_profiles(self) -> None:
+        with self._lock:
+            names = self._profile_names()
+            for name in names[: max(0, len(names) - self.max_profiles)]:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _profile_names(self) -> List[str]:
+        """Return the names of saved profiles from the oldest one (names start with the time)."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.directory)
+            if os.path.isfile(os.path.join(self.directory, name, METADATA_FILE))
+        )
+
+    def list_profiles(self) -> List[ProfileInfo]:
+        """Return the saved profiles from the most recent one."""
+        ret = []
+        for name in reversed(self._profile_names()):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as f:
+                    metadata = json.load(f)
+                ret.append(ProfileInfo(name=name, files=sorted(os.listdir(path)), **metadata))
+            except FileNotFoundError:
+                # Removed meanwhile
+                continue
+        return ret
+
+    def get_file(self, name: str, file_name: str) -> str:
+        """Return the path of a file of a saved profile.
+
+        Raises:
+            FileNotFoundError: If the profile or the file does not exist.
+        """
+        if name not in self._profile_names() or os.path.basename(file_name) != file_name or file_name.startswith("."):
+            raise FileNotFoundError(f"{name}/{file_name}")
+        path = os.path.join(self.directory, name, file_name)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"{name}/{file_name}")
+        return path
+
+
+class ProfilingMiddleware:
+    """Profiles HTTP requests with the `X-Profile: true` header if profiling is enabled.
+
+    The profiler and the API key are taken from the app state (`app.state.app_state`). Requests without
+    a valid API key are never profiled (they are rejected later by `verify_api_key`). If the profile is skipped
+    (another request is being profiled), the response has the `X-Profile: skipped` header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            app_state = getattr(scope["app"].state, "app_state", None)
+            profiler: Profiler | None = getattr(app_state, "profiler", None)
+            headers = dict(scope["headers"])
+            value = headers.get(PROFILE_HEADER.encode())
+            if (
+                profiler
+                and profiler.is_requested(value.decode("latin-1") if value else None)
+                and self._is_authorized(app_state, headers)
+            ):
+                async with profiler.session(f"{scope['method']} {scope['path']}") as session:
+                    await self.app(scope, receive, send if session else _with_skipped_header(send))
+                return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _is_authorized(app_state, headers: dict[bytes, bytes]) -> bool:
+        api_key = app_state.config.api_key
+        return not api_key or headers.get(b"x-api-key", b"").decode("latin-1") == api_key
+
+
+def _with_skipped_header(send):
+    async def send_with_header(message):
+        if message["type"] == "http.response.start":
+            message["headers"] = [*message.get("headers", []), (PROFILE_HEADER.encode(), b"skipped")]
+        await send(message)
+
+    return send_with_header
@@ -1,25 +1,77 @@
-from typing import List
+import json
+from typing import Callable, Iterator, List, TypeVar
 
-from dependencies import ChunkServiceDep, EmbeddingServiceDep
-from fastapi import APIRouter
+from dependencies import ChunkServiceDep, EmbeddingServiceDep, InferenceExecutorDep
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
 from features.chunks.chunk_model import ChunksRequest, ChunkWithEmbeddings
+from inference_executor import InferenceExecutor
 
 router = APIRouter(tags=["Chunks"])
 
+NDJSON = "application/x-ndjson"
+
+T = TypeVar("T")
+
+
+def is_streaming(request: Request, stream: bool) -> bool:
+    """Stream the response if requested with `?stream=true` or `Accept: application/x-ndjson`."""
+    return stream or NDJSON in request.headers.get("accept", "")
+
+
+async def ndjson_response(
+    inference_executor: InferenceExecutor, items: Iterator[T], dump: Callable[[T], str]
+) -> StreamingResponse:
+    """Return the items as newline-delimited JSON records, each sent as soon as it is ready."""
+    records = inference_executor.iterate(items)
+    # Errors before the first record (e.g. a saturated executor) are returned with their status code
+    first = await anext(records, None)
+
+    async def lines():
+        if first is not None:
+            yield dump(first) + "\n"
+        async for item in records:
+            yield dump(item) + "\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON)
+
 
 @router.post("/")
-async def create_chunks(chunk_service: ChunkServiceDep, chunks_request: ChunksRequest) -> List[str]:
+async def create_chunks(
+    chunk_service: ChunkServiceDep,
+    inference_executor: InferenceExecutorDep,
+    chunks_request: ChunksRequest,
+    request: Request,
+    stream: bool = False,
+) -> List[str]:
     """
     Create chunks for the given text.
+
+    With `?stream=true` (or `Accept: application/x-ndjson`) each chunk is sent as a JSON string in a separate line.
     """
-    return [c.text for c in chunk_service.create_chunks(chunks_request, generate_embeddings=False)]
+    if is_streaming(request, stream):
+        chunks = chunk_service.iter_chunks(chunks_request, generate_embeddings=False)
+        return await ndjson_response(inference_executor, chunks, lambda c: json.dumps(c.text))  # type: ignore
+    chunks = await inference_executor.run(chunk_service.create_chunks, chunks_request, generate_embeddings=False)
+    return [c.text for c in chunks]
 
 
 @router.post("/with-embeddings")
 async def create_chunks_with_embeddings(
-    chunk_service: ChunkServiceDep, embedding_service: EmbeddingServiceDep, chunks_request: ChunksRequest
+    chunk_service: ChunkServiceDep,
+    embedding_service: EmbeddingServiceDep,
+    inference_executor: InferenceExecutorDep,
+    chunks_request: ChunksRequest,
+    request: Request,
+    stream: bool = False,
 ) -> List[ChunkWithEmbeddings]:
     """
     Create chunks with embeddings for the given text.
+
+    With `?stream=true` (or `Accept: application/x-ndjson`) the same chunks are sent as JSON objects,
+    each in a separate line as soon as its batch is embedded.
     """
-    return chunk_service.create_chunks(chunks_request, generate_embeddings=False)
+    if is_streaming(request, stream):
+        chunks = chunk_service.iter_chunks(chunks_request, generate_embeddings=True)
+        return await ndjson_response(inference_executor, chunks, lambda c: c.model_dump_json())  # type: ignore
+    return await inference_executor.run(chunk_service.create_chunks, chunks_request, generate_embeddings=True)
@@ -1,8 +1,21 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from dependencies import ConfigDep, EmbeddingServiceDep
-from fastapi import APIRouter
-from features.embeddings.embedding_model import EmbeddingPassageRequest, EmbeddingQueryRequest, EmbeddingResponse
+from app_config import AppConfig
+from dependencies import ConfigDep, EmbeddingBatcherDep, EmbeddingServiceDep, InferenceExecutorDep
+from fastapi import APIRouter, HTTPException
+from features.embeddings.embedding_batcher import EmbeddingBatcherStats
+from features.embeddings.embedding_cache import EmbeddingCacheStats
+from features.embeddings.embedding_encoding import EmbeddingEncoding
+from features.embeddings.embedding_model import (
+    EmbeddingPassageBatchRequest,
+    EmbeddingPassageRequest,
+    EmbeddingQueryBatchRequest,
+    EmbeddingQueryRequest,
+    EmbeddingResponse,
+)
+from features.embeddings.embedding_quantization import EmbeddingPrecision
+from features.embeddings.embedding_service import EmbeddingService
+from features.embeddings.model_manager import LoadedModel
 from pydantic import BaseModel
 
 router = APIRouter(tags=["Embeddings"])
@@ -12,6 +25,8 @@ class EmbeddingRequest(BaseModel):
     language: str = "pl"
     embedding_model_name: Optional[str] = None
     text: str
+    encoding: EmbeddingEncoding = "float"
+    precision: EmbeddingPrecision = "float32"
 
 
 @router.get("/models")
@@ -19,32 +34,113 @@ async def get_models(embdedding_service: EmbeddingServiceDep) -> List[str]:
     return embdedding_service.get_model_names()
 
 
+@router.get("/models/loaded")
+async def get_loaded_models(embdedding_service: EmbeddingServiceDep) -> List[LoadedModel]:
+    """
+    Return the loaded models with their size, from the least to the most recently used.
+    """
+    return embdedding_service.model_manager.loaded_models()
+
+
+@router.get("/stats")
+async def get_stats(embedding_batcher: EmbeddingBatcherDep) -> Dict[str, EmbeddingBatcherStats]:
+    """
+    Return batch size and queue wait statistics for each model.
+    """
+    return embedding_batcher.stats
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(embdedding_service: EmbeddingServiceDep) -> Optional[EmbeddingCacheStats]:
+    """
+    Return hit, miss and eviction statistics of the embedding cache (null if the cache is disabled).
+    """
+    return embdedding_service.embedding_cache.stats if embdedding_service.embedding_cache else None
+
+
 @router.post("/generate")
 async def generate_embeddings(
-    config: ConfigDep, embdedding_service: EmbeddingServiceDep, body: EmbeddingRequest
-) -> List[float]:
+    config: ConfigDep,
+    embdedding_service: EmbeddingServiceDep,
+    embedding_batcher: EmbeddingBatcherDep,
+    body: EmbeddingRequest,
+) -> List[float] | List[int] | str:
     """
     Generate embeddings for the given text using the specified model.
     """
     if not body.embedding_model_name:
         body.embedding_model_name = embdedding_service.find_model_name(body.language)
-    return embdedding_service.generate_embeddings(body.embedding_model_name, body.text)
+    return await embedding_batcher.generate_embeddings(
+        body.embedding_model_name, body.text, body.encoding, body.precision
+    )
 
 
 @router.post("/generate/query")
-def generate_query_embeddings(
-    config: ConfigDep, embdedding_service: EmbeddingServiceDep, body: EmbeddingQueryRequest
+async def generate_query_embeddings(
+    config: ConfigDep, embedding_batcher: EmbeddingBatcherDep, body: EmbeddingQueryRequest
 ) -> EmbeddingResponse:
     """
     Generate embeddings for the given query using the specified model.
     """
-    return embdedding_service.generate_query_embeddings(body)
+    return await embedding_batcher.generate_query_embeddings(body)
 
 @router.post("/generate/passage")
-def generate_passage_embeddings(
-    config: ConfigDep, embdedding_service: EmbeddingServiceDep, body: EmbeddingPassageRequest
+async def generate_passage_embeddings(
+    config: ConfigDep, embedding_batcher: EmbeddingBatcherDep, body: EmbeddingPassageRequest
 ) -> EmbeddingResponse:
     """
     Generate embeddings for the given query using the specified model.
     """
-    return embdedding_service.generate_passage_embeddings(body)
+    return await embedding_batcher.generate_passage_embeddings(body)
+
+
+@router.post("/generate/query/batch")
+async def generate_query_embeddings_batch(
+    config: ConfigDep,
+    embdedding_service: EmbeddingServiceDep,
+    inference_executor: InferenceExecutorDep,
+    body: EmbeddingQueryBatchRequest,
+) -> List[EmbeddingResponse]:
+    """
+    Generate embeddings for many queries. Results are returned in the same order as items.
+    """
+
+    def generate() -> List[EmbeddingResponse]:
+        check_batch_limits(config, embdedding_service, body.items)
+        return embdedding_service.generate_query_embeddings_batch(body.items, config.embedding_batch_size)
+
+    return await inference_executor.run(generate)
+
+
+@router.post("/generate/passage/batch")
+async def generate_passage_embeddings_batch(
+    config: ConfigDep,
+    embdedding_service: EmbeddingServiceDep,
+    inference_executor: InferenceExecutorDep,
+    body: EmbeddingPassageBatchRequest,
+) -> List[EmbeddingResponse]:
+    """
+    Generate embeddings for many passages. Results are returned in the same order as items.
+    """
+
+    def generate() -> List[EmbeddingResponse]:
+        check_batch_limits(config, embdedding_service, body.items)
+        return embdedding_service.generate_passage_embeddings_batch(body.items, config.embedding_batch_size)
+
+    return await inference_executor.run(generate)
+
+
+def check_batch_limits(
+    config: AppConfig,
+    embdedding_service: EmbeddingService,
+    items: List[EmbeddingQueryRequest] | List[EmbeddingPassageRequest],
+) -> None:
+    if len(items) > config.embedding_batch_max_items:
+        raise HTTPException(
+            status_code=413, detail=f"Too many items: {len(items)} > {config.embedding_batch_max_items}"
+        )
+    total_tokens = embdedding_service.count_tokens(items)
+    if total_tokens > config.embedding_batch_max_tokens:
+        raise HTTPException(
+            status_code=413, detail=f"Too many tokens: {total_tokens} > {config.embedding_batch_max_tokens}"
+        )
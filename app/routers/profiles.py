@@ -0,0 +1,27 @@
+from typing import List
+
+from dependencies import ProfilerDep
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from profiling import ProfileInfo
+
+router = APIRouter(tags=["Profiling"])
+
+
+@router.get("")
+async def get_profiles(profiler: ProfilerDep) -> List[ProfileInfo]:
+    """
+    Return the saved profiles of requests and messages, from the most recent one.
+    """
+    return profiler.list_profiles()
+
+
+@router.get("/{name}/{file_name}")
+async def get_profile_file(profiler: ProfilerDep, name: str, file_name: str) -> FileResponse:
+    """
+    Download a file of a saved profile (`profile.pstats`, `profile.txt` or a PyTorch trace).
+    """
+    try:
+        return FileResponse(profiler.get_file(name, file_name), filename=file_name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Profile file {name}/{file_name} not found")
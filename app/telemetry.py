@@ -0,0 +1,77 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Span
+from opentelemetry.util.types import AttributeValue
+
+# Instruments created before `setup_otel` sets the providers forward to them once they are set
+_tracer = trace.get_tracer(__name__)
+_meter = metrics.get_meter(__name__)
+
+# Set by `setup_otel` if metrics are exported, so measurements which cost more than the work (e.g. sizes
+# of messages serialized again) are skipped otherwise
+metrics_enabled = False
+
+stage_duration = _meter.create_histogram(
+    "chunker.stage.duration",
+    unit="s",
+    description="Duration of a stage of the chunking pipeline",
+)
+chars_counter = _meter.create_counter(
+    "chunker.chars",
+    unit="{char}",
+    description="Number of characters of chunked documents",
+)
+chunks_counter = _meter.create_counter(
+    "chunker.chunks",
+    unit="{chunk}",
+    description="Number of created chunks",
+)
+tokens_counter = _meter.create_counter(
+    "chunker.tokens",
+    unit="{token}",
+    description="Number of tokens split into chunks (stage=split) or encoded by a model (stage=encode)",
+)
+batch_size_histogram = _meter.create_histogram(
+    "chunker.embedding.batch_size",
+    unit="{text}",
+    description="Number of texts encoded in a forward pass of the model",
+)
+published_messages_counter = _meter.create_counter(
+    "chunker.published.messages",
+    unit="{message}",
+    description="Number of published messages",
+)
+published_bytes_counter = _meter.create_counter(
+    "chunker.published.bytes",
+    unit="By",
+    description="Size of published messages",
+)
+
+
+@contextmanager
+def stage(name: str, model: str | None = None, **attributes: AttributeValue) -> Iterator[Span]:
+    """Trace a stage of the chunking pipeline as a child span and record its duration.
+
+    Only the stage name and the model are attributes of the duration metric, other attributes
+    (e.g. sizes) are set on the span only, so the number of metric time series stays bounded.
+
+    Args:
+        name (str): The name of the stage (e.g. `split`, `encode`, `publish`).
+        model (str | None): The name of the embedding model.
+        **attributes: Attributes of the span.
+    Yields:
+        Span: The span of the stage, to set attributes known at the end of the stage.
+    """
+    metric_attributes = {"stage": name} if model is None else {"stage": name, "model": model}
+    span_attributes = {k: v for k, v in attributes.items() if v is not None}
+    if model is not None:
+        span_attributes["model"] = model
+    start = time.perf_counter()
+    with _tracer.start_as_current_span(name, attributes=span_attributes) as span:
+        try:
+            yield span
+        finally:
+            stage_duration.record(time.perf_counter() - start, metric_attributes)
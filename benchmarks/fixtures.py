@@ -0,0 +1,99 @@
+import os
+import random
+from typing import List
+
+from sentence_transformers import SentenceTransformer
+from sentence_transformers import models as st_models
+from tokenizers import Tokenizer, decoders, models, normalizers, pre_tokenizers, processors, trainers
+from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "data", "long_pl.txt")
+
+# Randomly initialized BERT models, only their size matters for speed
+TEST_MODELS = {
+    "bench/tiny": {"hidden_size": 64, "num_hidden_layers": 2, "max_seq_length": 256},
+    "bench/small": {"hidden_size": 256, "num_hidden_layers": 4, "max_seq_length": 512},
+}
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def read_corpus(path: str = CORPUS_PATH) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def create_test_model(
+    path: str, corpus_path: str, hidden_size: int, num_hidden_layers: int, max_seq_length: int, vocab_size: int = 8000
+) -> None:
+    """Create a randomly initialized BERT model with a WordPiece tokenizer trained on the corpus.
+
+    Args:
+        path (str): The directory of the model.
+        corpus_path (str): The text used to train the tokenizer.
+        hidden_size (int): The size of hidden layers.
+        num_hidden_layers (int): The number of transformer layers.
+        max_seq_length (int): The maximum number of tokens of an input.
+        vocab_size (int): The maximum size of the vocabulary.
+    """
+    tokenizer = Tokenizer(models.WordPiece(unk_token="[UNK]"))
+    tokenizer.normalizer = normalizers.BertNormalizer(lowercase=True)
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.decoder = decoders.WordPiece()
+    tokenizer.train([corpus_path], trainers.WordPieceTrainer(vocab_size=vocab_size, special_tokens=SPECIAL_TOKENS))
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B [SEP]",
+        special_tokens=[("[CLS]", tokenizer.token_to_id("[CLS]")), ("[SEP]", tokenizer.token_to_id("[SEP]"))],
+    )
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+        model_max_length=max_seq_length,
+    )
+    config = BertConfig(
+        vocab_size=tokenizer.get_vocab_size(),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_hidden_layers,
+        num_attention_heads=max(1, hidden_size // 64),
+        intermediate_size=hidden_size * 4,
+        max_position_embeddings=max_seq_length,
+    )
+    BertModel(config).save_pretrained(path)
+    fast_tokenizer.save_pretrained(path)
+    transformer = st_models.Transformer(path, max_seq_length=max_seq_length)
+    pooling = st_models.Pooling(transformer.get_embedding_dimension())
+    SentenceTransformer(modules=[transformer, pooling]).save(path)
+
+
+def ensure_test_models(data_dir: str, corpus_path: str = CORPUS_PATH) -> List[str]:
+    """Create the test models in the data directory unless they exist and return their names."""
+    for name, params in TEST_MODELS.items():
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(os.path.join(path, "modules.json")):
+            os.makedirs(path, exist_ok=True)
+            create_test_model(path, corpus_path, **params)
+    return list(TEST_MODELS)
+
+
+def synthetic_document(corpus: str, size: int, seed: int = 0) -> str:
+    """Build a document of `size` characters from paragraphs of the corpus.
+
+    Words of each paragraph are shuffled, so paragraphs are not repeated
+    (repeated texts would be counted from the token count cache).
+    """
+    paragraphs = [p.split(" ") for p in corpus.split("\n\n") if p.strip()]
+    rng = random.Random(seed)
+    ret = []
+    length = 0
+    while length < size:
+        words = list(rng.choice(paragraphs))
+        rng.shuffle(words)
+        paragraph = " ".join(words)
+        ret.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(ret)[:size]
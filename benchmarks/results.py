@@ -0,0 +1,163 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, List
+
+
+@dataclass
+class Timing:
+    rounds: int
+    mean: float
+    median: float
+    min: float
+    stdev: float
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    params: dict[str, Any]
+    metrics: dict[str, float]
+    timing: Timing | None = None
+
+    @property
+    def key(self) -> str:
+        """Identifies the benchmark when results are compared with a baseline."""
+        return self.name + "".join(f" {k}={v}" for k, v in sorted(self.params.items()))
+
+
+@dataclass
+class Comparison:
+    key: str
+    metric: str
+    baseline: float
+    current: float
+    change: float  # relative, positive - better
+    regression: bool
+
+
+@dataclass
+class BenchmarkRun:
+    metadata: dict[str, Any] = field(default_factory=dict)
+    results: List[BenchmarkResult] = field(default_factory=list)
+
+
+def measure(func: Callable[[], Any], min_time: float = 1.0, min_rounds: int = 3, max_rounds: int = 1000) -> Timing:
+    """Call the function repeatedly (after a warm-up call) and return the statistics of call durations.
+
+    Args:
+        func (Callable[[], Any]): The measured function.
+        min_time (float): The minimum total time of measured calls in seconds.
+        min_rounds (int): The minimum number of measured calls.
+        max_rounds (int): The maximum number of measured calls.
+    Returns:
+        Timing: The durations of calls in seconds.
+    """
+    func()
+    durations: List[float] = []
+    while len(durations) < max_rounds and (len(durations) < min_rounds or sum(durations) < min_time):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return Timing(
+        rounds=len(durations),
+        mean=statistics.mean(durations),
+        median=statistics.median(durations),
+        min=min(durations),
+        stdev=statistics.stdev(durations) if len(durations) > 1 else 0.0,
+    )
+
+
+def metric_direction(metric: str) -> int:
+    """Return 1 if higher values of the metric are better, -1 if lower ones and 0 if it is not compared.
+
+    Rates (`*_per_s`) are better when higher, durations (`*_s`) when lower, other metrics (e.g. counts) are informative.
+    """
+    if metric.endswith("_per_s"):
+        return 1
+    if metric.endswith("_s"):
+        return -1
+    return 0
+
+
+def compare(current: BenchmarkRun, baseline: BenchmarkRun, threshold: float = 0.15) -> List[Comparison]:
+    """Compare the metrics of benchmarks found in both runs.
+
+    Args:
+        current (BenchmarkRun): The current results.
+        baseline (BenchmarkRun): The saved results.
+        threshold (float): The relative change for the worse reported as a regression.
+    Returns:
+        List[Comparison]: The comparison of each metric.
+    """
+    baseline_results = {r.key: r for r in baseline.results}
+    ret = []
+    for result in current.results:
+        base = baseline_results.get(result.key)
+        if base is None:
+            continue
+        for metric, value in result.metrics.items():
+            base_value = base.metrics.get(metric)
+            direction = metric_direction(metric)
+            if not base_value or not direction:
+                continue
+            change = direction * (value - base_value) / base_value
+            ret.append(Comparison(result.key, metric, base_value, value, change, change < -threshold))
+    return ret
+
+
+def format_comparisons(comparisons: List[Comparison]) -> str:
+    lines = [f"{'benchmark':60} {'metric':16} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for c in comparisons:
+        flag = "  REGRESSION" if c.regression else ""
+        lines.append(
+            f"{c.key:60} {c.metric:16} {c.baseline:12.4g} {c.current:12.4g} {c.change:+8.1%}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def run_metadata() -> dict[str, Any]:
+    """Describe the environment, so that only comparable runs are compared."""
+    import torch
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_run(run: BenchmarkRun, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(asdict(run), f, indent=2)
+
+
+def load_run(path: str) -> BenchmarkRun:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    results = [
+        BenchmarkResult(
+            name=r["name"],
+            params=r["params"],
+            metrics=r["metrics"],
+            timing=Timing(**r["timing"]) if r.get("timing") else None,
+        )
+        for r in data["results"]
+    ]
+    return BenchmarkRun(metadata=data.get("metadata", {}), results=results)
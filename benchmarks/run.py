@@ -0,0 +1,245 @@
+"""Offline benchmarks of splitting, token counting, embedding and end-to-end chunking.
+
+Run from the project root:
+
+    python -m benchmarks.run --output benchmark_results.json [--baseline baseline.json] [--quick]
+
+Models are small randomly initialized BERT models generated on first run (see `fixtures.py`),
+so no network access is needed and the results depend only on the code and the machine.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+# Add the 'app' directory to the Python path to allow imports from 'app'
+sys.path.insert(0, str(Path(__file__).parent.parent / "app"))
+
+from app_config import AppConfig
+from features.chunks.chunk_model import ChunksRequest
+from features.chunks.chunk_service import ChunkService
+from features.chunks.recursive_splitter import RecursiveSplitter
+from features.embeddings.embedding_service import EmbeddingService
+from features.embeddings.token_counter import TokenCounter
+
+from .fixtures import ensure_test_models, read_corpus, synthetic_document
+from .results import (
+    BenchmarkResult,
+    BenchmarkRun,
+    compare,
+    format_comparisons,
+    load_run,
+    measure,
+    run_metadata,
+    save_run,
+)
+
+SPLITTER_MODES = {"langchain": False, "token_offsets": True}
+CHUNK_OVERLAP = 128
+
+
+class Benchmarks:
+    def __init__(self, embedding_service: EmbeddingService, corpus: str, quick: bool = False, min_time: float = 1.0):
+        """
+        Args:
+            embedding_service (EmbeddingService): The service with the test models.
+            corpus (str): The text from which documents and passages are made.
+            quick (bool): If True, the largest documents and batches are skipped.
+            min_time (float): The minimum measured time of each benchmark in seconds.
+        """
+        self.embedding_service = embedding_service
+        self.corpus = corpus
+        self.min_time = min_time
+        self.document_sizes = [10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]
+        self.chunking_sizes = [10_000] if quick else [10_000, 100_000]
+        self.batch_sizes = [1, 8] if quick else [1, 8, 32]
+        self.passage_count = 32 if quick else 128
+
+    def run(self, model_names: List[str], only: List[str] | None = None) -> List[BenchmarkResult]:
+        benchmarks = {
+            "split": self.split,
+            "count_tokens": self.count_tokens,
+            "embedding": self.embedding,
+            "chunking": self.chunking,
+        }
+        ret = []
+        for name, benchmark in benchmarks.items():
+            if only and name not in only:
+                continue
+            for model_name in model_names:
+                for result in benchmark(model_name):
+                    print(f"{result.key}: " + ", ".join(f"{k}={v:.4g}" for k, v in result.metrics.items()))
+                    ret.append(result)
+        return ret
+
+    def splitter(self, model_name: str, use_token_offsets: bool) -> RecursiveSplitter:
+        """A splitter as created by `ChunkService`, with an empty token count cache."""
+        model = self.embedding_service.get_model(model_name)
+        return RecursiveSplitter(
+            model,
+            model.max_seq_length,
+            CHUNK_OVERLAP,
+            use_token_offsets=use_token_offsets,
+            token_counter=TokenCounter(model.tokenizer, self.embedding_service.token_count_cache_size),
+        )
+
+    def passages(self, model_name: str) -> List[str]:
+        """Chunk-sized passages of the corpus, all different."""
+        document = synthetic_document(self.corpus, 200_000, seed=1)
+        chunks = self.splitter(model_name, True).split(document)
+        return list(dict.fromkeys(doc.page_content for doc in chunks))[: self.passage_count]
+
+    def split(self, model_name: str) -> List[BenchmarkResult]:
+        """Characters per second of `RecursiveSplitter.split` for documents of increasing size."""
+        ret = []
+        for mode, use_token_offsets in SPLITTER_MODES.items():
+            for size in self.document_sizes:
+                document = synthetic_document(self.corpus, size)
+                chunks: list = []
+                timing = measure(
+                    lambda: chunks.__setitem__(
+                        slice(None), self.splitter(model_name, use_token_offsets).split(document)
+                    ),
+                    self.min_time,
+                    min_rounds=1 if size >= 1_000_000 else 3,
+                )
+                ret.append(
+                    BenchmarkResult(
+                        "split",
+                        {"model": model_name, "mode": mode, "chars": size},
+                        {"chars_per_s": size / timing.median, "chunks": len(chunks)},
+                        timing,
+                    )
+                )
+        return ret
+
+    def count_tokens(self, model_name: str) -> List[BenchmarkResult]:
+        """Calls per second of `RecursiveSplitter.count_tokens` with and without a token counter."""
+        passages = self.passages(model_name)
+        model = self.embedding_service.get_model(model_name)
+        warm_counter = TokenCounter(model.tokenizer, len(passages))
+        warm_counter.count_many(passages)
+        splitters = {
+            "model": lambda: RecursiveSplitter(model, model.max_seq_length, CHUNK_OVERLAP),
+            "token_counter": lambda: self.splitter(model_name, False),
+            "token_counter_cached": lambda: RecursiveSplitter(
+                model, model.max_seq_length, CHUNK_OVERLAP, token_counter=warm_counter
+            ),
+        }
+        ret = []
+        for counter, create_splitter in splitters.items():
+
+            def count_all():
+                splitter = create_splitter()
+                for text in passages:
+                    splitter.count_tokens(text)
+
+            timing = measure(count_all, self.min_time)
+            ret.append(
+                BenchmarkResult(
+                    "count_tokens",
+                    {"model": model_name, "counter": counter},
+                    {"calls_per_s": len(passages) / timing.median},
+                    timing,
+                )
+            )
+        return ret
+
+    def embedding(self, model_name: str) -> List[BenchmarkResult]:
+        """Texts and tokens per second of `EmbeddingService.encode` for each batch size."""
+        passages = self.passages(model_name)
+        model = self.embedding_service.get_model(model_name)
+        token_counter = self.embedding_service.get_token_counter(model_name)
+        tokens = sum(min(n, model.max_seq_length) for n in token_counter.count_many(passages))
+        ret = []
+        for batch_size in self.batch_sizes:
+            timing = measure(
+                lambda: self.embedding_service.encode(model_name, passages, batch_size=batch_size), self.min_time
+            )
+            ret.append(
+                BenchmarkResult(
+                    "embedding",
+                    {"model": model_name, "batch_size": batch_size, "texts": len(passages)},
+                    {"texts_per_s": len(passages) / timing.median, "tokens_per_s": tokens / timing.median},
+                    timing,
+                )
+            )
+        return ret
+
+    def chunking(self, model_name: str) -> List[BenchmarkResult]:
+        """Latency of `ChunkService.create_chunks` with language detection and embeddings."""
+        ret = []
+        for mode, use_token_offsets in SPLITTER_MODES.items():
+            chunk_service = ChunkService(
+                self.embedding_service, chunk_overlap=CHUNK_OVERLAP, use_token_offsets=use_token_offsets
+            )
+            for size in self.chunking_sizes:
+                document = synthetic_document(self.corpus, size)
+                chunks: list = []
+                timing = measure(
+                    lambda: chunks.__setitem__(
+                        slice(None),
+                        chunk_service.create_chunks(
+                            ChunksRequest(text=document, embedding_model_name=model_name), generate_embeddings=True
+                        ),
+                    ),
+                    self.min_time,
+                )
+                ret.append(
+                    BenchmarkResult(
+                        "chunking",
+                        {"model": model_name, "mode": mode, "chars": size},
+                        {
+                            "median_s": timing.median,
+                            "mean_s": timing.mean,
+                            "chars_per_s": size / timing.median,
+                            "chunks": len(chunks),
+                        },
+                        timing,
+                    )
+                )
+        return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark_results.json", help="The file the results are written to.")
+    parser.add_argument("--baseline", help="The results of an earlier run to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="The relative slowdown reported as a regression.")
+    parser.add_argument("--data-dir", default=".benchmarks/models", help="The directory of the generated models.")
+    parser.add_argument("--only", nargs="+", choices=["split", "count_tokens", "embedding", "chunking"])
+    parser.add_argument("--quick", action="store_true", help="Skip the largest documents and batches.")
+    parser.add_argument("--min-time", type=float, default=1.0, help="The minimum measured time of each benchmark.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.makedirs(args.data_dir, exist_ok=True)
+    model_names = ensure_test_models(args.data_dir)
+    config = AppConfig(
+        data_dir=args.data_dir,
+        default_model_for_language={"pl": model_names[0], "en": model_names[0]},
+        pinned_models=model_names,
+        # Every round has to encode the texts again
+        embedding_cache_size=0,
+    )
+    embedding_service = EmbeddingService(config)
+    embedding_service.warm_up_models()
+
+    run = BenchmarkRun(metadata=run_metadata())
+    run.metadata.update(quick=args.quick, min_time=args.min_time)
+    run.results = Benchmarks(embedding_service, read_corpus(), args.quick, args.min_time).run(model_names, args.only)
+    save_run(run, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        comparisons = compare(run, load_run(args.baseline), args.threshold)
+        print(format_comparisons(comparisons))
+        if any(c.regression for c in comparisons):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import sys
 from pathlib import Path
 
+import numpy as np
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 
@@ -10,6 +11,16 @@ from sentence_transformers import SentenceTransformer
 sys.path.insert(0, str(Path(__file__).parent / "app"))
 
 from app_config import AppConfig
+from features.embeddings.embedding_quantization import calibrate, calibration_path, read_calibration_corpus
+from features.embeddings.model_backend import check_equivalence, export_onnx, onnx_file_name
+
+# Texts used to compare ONNX and PyTorch embeddings if there is no calibration corpus
+SAMPLE_TEXTS = [
+    "Jaka jest stolica Polski?",
+    "Warszawa jest stolicą i największym miastem Polski.",
+    "What is the capital of Poland?",
+    "Warsaw is the capital and the largest city of Poland.",
+]
 
 def main():
     load_dotenv()
@@ -19,6 +30,10 @@ def main():
         print("No models configured in 'model_names'. Exiting.")
         return
 
+    calibration_texts = []
+    if config.quantization_calibration_corpus:
+        calibration_texts = read_calibration_corpus(config.quantization_calibration_corpus)
+
     for model_name in config.model_names:
         local_save_directory = f"{config.data_dir}/{model_name}"
         os.makedirs(local_save_directory, exist_ok=True)
@@ -38,8 +53,37 @@ def main():
         except Exception as e:
             print(f"Error saving model '{model_name}': {e}")
 
+        if calibration_texts:
+            try:
+                path = calibration_path(config.data_dir, model_name)
+                np.save(path, calibrate(model, calibration_texts))
+                print(f"Model '{model_name}' calibrated for quantization: {path}")
+            except Exception as e:
+                print(f"Error calibrating model '{model_name}': {e}")
+
+        backend = config.model_backends.get(model_name, "torch")
+        if backend != "torch":
+            export_model(config, model, local_save_directory, backend, calibration_texts or SAMPLE_TEXTS)
+
     print("\nProcess completed.")
 
 
+def export_model(config: AppConfig, model: SentenceTransformer, path: str, backend: str, texts: list[str]):
+    """Export the model to ONNX and check that it generates the same embeddings as PyTorch.
+
+    If the check fails, the exported file is removed, so the model is served by PyTorch.
+    """
+    onnx_path = os.path.join(path, "onnx", onnx_file_name(backend, config.onnx_quantization_config))
+    try:
+        onnx_model = export_onnx(path, backend, config.onnx_quantization_config)
+        print(f"Model '{path}' exported to ONNX: {onnx_path}")
+        distance = check_equivalence(model, onnx_model, texts, config.onnx_equivalence_tolerance)
+        print(f"Model '{path}' ONNX embeddings are equivalent (max cosine distance: {distance:.5f})")
+    except Exception as e:
+        print(f"Error exporting model '{path}' to ONNX: {e}")
+        if os.path.exists(onnx_path):
+            os.remove(onnx_path)
+
+
 if __name__ == "__main__":
     main()
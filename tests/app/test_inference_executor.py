@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+from inference_executor import InferenceExecutor, InferenceExecutorSaturated
+from log_context import job_id_context
+
+
+@pytest.mark.asyncio
+async def test_run_in_worker_thread():
+    # Given: An inference executor
+    executor = InferenceExecutor()
+    # When: A function is run
+    thread_name = await executor.run(lambda: threading.current_thread().name)
+    executor.shutdown()
+    # Then: It is run outside the event loop thread
+    assert thread_name.startswith("inference")
+
+
+@pytest.mark.asyncio
+async def test_context_variables_are_passed():
+    # Given: A logging context
+    job_id_context.set("job-1")  # type: ignore
+    executor = InferenceExecutor()
+    # When: A function is run
+    job_id = await executor.run(job_id_context.get)
+    executor.shutdown()
+    # Then: The context is visible in the worker thread
+    assert job_id == "job-1"
+
+
+@pytest.mark.asyncio
+async def test_saturated_executor_rejects_tasks():
+    # Given: An executor with one worker and one queue slot
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+    running = [asyncio.create_task(executor.run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    # When: Another task is run
+    # Then: It is rejected at once
+    with pytest.raises(InferenceExecutorSaturated):
+        await executor.run(release.wait)
+    # And: Tasks accepted earlier are finished
+    release.set()
+    assert await asyncio.gather(*running) == [True, True]
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_task_is_pending_until_done():
+    # Given: A task running in an executor with one worker and no queue
+    executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+    release = threading.Event()
+    task = asyncio.create_task(executor.run(release.wait))
+    await asyncio.sleep(0.01)
+    # When: Its caller is cancelled
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # Then: The task still occupies the worker
+    assert executor.pending == 1
+    with pytest.raises(InferenceExecutorSaturated):
+        await executor.run(release.wait)
+    # And: The worker is free once the task is done
+    release.set()
+    await asyncio.sleep(0.01)
+    assert executor.pending == 0
+    assert await executor.run(lambda: True)
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_iterate_in_worker_thread():
+    # Given: A blocking generator
+    def generate():
+        for i in range(3):
+            yield i, threading.current_thread().name
+
+    executor = InferenceExecutor()
+    # When: It is iterated in the executor
+    items = [item async for item in executor.iterate(generate())]
+    executor.shutdown()
+    # Then: All items are returned in order and generated outside the event loop thread
+    assert [i for i, _ in items] == [0, 1, 2]
+    assert all(name.startswith("inference") for _, name in items)
+
+
+@pytest.mark.asyncio
+async def test_started_iteration_waits_for_saturated_executor():
+    # Given: An iteration which has started
+    executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+    items = executor.iterate(iter(range(3)))
+    assert await anext(items) == 0
+    # When: The executor is saturated by another task
+    release = threading.Event()
+    running = asyncio.create_task(executor.run(release.wait))
+    await asyncio.sleep(0.01)
+    asyncio.get_running_loop().call_later(0.05, release.set)
+    # Then: The next items are returned once the executor is free
+    assert [item async for item in items] == [1, 2]
+    assert await running
+    executor.shutdown()
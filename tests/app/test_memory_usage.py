@@ -0,0 +1,21 @@
+import sys
+
+import pytest
+
+from app.memory_usage import read_memory_usage
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Requires /proc")
+def test_read_memory_usage():
+    # When: Memory usage of the current process is read
+    usage = read_memory_usage()
+    # Then: Resident memory is split into unique and shared pages
+    assert usage
+    assert usage.rss > 0
+    assert usage.unique > 0
+    assert usage.unique + usage.shared == usage.rss
+
+
+def test_read_memory_usage_of_missing_process():
+    # When/Then: Memory usage of a process which does not exist is not available
+    assert read_memory_usage("missing") is None
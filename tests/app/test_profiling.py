@@ -0,0 +1,184 @@
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from inference_executor import InferenceExecutor
+from log_context import job_id_context, task_id_context
+from profiling import Profiler, ProfilingMiddleware, profile_session_context, profile_torch
+
+
+def busy_function() -> int:
+    return sum(i * i for i in range(10000))
+
+
+async def profile_request(profiler: Profiler, source: str) -> None:
+    executor = InferenceExecutor()
+    async with profiler.session(source):
+        await executor.run(busy_function)
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_work_in_inference_executor_is_profiled(tmp_path):
+    # Given: An enabled profiler and a job context
+    profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    executor = InferenceExecutor()
+    job_id = uuid.uuid4()
+    # When: A request runs a function in the inference executor within a profile session
+    async with profiler.session("POST /api/chunks/"):
+        job_id_context.set(job_id)
+        task_id_context.set(None)
+        await executor.run(busy_function)
+    executor.shutdown()
+    # Then: The profile of the process (including the worker thread) is saved under the job ID
+    (profile,) = profiler.list_profiles()
+    assert str(job_id) in profile.name
+    assert profile.job_id == str(job_id)
+    assert profile.source == "POST /api/chunks/"
+    assert profile.files == ["profile.json", "profile.pstats", "profile.txt"]
+    with open(profiler.get_file(profile.name, "profile.txt")) as f:
+        assert "busy_function" in f.read()
+    assert profile_session_context.get() is None
+
+
+@pytest.mark.asyncio
+async def test_one_request_is_profiled_at_a_time(tmp_path):
+    # Given: A request being profiled
+    profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    executor = InferenceExecutor()
+    async with profiler.session("request 1") as session1:
+        await executor.run(busy_function)
+        # When: Another request asks for profiling
+        async with profiler.session("request 2") as session2:
+            await executor.run(busy_function)
+    executor.shutdown()
+    # Then: It is skipped
+    assert session1 is not None
+    assert session2 is None
+    assert [p.source for p in profiler.list_profiles()] == ["request 1"]
+
+
+@pytest.mark.asyncio
+async def test_empty_profile_is_not_saved(tmp_path):
+    # Given: An enabled profiler
+    profiler = Profiler(str(tmp_path), enabled=True)
+    # When: A request which runs no work is profiled (e.g. it is rejected)
+    async with profiler.session("request"):
+        pass
+    # Then: Its profile is not saved
+    assert profiler.list_profiles() == []
+    assert os.listdir(tmp_path) == []
+
+
+def create_app(profiler: Profiler, api_key: str | None = None) -> FastAPI:
+    executor = InferenceExecutor()
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    app.state.app_state = SimpleNamespace(profiler=profiler, config=SimpleNamespace(api_key=api_key))
+
+    @app.post("/chunks")
+    async def create_chunks() -> int:
+        return await executor.run(busy_function)
+
+    return app
+
+
+def test_requests_with_header_are_profiled(tmp_path):
+    # Given: An app with an enabled profiler
+    profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    client = TestClient(create_app(profiler))
+    # When: A request without and one with the profile header are sent
+    client.post("/chunks")
+    response = client.post("/chunks", headers={"X-Profile": "true"})
+    # Then: Only the second one is profiled
+    (profile,) = profiler.list_profiles()
+    assert profile.source == "POST /chunks"
+    assert "profile.pstats" in profile.files
+    assert "x-profile" not in response.headers
+
+
+def test_requests_without_api_key_are_not_profiled(tmp_path):
+    # Given: An app requiring an API key
+    profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    client = TestClient(create_app(profiler, api_key="secret"))
+    # When: Requests with the profile header and a wrong, a missing and a valid API key are sent
+    client.post("/chunks", headers={"X-Profile": "true", "X-API-Key": "wrong"})
+    client.post("/chunks", headers={"X-Profile": "true"})
+    client.post("/chunks", headers={"X-Profile": "true", "X-API-Key": "secret"})
+    # Then: Only the request with the valid API key is profiled
+    assert len(profiler.list_profiles()) == 1
+
+
+@pytest.mark.asyncio
+async def test_skipped_profile_is_flagged_in_response(tmp_path):
+    # Given: A request being profiled
+    profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    client = TestClient(create_app(profiler))
+    async with profiler.session("request 1"):
+        # When: Another request asks for profiling
+        response = client.post("/chunks", headers={"X-Profile": "true"})
+    # Then: It is processed without a profile, which is flagged in its response
+    assert response.status_code == 200
+    assert response.headers["x-profile"] == "skipped"
+
+
+def test_profiling_is_opt_in(tmp_path):
+    # Given: A disabled and an enabled profiler
+    disabled = Profiler(str(tmp_path))
+    enabled = Profiler(str(tmp_path), enabled=True)
+    # When/Then: Only the enabled one profiles requests which ask for it
+    assert not disabled.is_requested("true")
+    assert enabled.is_requested("true")
+    assert enabled.is_requested("1")
+    assert not enabled.is_requested(None)
+    assert not enabled.is_requested("false")
+
+
+@pytest.mark.asyncio
+async def test_oldest_profiles_are_removed(tmp_path):
+    # Given: A profiler keeping 2 profiles
+    profiler = Profiler(str(tmp_path), enabled=True, max_profiles=2)
+    # When: 3 requests are profiled
+    for i in range(3):
+        await profile_request(profiler, f"request {i}")
+    # Then: The 2 most recent ones are kept
+    assert [p.source for p in profiler.list_profiles()] == ["request 2", "request 1"]
+    assert len(os.listdir(tmp_path)) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_file_outside_profile(tmp_path):
+    # Given: A saved profile
+    profiler = Profiler(str(tmp_path), enabled=True)
+    await profile_request(profiler, "request")
+    (profile,) = profiler.list_profiles()
+    # When/Then: Only files of saved profiles are available
+    with pytest.raises(FileNotFoundError):
+        profiler.get_file(profile.name, "../profile.json")
+    with pytest.raises(FileNotFoundError):
+        profiler.get_file("..", "profile.json")
+    with pytest.raises(FileNotFoundError):
+        profiler.get_file(profile.name, "missing.txt")
+
+
+@pytest.mark.asyncio
+async def test_profile_torch(tmp_path):
+    torch = pytest.importorskip("torch")
+    # Given: An enabled profiler with the PyTorch profiler
+    profiler = Profiler(str(tmp_path), enabled=True)
+    # When: A forward pass is run within a profile session, with a nested one, and another one outside of it
+    async with profiler.session("request"):
+        with profile_torch("org/model"):
+            with profile_torch("org/model"):
+                torch.ones(8, 8) @ torch.ones(8, 8)
+    with profile_torch("org/model"):
+        torch.ones(8, 8) @ torch.ones(8, 8)
+    # Then: Only the first one is profiled, the nested one is counted as skipped
+    (profile,) = profiler.list_profiles()
+    assert profile.files[:2] == ["profile.json", "profile.pstats"]
+    assert [f for f in profile.files if f.startswith("torch")] == ["torch-000-org_model.json", "torch-000-org_model.txt"]
+    assert profile.torch_skipped == 1
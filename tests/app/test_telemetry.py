@@ -0,0 +1,60 @@
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app import telemetry
+
+
+@pytest.fixture
+def span_exporter(mocker):
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    mocker.patch.object(telemetry, "_tracer", tracer_provider.get_tracer(__name__))
+    return exporter
+
+
+@pytest.fixture
+def metric_reader(mocker):
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter(__name__)
+    mocker.patch.object(telemetry, "stage_duration", meter.create_histogram("chunker.stage.duration"))
+    return reader
+
+
+def get_points(reader: InMemoryMetricReader, name: str) -> list:
+    metrics_data = reader.get_metrics_data()
+    return [
+        point
+        for resource_metrics in metrics_data.resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+        if metric.name == name
+        for point in metric.data.data_points
+    ]
+
+
+def test_stage_creates_child_span(span_exporter):
+    # When: A stage runs within another one
+    with telemetry.stage("create_chunks"):
+        with telemetry.stage("split", "org/model", chars=100, language=None) as span:
+            span.set_attribute("chunks", 2)
+    # Then: The stage is a child span with the given attributes, except empty ones
+    split, create_chunks = span_exporter.get_finished_spans()
+    assert split.name == "split"
+    assert split.parent.span_id == create_chunks.context.span_id
+    assert dict(split.attributes) == {"chars": 100, "model": "org/model", "chunks": 2}
+
+
+def test_stage_records_duration(span_exporter, metric_reader):
+    # When: A stage fails
+    with pytest.raises(ValueError):
+        with telemetry.stage("encode", "org/model", batch_size=8):
+            raise ValueError()
+    # Then: Its duration is recorded with the stage and the model only
+    (point,) = get_points(metric_reader, "chunker.stage.duration")
+    assert dict(point.attributes) == {"stage": "encode", "model": "org/model"}
+    assert point.count == 1
@@ -0,0 +1,51 @@
+import uuid
+
+from app.features.chunks.chunk_groups import group_chunks
+from app.features.chunks.chunk_model import ChunkWithEmbeddings
+
+
+def create_chunk(i: int, job_id: uuid.UUID | None = None, text: str = "text") -> ChunkWithEmbeddings:
+    return ChunkWithEmbeddings(
+        job_id=job_id,
+        chunk_index=i,
+        total_chunks=10,
+        language="en",
+        embedding_model_name="model",
+        text=text,
+        embedding=[],
+    )
+
+
+def test_group_chunks_by_size():
+    # Given
+    chunks = [create_chunk(i) for i in range(10)]
+    # When
+    groups = group_chunks(chunks, max_size=4, max_bytes=1024 * 1024)
+    # Then
+    assert [[c.chunk_index for c in g.chunks] for g in groups] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_group_chunks_by_bytes():
+    # Given: Chunks of about 1 KB
+    chunks = [create_chunk(i, text="x" * 1000) for i in range(5)]
+    # When
+    groups = group_chunks(chunks, max_size=100, max_bytes=3000)
+    # Then
+    assert [len(g.chunks) for g in groups] == [2, 2, 1]
+
+
+def test_chunk_larger_than_max_bytes_has_own_group():
+    chunks = [create_chunk(0, text="x" * 5000), create_chunk(1)]
+
+    groups = group_chunks(chunks, max_size=100, max_bytes=1000)
+
+    assert [len(g.chunks) for g in groups] == [1, 1]
+
+
+def test_chunks_of_different_jobs_are_not_grouped():
+    job1, job2 = uuid.uuid4(), uuid.uuid4()
+    chunks = [create_chunk(0, job1), create_chunk(1, job1), create_chunk(0, job2)]
+
+    groups = group_chunks(chunks, max_size=100, max_bytes=1024 * 1024)
+
+    assert [[c.job_id for c in g.chunks] for g in groups] == [[job1, job1], [job2]]
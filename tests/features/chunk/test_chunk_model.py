@@ -1,7 +1,7 @@
 import pytest
 from pydantic import ValidationError
 
-from app.features.chunks.chunk_model import ChunksRequest, GcpFile
+from app.features.chunks.chunk_model import ChunkGroup, ChunksRequest, ChunkWithEmbeddings, GcpFile
 
 
 def test_chunks_request_with_text():
@@ -44,3 +44,17 @@ def test_chunks_request_with_neither_text_nor_input_file():
     """
     with pytest.raises(ValidationError, match="Either 'text' or 'input_file' must be provided."):
         ChunksRequest()
+
+
+def test_chunk_group_accepts_single_chunk_message():
+    """
+    Tests that a message with a single chunk is parsed as a group of one chunk.
+    """
+    # Given: a single chunk message
+    chunk = ChunkWithEmbeddings(
+        chunk_index=0, total_chunks=1, language="en", embedding_model_name="model", text="text", embedding=[]
+    )
+    # When: parsing it as a group
+    group = ChunkGroup.model_validate_json(chunk.model_dump_json())
+    # Then: the group has the chunk
+    assert group.chunks == [chunk]
@@ -0,0 +1,46 @@
+from app.features.chunks.embedding_policy import CostModelPolicy, FixedCountPolicy
+from app.features.embeddings.throughput_profile import ThroughputProfile
+
+
+def test_fixed_count_policy():
+    policy = FixedCountPolicy(max_chunks=2)
+
+    assert policy.inline_chunks("model", [500, 500]) == 2
+    assert policy.inline_chunks("model", [10, 10, 10]) == 0
+
+
+def test_cost_model_policy_within_budget():
+    # Given: A model embedding 1000 tokens per second and 2 seconds for inline embedding
+    throughput = ThroughputProfile()
+    throughput.record("model", 1000, 1.0)
+    policy = CostModelPolicy(throughput, time_budget=2.0)
+    # When: Many short chunks fit in the budget
+    inline = policy.inline_chunks("model", [20] * 100)
+    # Then: All of them are embedded inline
+    assert inline == 100
+
+
+def test_cost_model_policy_splits_document():
+    # Given: A model embedding 1000 tokens per second and 2 seconds for inline embedding
+    throughput = ThroughputProfile()
+    throughput.record("model", 1000, 1.0)
+    policy = CostModelPolicy(throughput, time_budget=2.0)
+    # When: Only a part of the chunks fits in the budget
+    inline = policy.inline_chunks("model", [512] * 10)
+    # Then: The first chunks are embedded inline, the rest is fanned out
+    assert inline == 3
+
+
+def test_cost_model_policy_under_load():
+    # Given: A worker shared by 4 tasks
+    throughput = ThroughputProfile()
+    throughput.record("model", 1000, 1.0)
+    policy = CostModelPolicy(throughput, time_budget=2.0, load=lambda: 4.0)
+    # When / Then: Fewer chunks are embedded inline
+    assert policy.inline_chunks("model", [100] * 30) == 5
+
+
+def test_cost_model_policy_uses_default_speed():
+    policy = CostModelPolicy(ThroughputProfile(default_tokens_per_second=100), time_budget=1.0)
+
+    assert policy.inline_chunks("unknown", [60, 60]) == 1
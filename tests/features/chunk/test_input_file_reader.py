@@ -0,0 +1,162 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.features.chunks.chunk_model import GcpFile
+from app.features.chunks.input_file_reader import InputFileReader, decode_utf8, slice_segments
+
+
+class FakeBlob:
+    """Blob serving ranged downloads of its content."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.size = len(content)
+        self.ranges: list[tuple[int, int]] = []
+
+    def download_as_bytes(self, start: int, end: int) -> bytes:
+        self.ranges.append((start, end))
+        return self.content[start : end + 1]
+
+
+class FakeBucket:
+    def __init__(self, files: dict[str, bytes]):
+        self.files = files
+
+    def get_blob(self, name: str) -> FakeBlob | None:
+        return FakeBlob(self.files[name]) if name in self.files else None
+
+
+class FakeClient:
+    """Client of a local fake Cloud Storage."""
+
+    def __init__(self, buckets: dict[str, dict[str, bytes]]):
+        self.buckets = buckets
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self.buckets.get(name, {}))
+
+
+def test_read_segments():
+    # Given
+    text = "Zażółć gęślą jaźń. " * 10
+    blob = FakeBlob(text.encode("utf-8"))
+    reader = InputFileReader(client=MagicMock(), segment_size=16)
+
+    # When
+    segments = list(reader.read_segments(blob))  # type: ignore
+
+    # Then
+    assert "".join(segments) == text
+    assert len(blob.ranges) == (blob.size + 15) // 16
+    assert all(end - start < 16 for start, end in blob.ranges)
+
+
+def test_read_segments_empty_file():
+    blob = FakeBlob(b"")
+    reader = InputFileReader(client=MagicMock())
+
+    assert list(reader.read_segments(blob)) == []  # type: ignore
+    assert blob.ranges == []
+
+
+def test_decode_utf8_character_split_between_segments():
+    # Given
+    data = "ąę€".encode("utf-8")
+
+    # When
+    segments = list(decode_utf8([data[i : i + 1] for i in range(len(data))]))
+
+    # Then
+    assert "".join(segments) == "ąę€"
+
+
+def test_decode_utf8_invalid_data():
+    with pytest.raises(UnicodeDecodeError):
+        list(decode_utf8([b"abc", b"\xc4"]))
+
+
+def test_slice_segments():
+    # Given
+    text = "one two three four five six seven"
+    segments = [text[i : i + 5] for i in range(0, len(text), 5)]
+    spans = [(0, 7), (4, 13), (8, 18), (24, 33)]
+
+    # When
+    slices = list(slice_segments(segments, spans))
+
+    # Then
+    assert slices == [text[start:end] for start, end in spans]
+
+
+def test_read_file_from_fake_bucket():
+    # Given
+    text = "Ala ma kota. " * 1000
+    reader = InputFileReader(
+        client=FakeClient({"default": {"file.md": text.encode("utf-8")}}),  # type: ignore
+        default_bucket="default",
+        segment_size=1000,
+        read_ahead=2,
+    )
+
+    # When
+    blob = reader.get_blob(GcpFile(name="file.md"))
+    segments = list(reader.read_segments(blob))
+    reader.close()
+
+    # Then
+    assert "".join(segments) == text
+    assert len(segments) == 13
+
+
+def test_read_segments_stopped_early():
+    # Given
+    blob = FakeBlob(b"x" * 100)
+    reader = InputFileReader(client=MagicMock(), segment_size=10, read_ahead=2)
+
+    # When
+    segments = reader.read_segments(blob)  # type: ignore
+    first = next(segments)
+    segments.close()
+    reader.close()
+
+    # Then
+    assert first == "x" * 10
+    # Only the read ahead segments were downloaded
+    assert len(blob.ranges) <= 3
+
+
+def test_client_is_created_once():
+    # Given
+    reader = InputFileReader(pool_size=4)
+
+    with patch("app.features.chunks.input_file_reader.storage.Client") as client_class:
+        # When
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(reader.client)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reader.close()
+
+    # Then
+    client_class.assert_called_once_with()
+    assert all(client is client_class.return_value for client in clients)
+    client_class.return_value._http.mount.assert_called()
+    client_class.return_value.close.assert_called_once_with()
+
+
+def test_get_blob_not_found():
+    reader = InputFileReader(client=FakeClient({"bucket": {}}))  # type: ignore
+
+    with pytest.raises(FileNotFoundError):
+        reader.get_blob(GcpFile(bucket="bucket", name="missing.md"))
+
+
+def test_get_blob_without_bucket():
+    reader = InputFileReader(client=FakeClient({}))  # type: ignore
+
+    with pytest.raises(ValueError):
+        reader.get_blob(GcpFile(name="file.md"))
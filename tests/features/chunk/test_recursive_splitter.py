@@ -1,6 +1,8 @@
-import pytest
+import re
 from unittest.mock import MagicMock
 
+import pytest
+
 from langchain_core.documents import Document
 from sentence_transformers import SentenceTransformer
 
@@ -185,4 +187,225 @@ def test_recursive_splitter_with_newlines(mock_sentence_transformer_for_splitter
     for i, doc in enumerate(documents):
         assert isinstance(doc, Document)
         assert doc.page_content == expected_chunks_content[i]
-    mock_sentence_transformer_for_splitter.tokenize.assert_called()
\ No newline at end of file
+    mock_sentence_transformer_for_splitter.tokenize.assert_called()
+
+
+@pytest.fixture
+def mock_sentence_transformer_with_offsets(mock_sentence_transformer_for_splitter: MagicMock) -> MagicMock:
+    """
+    Extends the mocked SentenceTransformer with a fast tokenizer returning offset mappings,
+    where every word is one token and no special tokens are added.
+    """
+    model = mock_sentence_transformer_for_splitter
+
+    def mock_tokenizer(text: str, **kwargs):
+        return {"offset_mapping": [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]}
+
+    model.tokenizer = MagicMock(side_effect=mock_tokenizer)
+    model.tokenizer.num_special_tokens_to_add.return_value = 0
+    return model
+
+
+@pytest.mark.parametrize(
+    ["chunk_size", "chunk_overlap", "test_text", "expected_chunks_content"],
+    [
+        (
+            5,
+            1,
+            "This is a simple sentence for testing the splitter functionality.",
+            ["This is a simple sentence", "sentence for testing the splitter", "splitter functionality."],
+        ),
+        (
+            4,
+            2,
+            "one two three four five six seven eight nine ten",
+            ["one two three four", "three four five six", "five six seven eight", "seven eight nine ten"],
+        ),
+        (
+            7,
+            1,
+            "Line one has four words.\n\nLine two also four words. Then a short one.",
+            ["Line one has four words.", "Line two also four words. Then a", "a short one."],
+        ),
+        (10, 2, "This text is short.", ["This text is short."]),
+    ],
+)
+def test_recursive_splitter_token_offsets(
+    mock_sentence_transformer_with_offsets: MagicMock, chunk_size, chunk_overlap, test_text, expected_chunks_content
+):
+    """Tests that token offsets mode splits like the default mode and tokenizes the text only once."""
+    splitter = RecursiveSplitter(
+        model=mock_sentence_transformer_with_offsets,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        use_token_offsets=True,
+    )
+
+    documents = splitter.split(test_text)
+
+    assert [doc.page_content for doc in documents] == expected_chunks_content
+    # Token counts are returned with chunks
+    assert [doc.metadata["token_count"] for doc in documents] == [len(c.split()) for c in expected_chunks_content]
+    mock_sentence_transformer_with_offsets.tokenizer.assert_called_once()
+    mock_sentence_transformer_with_offsets.tokenize.assert_not_called()
+
+
+def test_recursive_splitter_token_offsets_empty_text(mock_sentence_transformer_with_offsets: MagicMock):
+    """Tests token offsets mode with empty input text."""
+    splitter = RecursiveSplitter(
+        model=mock_sentence_transformer_with_offsets, chunk_size=5, chunk_overlap=1, use_token_offsets=True
+    )
+
+    documents = splitter.split("")
+
+    assert len(documents) == 1
+    assert documents[0].page_content == ""
+
+
+@pytest.fixture
+def long_text() -> str:
+    """Paragraphs of two lines with 2-8 words each."""
+    return "\n\n".join(
+        " ".join(f"p{p}w{w}" for w in range(p % 5 + 3)) + ".\n" + " ".join(f"p{p}l{w}" for w in range(p % 3 + 2))
+        for p in range(30)
+    )
+
+
+@pytest.mark.parametrize("use_token_offsets", [False, True])
+@pytest.mark.parametrize("segment_size", [7, 40])
+def test_recursive_splitter_split_stream(
+    mock_sentence_transformer_with_offsets: MagicMock, long_text: str, use_token_offsets: bool, segment_size: int
+):
+    """Tests that text read in segments is split into overlapping chunks which cover the whole text."""
+    # Given
+    splitter = RecursiveSplitter(
+        model=mock_sentence_transformer_with_offsets, chunk_size=6, chunk_overlap=2, use_token_offsets=use_token_offsets
+    )
+    segments = [long_text[i : i + segment_size] for i in range(0, len(long_text), segment_size)]
+
+    # When
+    documents = list(splitter.split_stream(segments, min_buffer_size=segment_size))
+
+    # Then
+    assert len(documents) > 10
+    prev_end = 0
+    for doc in documents:
+        start = doc.metadata["start_index"]
+        assert long_text[start : start + len(doc.page_content)] == doc.page_content
+        assert len(doc.page_content.split()) <= 6
+        # No text is skipped between chunks
+        assert long_text[prev_end:start].strip() == ""
+        prev_end = max(prev_end, start + len(doc.page_content))
+    assert prev_end == len(long_text)
+    # Chunks of long paragraphs overlap
+    ends = [doc.metadata["start_index"] + len(doc.page_content) for doc in documents]
+    assert any(doc.metadata["start_index"] < end for doc, end in zip(documents[1:], ends))
+
+
+@pytest.mark.parametrize("use_token_offsets", [False, True])
+def test_recursive_splitter_split_stream_one_buffer(
+    mock_sentence_transformer_with_offsets: MagicMock, long_text: str, use_token_offsets: bool
+):
+    """Tests that text fitting in the buffer is split like with `split`."""
+    splitter = RecursiveSplitter(
+        model=mock_sentence_transformer_with_offsets, chunk_size=6, chunk_overlap=2, use_token_offsets=use_token_offsets
+    )
+    segments = [long_text[i : i + 100] for i in range(0, len(long_text), 100)]
+
+    documents = list(splitter.split_stream(segments, min_buffer_size=len(long_text) + 1))
+
+    assert [doc.page_content for doc in documents] == [doc.page_content for doc in splitter.split(long_text)]
+
+
+def test_recursive_splitter_split_stream_empty_text(mock_sentence_transformer_with_offsets: MagicMock):
+    """Tests that an empty stream gives one empty chunk like `split`."""
+    splitter = RecursiveSplitter(model=mock_sentence_transformer_with_offsets, chunk_size=5, chunk_overlap=1)
+
+    documents = list(splitter.split_stream([], min_buffer_size=10))
+
+    assert [doc.page_content for doc in documents] == [""]
+
+
+def test_recursive_splitter_chunk_not_in_text(mock_sentence_transformer_with_offsets: MagicMock):
+    """Tests that a chunk which cannot be located in the text is an error rather than a wrong position."""
+    splitter = RecursiveSplitter(model=mock_sentence_transformer_with_offsets, chunk_size=5, chunk_overlap=1)
+
+    with pytest.raises(ValueError):
+        splitter._locate("one two three", [Document(page_content="one"), Document(page_content="four")])
+
+
+def test_recursive_splitter_token_offsets_cut_tokens_are_recounted(mock_sentence_transformer_with_offsets: MagicMock):
+    """Tests that chunks cut inside a token (splitting between characters) get exact token counts."""
+    # Every 3 characters of a word are one token
+    model = mock_sentence_transformer_with_offsets
+    model.tokenizer.side_effect = lambda text, **kwargs: {
+        "offset_mapping": [
+            (i, min(i + 3, m.end())) for m in re.finditer(r"\S+", text) for i in range(m.start(), m.end(), 3)
+        ]
+    }
+
+    def count_tokens(texts: list[str]):
+        input_ids = MagicMock()
+        input_ids.tolist.return_value = [[0] * sum(-(-len(word) // 3) for word in texts[0].split())]
+        return {"input_ids": input_ids}
+
+    model.tokenize.side_effect = count_tokens
+    splitter = RecursiveSplitter(model=model, chunk_size=5, chunk_overlap=1, use_token_offsets=True)
+    text = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMN"
+
+    documents = splitter.split(text)
+
+    starts = [text.index(doc.page_content) for doc in documents]
+    assert any(start % 3 for start in starts)
+    for doc in documents:
+        assert doc.metadata["token_count"] == -(-len(doc.page_content) // 3)
+
+
+@pytest.fixture(scope="module")
+def byte_level_bpe_model() -> MagicMock:
+    """
+    Provides a mocked SentenceTransformer with a byte-level BPE tokenizer trained on the test document,
+    whose tokens include the preceding space of a word.
+    """
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import PreTrainedTokenizerFast
+
+    with open("tests/data/long_pl.txt", encoding="utf-8") as f:
+        text = f.read()
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator([text], vocab_size=1000, min_frequency=2, show_progress=False)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe._tokenizer)
+    model = MagicMock(spec=SentenceTransformer)
+    model.tokenizer = tokenizer
+
+    def tokenize(texts: list[str]):
+        input_ids = MagicMock()
+        input_ids.tolist.return_value = [tokenizer(texts[0], add_special_tokens=False)["input_ids"]]
+        return {"input_ids": input_ids}
+
+    model.tokenize = MagicMock(side_effect=tokenize)
+    return model
+
+
+@pytest.mark.parametrize("chunk_size", [32, 64, 128])
+def test_recursive_splitter_token_offsets_byte_level_bpe(byte_level_bpe_model: MagicMock, chunk_size: int):
+    """Tests that chunks fit in `chunk_size` with exact token counts when tokens include the preceding space."""
+    # Given
+    model = byte_level_bpe_model
+    model.tokenize.reset_mock()
+    splitter = RecursiveSplitter(model=model, chunk_size=chunk_size, chunk_overlap=8, use_token_offsets=True)
+    with open("tests/data/long_pl.txt", encoding="utf-8") as f:
+        text = f.read()
+
+    # When
+    documents = splitter.split(text)
+
+    # Then
+    assert len(documents) > 10
+    for doc in documents:
+        token_count = len(model.tokenizer(doc.page_content, add_special_tokens=False)["input_ids"])
+        assert doc.metadata["token_count"] == token_count
+        assert token_count <= chunk_size
+    # Only the first words of chunks are tokenized again, not whole chunks
+    for call in model.tokenize.call_args_list:
+        assert len(call.args[0][0].split()) == 1
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.features.embeddings.embedding_batcher import EmbeddingBatcher
+from app.features.embeddings.embedding_encoding import encode_embedding
+from app.features.embeddings.embedding_model import EmbeddingQueryRequest
+from app.features.embeddings.embedding_service import EmbeddingService
+from app.features.embeddings.model_manager import ModelNotFound
+
+
+@pytest.fixture
+def mock_embedding_service() -> MagicMock:
+    """
+    Provides a mocked EmbeddingService where the embedding of a text is [len(text)].
+    """
+    embedding_service = MagicMock(spec=EmbeddingService)
+    embedding_service.encode.side_effect = lambda model_name, texts, prompt_name, batch_size: np.array(
+        [[float(len(t))] for t in texts]
+    )
+    embedding_service.export_embedding.side_effect = lambda model_name, embedding, precision, encoding: (
+        encode_embedding(embedding, encoding)
+    )
+    embedding_service.needs_calibration.return_value = False
+    embedding_service.get_model_names.return_value = ["m/1"]
+    return embedding_service
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched(mock_embedding_service: MagicMock):
+    # Given: A batcher
+    batcher = EmbeddingBatcher(mock_embedding_service, max_batch_size=8, max_wait_ms=50)
+    # When: Concurrent requests are sent
+    results = await asyncio.gather(*[batcher.generate_embeddings("m/1", "x" * i) for i in range(1, 4)])
+    await batcher.close()
+    # Then: Each caller gets its own embedding
+    assert results == [[1.0], [2.0], [3.0]]
+    # And: They are encoded in one batch
+    mock_embedding_service.encode.assert_called_once_with("m/1", ["x", "xx", "xxx"], None, 3)
+    stats = batcher.stats["m/1"]
+    assert stats.batches == 1
+    assert stats.max_batch_size == 3
+    assert stats.avg_batch_size == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_size_is_limited(mock_embedding_service: MagicMock):
+    # Given: A batcher with small batches
+    batcher = EmbeddingBatcher(mock_embedding_service, max_batch_size=2, max_wait_ms=50)
+    # When: More concurrent requests are sent
+    results = await asyncio.gather(*[batcher.generate_embeddings("m/1", "x" * i) for i in range(1, 6)])
+    await batcher.close()
+    # Then: All of them are answered in several batches
+    assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert batcher.stats["m/1"].batches == 3
+    assert batcher.stats["m/1"].max_batch_size == 2
+
+
+@pytest.mark.asyncio
+async def test_query_prompt_is_used(mock_embedding_service: MagicMock):
+    # Given: A model with a query prompt
+    mock_embedding_service.resolve_model_name.return_value = "m/1"
+    mock_embedding_service.format_query.return_value = ("Query: abc", "query")
+    batcher = EmbeddingBatcher(mock_embedding_service)
+    # When: A query embedding is requested
+    response = await batcher.generate_query_embeddings(
+        EmbeddingQueryRequest(language="en", embedding_model_name="m/1", text="abc")
+    )
+    await batcher.close()
+    # Then: The formatted text is encoded with the prompt
+    mock_embedding_service.encode.assert_called_once_with("m/1", ["Query: abc"], "query", 1)
+    assert response.embedding == [10.0]
+    assert response.embedding_model_name == "m/1"
+
+
+@pytest.mark.asyncio
+async def test_model_is_calibrated_in_inference_executor(mock_embedding_service: MagicMock):
+    # Given: A model which is not calibrated yet
+    mock_embedding_service.needs_calibration.return_value = True
+    threads = []
+    mock_embedding_service.get_quantization_ranges.side_effect = lambda model_name: threads.append(
+        threading.current_thread()
+    )
+    batcher = EmbeddingBatcher(mock_embedding_service)
+    # When: An int8 embedding is requested
+    await batcher.generate_embeddings("m/1", "abc", precision="int8")
+    await batcher.close()
+    # Then: The model is calibrated outside the event loop before the embedding is exported
+    mock_embedding_service.needs_calibration.assert_called_once_with("m/1", "int8")
+    assert threads != [threading.current_thread()]
+    assert len(threads) == 1
+    mock_embedding_service.export_embedding.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_language_is_detected_in_inference_executor(mock_embedding_service: MagicMock):
+    # Given: A query without language
+    threads = []
+
+    def resolve_model_name(req):
+        threads.append(threading.current_thread())
+        req.language = "en"
+        return "m/1"
+
+    mock_embedding_service.resolve_model_name.side_effect = resolve_model_name
+    mock_embedding_service.format_query.return_value = ("abc", None)
+    batcher = EmbeddingBatcher(mock_embedding_service)
+    # When: A query embedding is requested
+    await batcher.generate_query_embeddings(EmbeddingQueryRequest(text="abc"))
+    await batcher.close()
+    # Then: The language is detected outside the event loop
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
+
+
+@pytest.mark.asyncio
+async def test_unknown_model_is_rejected(mock_embedding_service: MagicMock):
+    # Given: A batcher
+    batcher = EmbeddingBatcher(mock_embedding_service)
+    # When/Then: Embeddings are requested from an unknown model
+    with pytest.raises(ModelNotFound):
+        await batcher.generate_embeddings("m/unknown", "abc")
+    await batcher.close()
+    # And: No queue is created for it
+    assert not batcher._queues
+    mock_embedding_service.encode.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_reported_to_callers(mock_embedding_service: MagicMock):
+    # Given: A failing model
+    mock_embedding_service.encode.side_effect = ValueError("Model 'm/1' not found.")
+    batcher = EmbeddingBatcher(mock_embedding_service)
+    # When: Embeddings are requested
+    # Then: The error is raised to the caller
+    with pytest.raises(ValueError):
+        await batcher.generate_embeddings("m/1", "abc")
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_isolated_per_text(mock_embedding_service: MagicMock):
+    # Given: A model failing on one of the texts
+    def encode(model_name, texts, prompt_name, batch_size):
+        if "bad" in texts:
+            raise ValueError("Bad text")
+        return np.array([[float(len(t))] for t in texts])
+
+    mock_embedding_service.encode.side_effect = encode
+    batcher = EmbeddingBatcher(mock_embedding_service, max_batch_size=8, max_wait_ms=50)
+    # When: Concurrent requests are sent
+    results = await asyncio.gather(
+        *[batcher.generate_embeddings("m/1", t) for t in ["a", "bad", "abc"]], return_exceptions=True
+    )
+    await batcher.close()
+    # Then: Only the failing text gets an error
+    assert results[0] == [1.0]
+    assert isinstance(results[1], ValueError)
+    assert results[2] == [3.0]
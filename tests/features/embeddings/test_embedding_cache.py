@@ -0,0 +1,90 @@
+import numpy as np
+
+from app.features.embeddings.embedding_cache import EmbeddingCache
+
+
+def test_key_depends_on_model_prompt_and_text():
+    # Given: Keys of the same text
+    key = EmbeddingCache.key("m/1", None, "text")
+    # Then: They are equal for the same model, prompt and text
+    assert key == EmbeddingCache.key("m/1", None, "text")
+    # And: They differ for other model, prompt or text
+    assert key != EmbeddingCache.key("m/2", None, "text")
+    assert key != EmbeddingCache.key("m/1", "query", "text")
+    assert key != EmbeddingCache.key("m/1", None, "title</s>text")
+
+
+def test_memory_cache():
+    # Given: A cache with two embeddings
+    cache = EmbeddingCache(max_size=2)
+    keys = [EmbeddingCache.key("m/1", None, t) for t in ["a", "b", "c"]]
+    cache.put_many(keys[:2], np.array([[1.0, 2.0], [3.0, 4.0]]))
+    # When: Embeddings are read
+    embeddings = cache.get_many(keys)
+    # Then: Cached embeddings are returned
+    assert embeddings[0].tolist() == [1.0, 2.0]  # type: ignore
+    assert embeddings[1].tolist() == [3.0, 4.0]  # type: ignore
+    assert embeddings[2] is None
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 1
+    # When: Another embedding is stored
+    cache.put_many(keys[2:], np.array([[5.0, 6.0]]))
+    # Then: The least recently used one is evicted
+    assert cache.get_many(keys[:1]) == [None]
+    assert cache.stats.evictions == 1
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    # Given: A cache stored on disk
+    path = str(tmp_path / "embedding_cache.sqlite")
+    cache = EmbeddingCache(max_size=10, disk_path=path)
+    key = EmbeddingCache.key("m/1", None, "a")
+    cache.put_many([key], np.array([[1.0, 2.0]]))
+    cache.close()
+    # When: The cache is opened again
+    cache = EmbeddingCache(max_size=10, disk_path=path)
+    embeddings = cache.get_many([key])
+    # Then: The embedding is read from disk
+    assert embeddings[0].tolist() == [1.0, 2.0]  # type: ignore
+    assert cache.stats.disk_hits == 1
+    cache.close()
+
+
+def test_disk_cache_is_bounded(tmp_path):
+    # Given: A small disk cache without memory tier
+    cache = EmbeddingCache(max_size=0, disk_path=str(tmp_path / "embedding_cache.sqlite"), max_disk_size=2)
+    keys = [EmbeddingCache.key("m/1", None, t) for t in ["a", "b", "c"]]
+    # When: More embeddings are stored
+    for key in keys:
+        cache.put_many([key], np.array([[1.0]]))
+    # Then: The oldest one is evicted
+    assert [e is not None for e in cache.get_many(keys)] == [False, True, True]
+    assert cache.stats.disk_evictions == 1
+    cache.close()
+
+
+def test_stored_keys_are_not_counted_again(tmp_path):
+    # Given: A small disk cache without memory tier
+    cache = EmbeddingCache(max_size=0, disk_path=str(tmp_path / "embedding_cache.sqlite"), max_disk_size=2)
+    keys = [EmbeddingCache.key("m/1", None, t) for t in ["a", "b"]]
+    # When: The same embeddings are stored repeatedly
+    for _ in range(3):
+        cache.put_many(keys, np.array([[1.0], [2.0]]))
+    # Then: Nothing is evicted while they fit
+    assert [e is not None for e in cache.get_many(keys)] == [True, True]
+    assert cache.stats.disk_evictions == 0
+    cache.close()
+
+
+def test_disk_cache_shared_by_workers_is_bounded(tmp_path):
+    # Given: Two caches (worker processes) sharing one small disk cache
+    path = str(tmp_path / "embedding_cache.sqlite")
+    caches = [EmbeddingCache(max_size=0, disk_path=path, max_disk_size=2) for _ in range(2)]
+    # When: Each of them stores different embeddings
+    for i, t in enumerate(["a", "b", "c", "d"]):
+        caches[i % 2].put_many([EmbeddingCache.key("m/1", None, t)], np.array([[1.0]]))
+    # Then: The file keeps at most `max_disk_size` embeddings
+    keys = [EmbeddingCache.key("m/1", None, t) for t in ["a", "b", "c", "d"]]
+    assert sum(e is not None for e in caches[0].get_many(keys)) == 2
+    for cache in caches:
+        cache.close()
@@ -0,0 +1,51 @@
+import base64
+
+import numpy as np
+import pytest
+
+from app.features.embeddings.embedding_encoding import decode_embedding, encode_embedding
+
+
+def test_float_encoding_is_a_list():
+    # Given: An embedding
+    embedding = np.array([0.5, -1.0, 2.0], dtype=np.float32)
+    # When: It is encoded as floats
+    encoded = encode_embedding(embedding)
+    # Then: A list of floats is returned
+    assert encoded == [0.5, -1.0, 2.0]
+
+
+@pytest.mark.parametrize("encoding,itemsize", [("base64", 4), ("float32", 4), ("float16", 2)])
+def test_binary_encoding_round_trip(encoding, itemsize):
+    # Given: An embedding
+    embedding = np.array([0.5, -1.0, 2.0, 0.25], dtype=np.float32)
+    # When: It is encoded and decoded
+    encoded = encode_embedding(embedding, encoding)
+    decoded = decode_embedding(encoded, encoding)
+    # Then: The encoded string contains raw little-endian values
+    assert isinstance(encoded, str)
+    assert len(base64.b64decode(encoded)) == len(embedding) * itemsize
+    # And: The decoded embedding is the same
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == embedding.tolist()
+
+
+def test_quantized_encoding_round_trip():
+    # Given: An int8 embedding
+    embedding = np.array([-128, 0, 127], dtype=np.int8)
+    # When: It is encoded as a list and as bytes
+    as_list = encode_embedding(embedding)
+    as_bytes = encode_embedding(embedding, "base64")
+    # Then: The list contains integers and the bytes are one per value
+    assert as_list == [-128, 0, 127]
+    assert len(base64.b64decode(as_bytes)) == 3
+    # And: Both are decoded to the same embedding
+    assert decode_embedding(as_list, "float", "int8").tolist() == [-128, 0, 127]
+    assert decode_embedding(as_bytes, "base64", "int8").tolist() == [-128, 0, 127]
+
+
+def test_float32_encoding_is_base64():
+    # Given: An embedding
+    embedding = np.array([0.5, -1.0, 2.0], dtype=np.float32)
+    # When / Then: The float32 encoding is the same as base64
+    assert encode_embedding(embedding, "float32") == encode_embedding(embedding, "base64")
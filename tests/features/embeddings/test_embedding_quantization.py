@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from app.features.embeddings.embedding_quantization import quantize
+
+RANGES = np.array([[-1.0, -1.0, -1.0, -1.0], [1.0, 1.0, 1.0, 1.0]], dtype=np.float32)
+
+
+def test_int8_uses_calibration_ranges():
+    # Given: Embeddings within and outside of the calibration ranges
+    embeddings = np.array([[-1.0, 0.0, 1.0, 5.0]], dtype=np.float32)
+    # When: They are quantized to int8
+    quantized = quantize(embeddings, "int8", RANGES)
+    # Then: The ranges are mapped to [-128, 127] and outliers are clipped
+    assert quantized.dtype == np.int8
+    low, middle, high, outlier = quantized[0].tolist()
+    assert low == -128
+    assert -1 <= middle <= 0
+    assert 126 <= high <= 127
+    assert outlier == high
+
+
+def test_int8_requires_calibration_ranges():
+    # Given: Embeddings
+    embeddings = np.zeros((1, 4), dtype=np.float32)
+    # When/Then: They cannot be quantized to int8 without calibration ranges
+    with pytest.raises(ValueError):
+        quantize(embeddings, "int8")
+
+
+@pytest.mark.parametrize(
+    "precision,dtype,expected", [("binary", np.int8, [0b10100000 - 128]), ("ubinary", np.uint8, [0b10100000])]
+)
+def test_binary_packs_signs(precision, dtype, expected):
+    # Given: A single embedding
+    embedding = np.array([0.5, -0.5, 0.1, -0.1, -1.0, -1.0, -1.0, -1.0], dtype=np.float32)
+    # When: It is quantized to one bit per dimension
+    quantized = quantize(embedding, precision)
+    # Then: The signs are packed into bytes
+    assert quantized.dtype == dtype
+    assert quantized.tolist() == expected
+
+
+def test_float32_is_unchanged():
+    # Given: Embeddings
+    embeddings = np.array([[0.5, -0.5]], dtype=np.float32)
+    # When: They are "quantized" to float32
+    quantized = quantize(embeddings, "float32")
+    # Then: They are returned as is
+    assert quantized is embeddings
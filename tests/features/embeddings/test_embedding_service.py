@@ -1,4 +1,9 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+
 from app.features.embeddings.embedding_service import EmbeddingService
+from app.features.embeddings.embedding_model import EmbeddingPassageRequest
 from app_config import AppConfig
 
 
@@ -50,3 +55,69 @@ def test_compare_embeddings(config: AppConfig):
     assert isinstance(similarity_score, float)
     # And: The similarity score should be between 0 and 1
     assert 0 <= similarity_score <= 1
+
+def test_generate_passage_embeddings_batch(config: AppConfig):
+    # Given: Passages for two different models
+    reqs = [
+        EmbeddingPassageRequest(language="pl", title="Bolesław Chrobry", text="Bolesław Chrobry był królem."),
+        EmbeddingPassageRequest(language="en", text="Bolesław the Brave was the first king of Poland."),
+        EmbeddingPassageRequest(language="pl", text="Mieszko I był księciem."),
+    ]
+    embedding_service = EmbeddingService(config)
+    # When: The embeddings are generated in one batch
+    responses = embedding_service.generate_passage_embeddings_batch([r.model_copy() for r in reqs], batch_size=2)
+    # Then: Responses are returned in input order
+    assert [len(r.embedding) for r in responses] == [768, 1024, 768]
+    # And: They are the same as generated one by one
+    for req, resp in zip(reqs, responses):
+        single = embedding_service.generate_passage_embeddings(req)
+        assert single.embedding_model_name == resp.embedding_model_name
+        assert embedding_service.compare_embeddings(resp.embedding_model_name, single.embedding, resp.embedding) > 0.99
+
+
+def test_detect_language_sampled(config: AppConfig):
+    # Given: A long polish text
+    with open("./tests/data/long_pl.txt", "r") as f:
+        text = f.read()
+    # And: Language detection with sampling
+    config.language_detection_sample_size = 500
+    embedding_service = EmbeddingService(config)
+    # When: The language is detected
+    language = embedding_service.detect_language(text)
+    # Then: It is polish
+    assert language == "pl"
+
+
+def test_warm_up_failure_is_not_ready(tmp_path, monkeypatch):
+    # Given: A service with two loaded models, one of which fails to warm up
+    embedding_service = EmbeddingService(AppConfig(data_dir=str(tmp_path)))
+    embedding_service.model_manager.models["a/ok"] = MagicMock()
+    embedding_service.model_manager.models["a/broken"] = MagicMock()
+
+    def warm_up(model_name: str) -> float:
+        if model_name == "a/broken":
+            raise RuntimeError("CUDA out of memory")
+        return 0.1
+
+    monkeypatch.setattr(embedding_service, "warm_up", warm_up)
+    # When: The models are warmed up
+    embedding_service.warm_up_models()
+    # Then: The service is not ready and reports the failed model
+    readiness = embedding_service.get_readiness()
+    assert not readiness.ready
+    assert readiness.failed_models == ["a/broken"]
+
+
+def test_single_text_is_encoded_without_counting_tokens(tmp_path, monkeypatch):
+    # Given: A service and a model
+    embedding_service = EmbeddingService(AppConfig(data_dir=str(tmp_path)))
+    model = MagicMock()
+    model.encode.return_value = np.array([[0.5, 1.0]], dtype=np.float32)
+    get_token_counter = MagicMock()
+    monkeypatch.setattr(embedding_service, "get_token_counter", get_token_counter)
+    # When: One text is encoded
+    embeddings = embedding_service._encode_batches("a/model", model, ["text"], None, 32)
+    # Then: It is encoded in one pass without counting its tokens first
+    assert embeddings.tolist() == [[0.5, 1.0]]
+    model.encode.assert_called_once()
+    get_token_counter.assert_not_called()
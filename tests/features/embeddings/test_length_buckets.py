@@ -0,0 +1,44 @@
+import pytest
+
+from app.features.embeddings.length_buckets import padding_ratio, plan_batches
+
+
+def test_plan_batches_groups_similar_lengths():
+    # Given
+    lengths = [20, 512, 30, 500, 25, 490]
+
+    # When
+    batches = plan_batches(lengths, max_batch_size=3)
+
+    # Then
+    assert batches == [[1, 3, 5], [2, 4, 0]]
+
+
+def test_plan_batches_token_budget():
+    # Given
+    lengths = [512, 20, 512, 20, 20, 20, 20]
+
+    # When
+    batches = plan_batches(lengths, max_batch_size=32, max_batch_tokens=1024)
+
+    # Then: two long texts fill the budget, the short ones are batched together
+    assert batches == [[0, 2], [1, 3, 4, 5, 6]]
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+
+
+def test_plan_batches_text_over_budget():
+    batches = plan_batches([2000, 10], max_batch_size=32, max_batch_tokens=1000)
+
+    assert batches == [[0], [1]]
+
+
+def test_plan_batches_empty():
+    assert plan_batches([], max_batch_size=32, max_batch_tokens=1000) == []
+
+
+@pytest.mark.parametrize(
+    ["lengths", "expected"],
+    [([10, 10], 0.0), ([10, 30], 1 / 3), ([512, 20], 0.48046875), ([], 0.0)],
+)
+def test_padding_ratio(lengths, expected):
+    assert padding_ratio(lengths) == pytest.approx(expected)
@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.features.embeddings.model_backend import check_equivalence, load_model, onnx_file_name, onnx_file_size
+
+
+def test_onnx_file_name():
+    # When/Then: The quantized backend uses the file of its quantization config
+    assert onnx_file_name("onnx", "avx2") == "model.onnx"
+    assert onnx_file_name("onnx_qint8", "avx512_vnni") == "model_qint8_avx512_vnni.onnx"
+
+
+def test_onnx_file_size(tmp_path):
+    # Given: A model with an exported ONNX file
+    (tmp_path / "onnx").mkdir()
+    (tmp_path / "onnx" / "model.onnx").write_bytes(b"x" * 100)
+    # When/Then: The size of the file of the backend is returned (0 for PyTorch or a missing file)
+    assert onnx_file_size(str(tmp_path), "onnx") == 100
+    assert onnx_file_size(str(tmp_path), "onnx_qint8") == 0
+    assert onnx_file_size(str(tmp_path), "torch") == 0
+
+
+def test_unknown_backend():
+    # When/Then: An unknown backend is rejected
+    with pytest.raises(ValueError):
+        load_model("./data/m/1", "tensorrt")
+
+
+def mock_model(embeddings: list[list[float]]) -> MagicMock:
+    model = MagicMock()
+    model.encode.return_value = np.array(embeddings, dtype=np.float32)
+    return model
+
+
+def test_equivalent_models():
+    # Given: Models generating almost the same embeddings
+    reference = mock_model([[1.0, 0.0], [0.0, 1.0]])
+    candidate = mock_model([[0.9999, 0.0141], [0.0, 1.0]])
+    # When: They are compared
+    distance = check_equivalence(reference, candidate, ["a", "b"], 0.01)
+    # Then: The distance is within the tolerance
+    assert distance < 0.001
+
+
+def test_different_models():
+    # Given: Models generating different embeddings
+    reference = mock_model([[1.0, 0.0]])
+    candidate = mock_model([[0.0, 1.0]])
+    # When/Then: The check fails
+    with pytest.raises(ValueError):
+        check_equivalence(reference, candidate, ["a"], 0.01)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+import torch
+
+from app.features.embeddings.model_manager import MB, ModelManager, ModelNotFound
+
+
+class Loader:
+    """Loads 1 MB "models" and counts the loads."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.loads: list[str] = []
+
+    def __call__(self, model_name: str) -> torch.nn.Module:
+        time.sleep(self.delay)
+        self.loads.append(model_name)
+        return torch.nn.Linear(MB // 4, 1, bias=False)
+
+
+@pytest.fixture
+def data_dir(tmp_path) -> str:
+    for name in ["org/a", "org/b", "org/c"]:
+        (tmp_path / name).mkdir(parents=True)
+    return str(tmp_path)
+
+
+def test_models_are_loaded_on_first_use(data_dir: str):
+    # Given: A manager without loaded models
+    loader = Loader()
+    manager = ModelManager(data_dir, loader)  # type: ignore
+    # When: A model is used twice
+    model = manager.get("org/a")
+    # Then: It is loaded once
+    assert manager.get("org/a") is model
+    assert loader.loads == ["org/a"]
+    assert sorted(manager.get_model_names()) == ["org/a", "org/b", "org/c"]
+    assert [m.size_mb for m in manager.loaded_models()] == [1.0]
+
+
+def test_concurrent_first_requests_load_once(data_dir: str):
+    # Given: A slowly loading model
+    loader = Loader(delay=0.1)
+    manager = ModelManager(data_dir, loader)  # type: ignore
+    # When: It is requested by many threads at once
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(manager.get("org/a"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Then: It is loaded once and shared
+    assert loader.loads == ["org/a"]
+    assert all(m is models[0] for m in models)
+
+
+def test_least_recently_used_model_is_unloaded(data_dir: str):
+    # Given: A budget for two models
+    loader = Loader()
+    manager = ModelManager(data_dir, loader, memory_budget_mb=2.5)  # type: ignore
+    manager.get("org/a")
+    manager.get("org/b")
+    manager.get("org/a")
+    # When: A third model is loaded
+    manager.get("org/c")
+    # Then: The least recently used one is unloaded
+    assert list(manager.models) == ["org/a", "org/c"]
+
+
+def test_pinned_and_used_models_are_not_unloaded(data_dir: str):
+    # Given: A budget for one model, a pinned model and a model in use
+    loader = Loader()
+    manager = ModelManager(data_dir, loader, memory_budget_mb=1.5, pinned_models=["org/a"])  # type: ignore
+    manager.get("org/a")
+    with manager.use("org/b"):
+        # When: Another model is loaded
+        manager.get("org/c")
+        # Then: The budget is exceeded rather than unloading them
+        assert list(manager.models) == ["org/a", "org/b", "org/c"]
+    # Then: When the model is no longer used, the idle, not pinned models are unloaded
+    assert list(manager.models) == ["org/a"]
+
+
+def test_unknown_model_is_rejected(data_dir: str):
+    # Given: A manager
+    loader = Loader()
+    manager = ModelManager(data_dir, loader)  # type: ignore
+    # When/Then: A model which is not in the data directory is requested
+    with pytest.raises(ModelNotFound):
+        manager.get("org/unknown")
+    with pytest.raises(ModelNotFound):
+        with manager.use("org/unknown"):
+            pass
+    # And: Nothing is loaded or kept for it
+    assert loader.loads == []
+    assert not manager._load_locks
+    assert "org/unknown" not in manager._in_use
+
+
+def test_size_of_model_without_pytorch_weights_is_its_file_size(data_dir: str):
+    # Given: A model without PyTorch weights (e.g. ONNX) and its 3 MB file
+    manager = ModelManager(
+        data_dir, lambda model_name: torch.nn.Identity(), file_size=lambda model_name: 3 * MB  # type: ignore
+    )
+    # When: It is loaded
+    manager.get("org/a")
+    # Then: Its size is the size of the file
+    assert [m.size_mb for m in manager.loaded_models()] == [3.0]
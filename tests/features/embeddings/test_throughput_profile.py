@@ -0,0 +1,32 @@
+import pytest
+
+from app.features.embeddings.throughput_profile import ThroughputProfile
+
+
+def test_first_measurement_replaces_default():
+    # Given
+    profile = ThroughputProfile(default_tokens_per_second=100)
+    # When
+    profile.record("model", 3000, 2.0)
+    # Then
+    assert profile.tokens_per_second("model") == 1500
+    assert profile.tokens_per_second("other") == 100
+
+
+def test_measurements_are_smoothed():
+    # Given
+    profile = ThroughputProfile(smoothing=0.5)
+    profile.record("model", 1000, 1.0)
+    # When: A pass is much slower
+    profile.record("model", 1000, 10.0)
+    # Then: The speed moves halfway towards it
+    assert profile.tokens_per_second("model") == pytest.approx(550)
+
+
+def test_empty_measurements_are_ignored():
+    profile = ThroughputProfile()
+
+    profile.record("model", 0, 1.0)
+    profile.record("model", 100, 0.0)
+
+    assert profile.snapshot() == {}
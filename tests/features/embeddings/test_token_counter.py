@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.features.embeddings import token_counter
+from app.features.embeddings.token_counter import TokenCounter
+
+
+@pytest.fixture
+def mock_tokenizer() -> MagicMock:
+    """
+    Provides a mocked tokenizer where every word is one token and two special tokens are added.
+    """
+    tokenizer = MagicMock()
+    tokenizer.num_special_tokens_to_add.return_value = 2
+    tokenizer.side_effect = lambda texts, **kwargs: {"input_ids": [list(range(len(t.split()))) for t in texts]}
+    return tokenizer
+
+
+def test_count_includes_special_tokens(mock_tokenizer: MagicMock):
+    # Given: A token counter
+    counter = TokenCounter(mock_tokenizer)
+    # When: Tokens are counted
+    count = counter.count("one two three")
+    # Then: Special tokens are included
+    assert count == 5
+    # And: Special tokens are not added by the tokenizer
+    assert mock_tokenizer.call_args.kwargs["add_special_tokens"] is False
+
+
+def test_count_many_tokenizes_missing_texts_in_one_call(mock_tokenizer: MagicMock):
+    # Given: A token counter with one cached text
+    counter = TokenCounter(mock_tokenizer)
+    counter.count("one")
+    mock_tokenizer.reset_mock()
+    # When: Many texts are counted
+    counts = counter.count_many(["one", "one two", "one two three", "one two"])
+    # Then: Counts are returned in input order
+    assert counts == [3, 4, 5, 4]
+    # And: Only unique texts not cached are tokenized, in one call
+    mock_tokenizer.assert_called_once()
+    assert mock_tokenizer.call_args.args[0] == ["one two", "one two three"]
+    # And: Stats are updated
+    assert counter.stats.hits == 2
+    assert counter.stats.misses == 3
+    assert counter.stats.hit_rate == 0.4
+
+
+def test_cache_is_bounded(mock_tokenizer: MagicMock):
+    # Given: A token counter with a small cache
+    counter = TokenCounter(mock_tokenizer, max_size=2)
+    # When: More texts than the cache size are counted
+    counter.count_many(["a", "a b", "a b c"])
+    counter.count("a b c")
+    counter.count("a")
+    # Then: The least recently used text is evicted
+    assert counter.stats.evictions == 2
+    assert counter.stats.hits == 1
+    assert counter.stats.misses == 4
+
+
+def test_texts_with_the_same_hash_are_counted_separately(mock_tokenizer: MagicMock, mocker):
+    # Given: A token counter and texts whose built-in hashes collide
+    mocker.patch.object(token_counter, "hash", lambda text: 0, create=True)
+    counter = TokenCounter(mock_tokenizer)
+    # When: They are counted
+    counts = [counter.count("one"), counter.count("one two")]
+    # Then: Each text gets its own count
+    assert counts == [3, 4]
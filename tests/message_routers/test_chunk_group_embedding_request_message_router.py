@@ -0,0 +1,115 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from features.chunks.chunk_model import ChunkGroup, ChunkWithEmbeddings
+from message_routers.chunk_group_embedding_request_message_router import ChunkGroupEmbeddingRequestMessageRouter
+
+
+def create_group(total_chunks: int) -> ChunkGroup:
+    return ChunkGroup(
+        chunks=[
+            ChunkWithEmbeddings(
+                chunk_index=i,
+                total_chunks=total_chunks,
+                language="en",
+                embedding_model_name="model",
+                text=f"chunk {i}",
+                embedding=[],
+            )
+            for i in range(total_chunks)
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_group_chunks_are_embedded_and_published_separately():
+    # Given: A group of 3 chunks
+    embedding_batcher = MagicMock()
+    embedding_batcher.generate_embeddings = AsyncMock(side_effect=lambda model, text, *args: [float(text[-1])])
+    router = ChunkGroupEmbeddingRequestMessageRouter(MagicMock(), embedding_batcher)
+    request = MagicMock()
+    request.decoded_data.return_value = create_group(3)
+    published = []
+
+    async def process_response(request, chunk):
+        published.append(chunk)
+
+    router.process_response = process_response  # type: ignore
+    # When: The request is processed
+    await router.process_request(request)
+    # Then: All chunks are embedded together and each of them is published with its embedding
+    assert embedding_batcher.generate_embeddings.await_count == 3
+    assert sorted((c.chunk_index, c.embedding) for c in published) == [(0, [0.0]), (1, [1.0]), (2, [2.0])]
+
+
+@pytest.mark.asyncio
+async def test_failed_embedding_is_raised():
+    # Given: An embedding which fails
+    embedding_batcher = MagicMock()
+    embedding_batcher.generate_embeddings = AsyncMock(side_effect=RuntimeError("Encoding failed"))
+    router = ChunkGroupEmbeddingRequestMessageRouter(MagicMock(), embedding_batcher)
+    request = MagicMock()
+    request.decoded_data.return_value = create_group(2)
+    router.process_response = AsyncMock()  # type: ignore
+    # When / Then: The message is not acked and nothing is published
+    with pytest.raises(RuntimeError):
+        await router.process_request(request)
+    router.process_response.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failed_chunks_are_retried_separately():
+    # Given: A group of 4 chunks, 2 of which fail to embed
+    embedding_batcher = MagicMock()
+
+    async def generate_embeddings(model, text, *args):
+        if text in ("chunk 1", "chunk 3"):
+            raise RuntimeError("Encoding failed")
+        return [float(text[-1])]
+
+    embedding_batcher.generate_embeddings = AsyncMock(side_effect=generate_embeddings)
+    router = ChunkGroupEmbeddingRequestMessageRouter(
+        MagicMock(), embedding_batcher, chunk_embedding_requests_topic="requests"
+    )
+    request = MagicMock()
+    request.decoded_data.return_value = create_group(4)
+    published = []
+    topic = {"response": None}
+    request.forward_response_to_topic.side_effect = lambda t: topic.update(response=t)
+
+    async def process_response(request, message):
+        published.append((topic["response"], message))
+
+    router.process_response = process_response  # type: ignore
+    # When: The request is processed
+    await router.process_request(request)
+    # Then: The embedded chunks are published as responses
+    responses = [m for t, m in published if t is None]
+    assert sorted((c.chunk_index, c.embedding) for c in responses) == [(0, [0.0]), (2, [2.0])]
+    # And: The failed chunks are published again as one group to be retried
+    retries = [m for t, m in published if t == "requests"]
+    assert len(retries) == 1
+    assert isinstance(retries[0], ChunkGroup)
+    assert [c.chunk_index for c in retries[0].chunks] == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_without_retry_topic_is_raised():
+    # Given: A group of 2 chunks, one of which fails, and no topic to retry it
+    embedding_batcher = MagicMock()
+
+    async def generate_embeddings(model, text, *args):
+        if text == "chunk 1":
+            raise RuntimeError("Encoding failed")
+        return [0.0]
+
+    embedding_batcher.generate_embeddings = AsyncMock(side_effect=generate_embeddings)
+    router = ChunkGroupEmbeddingRequestMessageRouter(MagicMock(), embedding_batcher)
+    request = MagicMock()
+    request.decoded_data.return_value = create_group(2)
+    router.process_response = AsyncMock()  # type: ignore
+    # When / Then: The message is not acked and nothing is published
+    with pytest.raises(RuntimeError):
+        await router.process_request(request)
+    router.process_response.assert_not_awaited()
@@ -0,0 +1,135 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from app_config import AppConfig
+from features.chunks.chunk_model import ChunkGroup, ChunksRequest, ChunkWithEmbeddings
+from inference_executor import InferenceExecutor
+from message_routers.chunk_request_message_router import ChunkRequestMessageRouter
+from profiling import Profiler
+
+
+def create_router(max_in_flight: int, group_max_size: int = 1) -> ChunkRequestMessageRouter:
+    config = AppConfig(chunks_publish_max_in_flight=max_in_flight, chunk_group_max_size=group_max_size)
+    return ChunkRequestMessageRouter(config, MagicMock(), MagicMock(), InferenceExecutor())
+
+
+def create_chunks(total_chunks: int) -> list[ChunkWithEmbeddings]:
+    return [
+        ChunkWithEmbeddings(
+            chunk_index=i,
+            total_chunks=total_chunks,
+            language="en",
+            embedding_model_name="model",
+            text=f"chunk {i}",
+            embedding=[],
+        )
+        for i in range(total_chunks)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_chunks_are_published_concurrently():
+    # Given: A router publishing at most 4 chunks at once
+    router = create_router(max_in_flight=4)
+    in_flight = 0
+    max_in_flight = 0
+    published = []
+
+    async def process_response(request, chunk):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        published.append(chunk.chunk_index)
+
+    router.process_response = process_response  # type: ignore
+    # When: 20 chunks are published
+    await router.publish_responses(MagicMock(), create_chunks(20))
+    # Then: All of them are published, at most 4 at once
+    assert sorted(published) == list(range(20))
+    assert max_in_flight == 4
+
+
+@pytest.mark.asyncio
+async def test_publishing_error_is_raised_after_all_publishes():
+    # Given: A router whose publishing of one chunk fails
+    router = create_router(max_in_flight=2)
+    published = []
+
+    async def process_response(request, chunk):
+        await asyncio.sleep(0.01)
+        if chunk.chunk_index == 1:
+            raise RuntimeError("Publish failed")
+        published.append(chunk.chunk_index)
+
+    router.process_response = process_response  # type: ignore
+    # When: The chunks are published
+    with pytest.raises(RuntimeError):
+        await router.publish_responses(MagicMock(), create_chunks(5))
+    # Then: The other chunks are still published (the request is not acked, so it will be retried)
+    assert sorted(published) == [0, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "group_max_size,fanned_out",
+    [(1, [2, 3, 4]), (16, [[2, 3, 4]])],
+)
+async def test_chunks_without_embeddings_are_fanned_out(group_max_size, fanned_out):
+    # Given: A document whose first 2 chunks are embedded inline
+    router = create_router(max_in_flight=10, group_max_size=group_max_size)
+    chunks = create_chunks(5)
+    for chunk in chunks[:2]:
+        chunk.embedding = [0.1, 0.2]
+    router.chunk_service.create_chunks.return_value = chunks  # type: ignore
+    request = MagicMock()
+    request.decoded_data.return_value = ChunksRequest(text="text")
+    topics = {"response": "chunks"}
+    request.forward_response_to_topic.side_effect = lambda topic: topics.update(response=topic)
+    published = []
+
+    async def process_response(request, message):
+        if isinstance(message, ChunkGroup):
+            published.append((topics["response"], [chunk.chunk_index for chunk in message.chunks]))
+        else:
+            published.append((topics["response"], message.chunk_index))
+
+    router.process_response = process_response  # type: ignore
+    # When: The request is processed
+    await router.process_request(request)
+    # Then: Embedded chunks are published as responses, the others are forwarded to be embedded
+    # (one chunk per message by default, in groups if enabled)
+    assert sorted(published, key=str) == sorted(
+        [*(("chunker-embeddings-requests", message) for message in fanned_out), ("chunks", 0), ("chunks", 1)],
+        key=str,
+    )
+
+
+@pytest.mark.asyncio
+async def test_message_with_profile_attribute_is_profiled(tmp_path):
+    # Given: A router with an enabled profiler and a message asking for profiling
+    router = create_router(max_in_flight=10)
+    router.profiler = Profiler(str(tmp_path), enabled=True, torch_profiler=False)
+    chunks = create_chunks(2)
+    for chunk in chunks:
+        chunk.embedding = [0.1, 0.2]
+    router.chunk_service.create_chunks.return_value = chunks  # type: ignore
+    request = MagicMock()
+    request.message.messageId = "1"
+    request.message.attributes = {"profile": "true"}
+    request.decoded_data.return_value = ChunksRequest(text="text", job_id="e3c5ba2c-5f4a-4c8e-9d3c-0f1d2a3b4c5d")
+
+    async def process_response(request, message):
+        pass
+
+    router.process_response = process_response  # type: ignore
+    # When: The message is processed
+    await router.process_request(request)
+    # Then: Its profile is saved under its job ID
+    (profile,) = router.profiler.list_profiles()
+    assert profile.source == "message 1"
+    assert profile.job_id == "e3c5ba2c-5f4a-4c8e-9d3c-0f1d2a3b4c5d"
+    assert "profile.pstats" in profile.files
@@ -0,0 +1,72 @@
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+import telemetry
+from features.chunks.chunk_model import ChunkWithEmbeddings
+from message_routers.publishing import publish_all
+
+
+def create_chunk(i: int) -> ChunkWithEmbeddings:
+    return ChunkWithEmbeddings(
+        chunk_index=i, total_chunks=3, language="pl", embedding_model_name="model", text="zażółć", embedding=[]
+    )
+
+
+@pytest.mark.asyncio
+async def test_publishing_is_measured(mocker):
+    # Given: In-memory telemetry
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter(__name__)
+    mocker.patch.object(telemetry, "_tracer", tracer_provider.get_tracer(__name__))
+    mocker.patch.object(telemetry, "metrics_enabled", True)
+    mocker.patch("message_routers.publishing.published_bytes_counter", meter.create_counter("bytes"))
+    published = []
+
+    async def publish(chunk: ChunkWithEmbeddings) -> None:
+        published.append(chunk)
+
+    chunks = [create_chunk(i) for i in range(3)]
+    # When: The chunks are published
+    await publish_all(publish, chunks, max_in_flight=2, topic="responses")
+    # Then: The publish span and the bytes counter include the size of messages in UTF-8
+    size = sum(len(chunk.model_dump_json().encode()) for chunk in chunks)
+    (span,) = span_exporter.get_finished_spans()
+    assert span.name == "publish"
+    assert dict(span.attributes) == {"topic": "responses", "messages": 3, "bytes": size}
+    (point,) = [
+        point
+        for resource_metrics in reader.get_metrics_data().resource_metrics
+        for scope_metrics in resource_metrics.scope_metrics
+        for metric in scope_metrics.metrics
+        for point in metric.data.data_points
+    ]
+    assert point.value == size
+    assert dict(point.attributes) == {"topic": "responses"}
+
+
+@pytest.mark.asyncio
+async def test_size_is_not_measured_without_metrics(mocker):
+    # Given: In-memory traces and no exported metrics
+    span_exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    mocker.patch.object(telemetry, "_tracer", tracer_provider.get_tracer(__name__))
+    mocker.patch.object(telemetry, "metrics_enabled", False)
+    model_dump_json = mocker.spy(ChunkWithEmbeddings, "model_dump_json")
+
+    async def publish(chunk: ChunkWithEmbeddings) -> None:
+        pass
+
+    # When: Chunks are published
+    await publish_all(publish, [create_chunk(i) for i in range(3)], max_in_flight=2, topic="responses")
+    # Then: They are not serialized again to measure their size
+    model_dump_json.assert_not_called()
+    (span,) = span_exporter.get_finished_spans()
+    assert dict(span.attributes) == {"topic": "responses", "messages": 3}
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+TEXT = "\n\n".join(f"Paragraph {i}. " + "Lorem ipsum dolor sit amet. " * 40 for i in range(10))
+
+
+@pytest.mark.parametrize("params,headers", [({"stream": True}, {}), ({}, {"Accept": "application/x-ndjson"})])
+def test_create_chunks_stream(client, params, headers):
+    # When: Chunks are requested as a stream
+    response = client.post("/api/chunks/", json={"text": TEXT}, params=params, headers=headers)
+    # Then: Each chunk is a JSON string in a separate line
+    assert 200 == response.status_code
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.splitlines()
+    assert [json.loads(line) for line in lines] == client.post("/api/chunks/", json={"text": TEXT}).json()
+
+
+def test_create_chunks_with_embeddings_stream(client):
+    # When: Chunks with embeddings are requested as a stream
+    with client.stream("POST", "/api/chunks/with-embeddings?stream=true", json={"text": TEXT}) as response:
+        chunks = [json.loads(line) for line in response.iter_lines() if line]
+    # Then: Chunks are returned in order with their embeddings
+    assert 200 == response.status_code
+    assert [c["chunk_index"] for c in chunks] == list(range(chunks[0]["total_chunks"]))
+    assert all(c["embedding"] for c in chunks)
+
+
+def test_create_chunks_with_embeddings_stream_same_content(client):
+    # Given: Chunks with embeddings returned without streaming
+    response = client.post("/api/chunks/with-embeddings", json={"text": TEXT})
+    assert 200 == response.status_code
+    chunks = response.json()
+    # When: The same chunks are requested as a stream
+    streamed = client.post("/api/chunks/with-embeddings?stream=true", json={"text": TEXT})
+    # Then: Both responses have the same chunks with embeddings
+    assert all(c["embedding"] for c in chunks)
+    assert [json.loads(line) for line in streamed.text.splitlines()] == chunks
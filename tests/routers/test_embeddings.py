@@ -155,3 +155,42 @@ def test_generate_query_embeddings_autodetected_language(client, language, text,
     # Then: Embedding size is 768 or 1024
     assert len(r["embedding"]) == length
     assert r["language"] == language
+
+
+def test_generate_passage_embeddings_batch(client):
+    # Given: Passages in different languages
+    items = [
+        {"title": "Bolesław Chrobry", "text": "Bolesław Chrobry był pierwszym królem Polski.", "language": "pl"},
+        {"text": "Bolesław the Brave was the first king of Poland.", "language": "en"},
+        {"text": "Mieszko I był pierwszym historycznym władcą Polski."},
+    ]
+    # When: A POST request is made to /api/embeddings/generate/passage/batch
+    response = client.post("/api/embeddings/generate/passage/batch", json={"items": items})
+    r = response.json()
+    # Then: Embeddings are returned in the same order as items
+    assert 200 == response.status_code
+    assert [len(e["embedding"]) for e in r] == [768, 1024, 768]
+    assert [e["language"] for e in r] == ["pl", "en", "pl"]
+    # And: They are the same as generated one by one
+    single = client.post("/api/embeddings/generate/passage", json=items[0]).json()
+    assert single["embedding"] == pytest.approx(r[0]["embedding"], abs=1e-4)
+
+
+def test_generate_query_embeddings_batch(client):
+    # Given: Queries in different languages
+    items = [{"text": "Kto był pierwszym królem Polski?"}, {"text": "Who was the first king of Poland?"}]
+    # When: A POST request is made to /api/embeddings/generate/query/batch
+    response = client.post("/api/embeddings/generate/query/batch", json={"items": items})
+    r = response.json()
+    # Then: Embeddings are returned in the same order as items
+    assert 200 == response.status_code
+    assert [len(e["embedding"]) for e in r] == [768, 1024]
+
+
+def test_generate_embeddings_batch_too_many_items(client, config):
+    # Given: More items than allowed
+    items = [{"text": "xxx"}] * (config.embedding_batch_max_items + 1)
+    # When: A POST request is made to /api/embeddings/generate/query/batch
+    response = client.post("/api/embeddings/generate/query/batch", json={"items": items})
+    # Then: The request is rejected
+    assert 413 == response.status_code
@@ -8,7 +8,7 @@ from app_config import AppConfig
 from dependencies import get_server_config
 from fastapi import FastAPI, status
 from fastapi.testclient import TestClient
-from features.chunks.chunk_model import GcpFile
+from features.chunks.chunk_model import ChunkGroup, GcpFile
 from log_config import setup_logging
 from routers.chunks import ChunksRequest, ChunkWithEmbeddings
 from tests.conftest import client_factory
@@ -34,6 +34,9 @@ def request_embedding_subscription(request_embedding_topic: GcpTopic):
 def config(request_embedding_topic) -> AppConfig:
     config = AppConfig()
     config.chunk_embedding_requests_topic = request_embedding_topic.topic_id
+    # Long texts are fanned out whole, one chunk per message
+    config.embedding_policy = "count"
+    config.chunk_group_max_size = 1
     return config
 
 
@@ -114,6 +117,71 @@ def test_long_text_chunking(
         assert chunk.embedding
 
 
+@pytest.fixture(scope="module")
+def request_embedding_group_topic() -> GcpTopic:  # type: ignore
+    topic_id = "chunker_unit_tests_" + uuid.uuid4().hex[:6]
+    topic = GcpTopic(topic_id).create(exist_ok=True)
+    yield topic  # type: ignore
+    topic.delete()
+
+
+@pytest.fixture(scope="module")
+def request_embedding_group_subscription(request_embedding_group_topic: GcpTopic):
+    subscription = request_embedding_group_topic.create_subscription(clazz=ChunkGroup, exist_ok=True)
+    yield subscription
+    subscription.delete()
+
+
+@pytest.fixture(scope="module")
+def grouped_config(request_embedding_group_topic: GcpTopic) -> AppConfig:
+    config = AppConfig()
+    config.chunk_embedding_requests_topic = request_embedding_group_topic.topic_id
+    # The `cost` policy with a short time budget embeds the start of the text inline
+    config.embedding_policy = "cost"
+    config.embedding_inline_time_budget = 0.5
+    config.chunk_group_max_size = 16
+    return config
+
+
+def test_long_text_chunking_with_groups(
+    topic: GcpTopic,
+    subscription: GcpSubscription,
+    request_embedding_group_subscription: GcpSubscription,
+    grouped_config: AppConfig,
+):
+    # Given: Message payload with long text
+    with open("./tests/data/long_pl.txt", "r") as f:
+        payload = ChunksRequest(job_id=uuid.uuid4(), text=f.read())
+    # And: A fake request pushed from a subscription
+    req = GcpPubsubRequest.create(payload, response_topic=topic.topic_id)
+    with client_factory(grouped_config) as client:
+        # And: Pub/Sub push is emulated
+        with request_embedding_group_subscription.run_push_emulator(
+            client, "/pub-sub/requests/embeddings"
+        ) as sub_emulator:
+            # When: The request is posted
+            client.post("/pub-sub/requests", 200, json=req)
+            # And: Chunks embedded inline and in forwarded groups are received
+            chunks: dict[int, ChunkWithEmbeddings] = {}
+            deadline = time.time() + 60
+            while len(chunks) < 9 and time.time() < deadline:
+                chunk = subscription.receive_first_payload(
+                    lambda p: p.job_id == payload.job_id and p.chunk_index not in chunks
+                )
+                if chunk:
+                    chunks[chunk.chunk_index] = chunk
+            groups = sub_emulator.get_payloads()
+    # Then: Every chunk is received with its embedding
+    assert sorted(chunks) == list(range(9))
+    assert all(chunk.embedding for chunk in chunks.values())
+    # And: The end of the text is fanned out in groups of chunks without embeddings
+    fanned_out = [chunk.chunk_index for group in groups for chunk in group.chunks]
+    assert groups
+    assert all(len(group.chunks) <= 16 for group in groups)
+    assert sorted(fanned_out) == list(range(9 - len(fanned_out), 9))
+    assert not any(chunk.embedding for group in groups for chunk in group.chunks)
+
+
 @pytest.fixture(scope="module")
 def blob_storage_md(gcp_bucket_name: str):
     bs = GcpBlobStorage(uuid.uuid4().hex, None, "text/markdown", gcp_bucket_name)
@@ -0,0 +1,20 @@
+import time
+
+
+def test_ready(client):
+    # Given: A started service
+    deadline = time.monotonic() + 120
+    # When: GET requests are made to /api/ready until models are warmed up
+    response = client.get("/api/ready")
+    while response.status_code == 503 and time.monotonic() < deadline:
+        time.sleep(0.5)
+        response = client.get("/api/ready")
+    r = response.json()
+    # Then: The response status code is 200
+    assert 200 == response.status_code
+    assert r["ready"]
+    # And: Load and warm-up durations of models are returned
+    assert r["models"]
+    for model in r["models"].values():
+        assert model["load_time"] > 0
+        assert model["warmup_time"] > 0
@@ -0,0 +1,62 @@
+from benchmarks.fixtures import read_corpus, synthetic_document
+from benchmarks.results import BenchmarkResult, BenchmarkRun, compare, load_run, measure, save_run
+
+
+def create_run(chars_per_s: float, median_s: float, chunks: int) -> BenchmarkRun:
+    return BenchmarkRun(
+        results=[
+            BenchmarkResult(
+                "split", {"mode": "langchain"}, {"chars_per_s": chars_per_s, "median_s": median_s, "chunks": chunks}
+            )
+        ]
+    )
+
+
+def test_compare_reports_regressions():
+    # Given
+    baseline = create_run(1000.0, 1.0, 10)
+    current = create_run(800.0, 0.95, 12)
+    # When
+    comparisons = compare(current, baseline, threshold=0.1)
+    # Then
+    assert [(c.metric, round(c.change, 2), c.regression) for c in comparisons] == [
+        ("chars_per_s", -0.2, True),
+        ("median_s", 0.05, False),
+    ]
+
+
+def test_compare_skips_benchmarks_missing_in_baseline():
+    # Given
+    baseline = create_run(1000.0, 1.0, 10)
+    current = create_run(1000.0, 1.0, 10)
+    current.results[0].params["mode"] = "token_offsets"
+    # When
+    comparisons = compare(current, baseline)
+    # Then
+    assert comparisons == []
+
+
+def test_save_and_load_run(tmp_path):
+    # Given
+    run = BenchmarkRun(metadata={"python": "3.13"}, results=create_run(1000.0, 1.0, 10).results)
+    run.results[0].timing = measure(lambda: None, min_time=0, min_rounds=2)
+    path = str(tmp_path / "results.json")
+    # When
+    save_run(run, path)
+    loaded = load_run(path)
+    # Then
+    assert loaded == run
+    assert loaded.results[0].timing.rounds == 2
+
+
+def test_synthetic_document():
+    # Given
+    corpus = read_corpus()
+    # When
+    document = synthetic_document(corpus, 50_000)
+    # Then
+    assert len(document) == 50_000
+    assert document == synthetic_document(corpus, 50_000)
+    paragraphs = document.split("\n\n")
+    # Only very short paragraphs (e.g. headings) may repeat
+    assert len(set(paragraphs)) > 0.9 * len(paragraphs)